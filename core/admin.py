@@ -1,8 +1,145 @@
-from django.contrib import admin
-from .models import Doctor, Appointment, Review, UserProfile
+from decimal import Decimal
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.models import LogEntry, CHANGE
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import model_ngettext
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Exists, F, DecimalField, ExpressionWrapper, OuterRef
+from django.db.models.functions import Round
+from django.shortcuts import redirect, render
+from django.urls import path, reverse
+from django.utils import timezone
+from .doctor_import import DoctorImporter, detect_format, read_rows
+from .exports import streaming_export
+from .forms import DoctorImportForm, FeeAdjustmentForm
+from .ics import feed_token
+from .models import Doctor, Appointment, AppointmentArchive, Review, UserProfile, OutboundEmail, WaitlistEntry
+from .notifications import queue_unrendered
+from .pagination import LargeTablePaginator
+from .waitlist import ACTIVE_STATUSES, promote_next
+
+
+class AutocompleteListFilter(admin.SimpleListFilter):
+    """
+    List filter for a foreign key that searches the related admin via AJAX
+    instead of rendering every related object as a filter option.
+    """
+    template = 'admin/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        field = model._meta.get_field(self.field_name)
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            try:
+                return queryset.filter(**{f'{self.field_name}_id': int(self.value())})
+            except ValueError as e:
+                raise IncorrectLookupParameters(e)
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name, 'p']),
+            'display': 'All',
+        }
+
+    def rendered_widget(self):
+        return self.form_field.widget.render(
+            f'{self.parameter_name}-autocomplete', self.value() or ''
+        )
+
+
+class DoctorAutocompleteFilter(AutocompleteListFilter):
+    title = 'doctor'
+    parameter_name = 'doctor'
+    field_name = 'doctor'
+
+
+class UserAutocompleteFilter(AutocompleteListFilter):
+    title = 'user'
+    parameter_name = 'user'
+    field_name = 'user'
+
+
+class BulkActionMixin:
+    """Helpers for admin actions that run as one set-based UPDATE"""
+
+    def log_bulk_action(self, request, count, message):
+        """Record a single admin log entry for the whole batch"""
+        noun = model_ngettext(self.model._meta, count)
+        LogEntry.objects.create(
+            user_id=request.user.pk,
+            content_type_id=ContentType.objects.get_for_model(self.model).pk,
+            object_id=None,
+            object_repr=f"{count} {noun}"[:200],
+            action_flag=CHANGE,
+            change_message=message,
+        )
+        self.message_user(request, f"{message} ({count} {noun} updated)")
+
+
+class ExportActionsMixin:
+    """Admin actions streaming the selected rows as CSV or JSON Lines (see core.exports)"""
+    export_kind = None
+
+    @admin.action(description='Export selected rows as CSV', permissions=['view'])
+    def export_csv(self, request, queryset):
+        return streaming_export(request, self.export_kind, queryset, 'csv')
+
+    @admin.action(description='Export selected rows as JSON Lines', permissions=['view'])
+    def export_jsonl(self, request, queryset):
+        return streaming_export(request, self.export_kind, queryset, 'jsonl')
+
+
+class LargeTableAdmin(BulkActionMixin, admin.ModelAdmin):
+    """Changelist settings for tables expected to reach millions of rows"""
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+    list_per_page = 20
+
+    @property
+    def media(self):
+        # Select2 assets for the autocomplete list filters
+        field = self.model._meta.get_field('doctor')
+        return super().media + AutocompleteSelect(field, self.admin_site).media
+
+class DoctorChangeList(ChangeList):
+    """
+    Review stats for the displayed page only. Annotating the changelist
+    queryset would compute them for every doctor before sorting.
+    """
+
+    def get_results(self, request):
+        super().get_results(request)
+        shown = {doctor.pk: doctor for doctor in self.result_list}
+        stats = Doctor.objects.filter(pk__in=shown).with_review_stats().values_list(
+            'pk', 'review_total', 'review_average'
+        )
+        for pk, total, average in stats:
+            shown[pk].review_total, shown[pk].review_average = total, average
+
 
 @admin.register(Doctor)
-class DoctorAdmin(admin.ModelAdmin):
+class DoctorAdmin(BulkActionMixin, admin.ModelAdmin):
     list_display = [
         'name', 
         'specialization', 
@@ -10,6 +147,7 @@ class DoctorAdmin(admin.ModelAdmin):
         'hospital', 
         'city', 
         'fee', 
+        'reviews',
         'is_available',
         'created_at'
     ]
@@ -21,15 +159,101 @@ class DoctorAdmin(admin.ModelAdmin):
     ]
     search_fields = [
         'name', 
+        'registration_number',
         'specialization', 
         'hospital', 
         'city'
     ]
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['calendar_feed', 'created_at', 'updated_at']
     list_per_page = 20
+    actions = ['toggle_availability', 'adjust_fee']
+    # Rejected rows listed after an upload; the rest are only counted
+    MAX_REPORTED_ERRORS = 20
+
+    def get_changelist(self, request, **kwargs):
+        return DoctorChangeList
+
+    @admin.display(description='Reviews')
+    def reviews(self, obj):
+        if not obj.review_count:
+            return '-'
+        return f'{obj.avg_rating:.1f} ({obj.review_count})'
+
+    @admin.display(description='Calendar feed')
+    def calendar_feed(self, obj):
+        if obj.pk is None:
+            return '-'
+        return reverse('doctor_calendar', kwargs={'pk': obj.pk, 'token': feed_token('doctor', obj.pk)})
+
+    @admin.action(description='Toggle availability of selected doctors', permissions=['change'])
+    def toggle_availability(self, request, queryset):
+        count = queryset.update(is_available=~F('is_available'), updated_at=timezone.now())
+        self.log_bulk_action(request, count, 'Toggled availability')
+
+    @admin.action(description='Adjust fee of selected doctors by percentage', permissions=['change'])
+    def adjust_fee(self, request, queryset):
+        form = FeeAdjustmentForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            percentage = form.cleaned_data['percentage']
+            factor = (Decimal(100) + percentage) / Decimal(100)
+            new_fee = ExpressionWrapper(
+                Round(F('fee') * factor, 2),
+                output_field=DecimalField(max_digits=8, decimal_places=2)
+            )
+            count = queryset.update(fee=new_fee, updated_at=timezone.now())
+            self.log_bulk_action(request, count, f'Adjusted fee by {percentage}%')
+            return None
+
+        # Intermediate page asking for the percentage
+        return render(request, 'admin/core/doctor/adjust_fee.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Adjust doctor fees',
+            'opts': self.model._meta,
+            'form': form,
+            'doctor_count': queryset.count(),
+            'selected': request.POST.getlist(admin.helpers.ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': admin.helpers.ACTION_CHECKBOX_NAME,
+            'select_across': request.POST.get('select_across', '0'),
+        })
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='core_doctor_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """Upload a CSV/JSONL file and upsert its doctors, keyed on registration number"""
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+        form = DoctorImportForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            errors = []
+            on_error = lambda line, message: errors.append(f'line {line}: {message}')
+            try:
+                rows = read_rows(upload.file, detect_format(upload.name))
+            except ValueError as e:
+                form.add_error('file', str(e))
+            else:
+                importer = DoctorImporter(on_error=on_error).run(rows)
+                self.log_bulk_action(
+                    request, importer.imported, f'Imported from {upload.name} ({importer.failed} rows rejected)'
+                )
+                for error in errors[:self.MAX_REPORTED_ERRORS]:
+                    self.message_user(request, error, messages.WARNING)
+                if len(errors) > self.MAX_REPORTED_ERRORS:
+                    self.message_user(request, f'... and {len(errors) - self.MAX_REPORTED_ERRORS} more', messages.WARNING)
+                return redirect('admin:core_doctor_changelist')
+
+        return render(request, 'admin/core/doctor/import.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Import doctors',
+            'opts': self.model._meta,
+            'form': form,
+        })
 
 @admin.register(Appointment)
-class AppointmentAdmin(admin.ModelAdmin):
+class AppointmentAdmin(ExportActionsMixin, LargeTableAdmin):
     list_display = [
         'id',
         'user', 
@@ -43,23 +267,70 @@ class AppointmentAdmin(admin.ModelAdmin):
     list_filter = [
         'status', 
         'date',
-        'doctor',
+        DoctorAutocompleteFilter,
+        UserAutocompleteFilter,
         'created_at'
     ]
+    # Prefix lookups so the username/name/patient indexes can be used
     search_fields = [
-        'user__username', 
-        'doctor__name', 
-        'user__email'
+        'user__username__startswith', 
+        'doctor__name__startswith', 
+        'patient_name__startswith'
     ]
+    autocomplete_fields = ['user', 'doctor']
     readonly_fields = ['created_at', 'updated_at']
-    list_per_page = 20
+    actions = ['mark_completed', 'mark_cancelled', 'export_csv', 'export_jsonl']
+    export_kind = 'appointments'
+
+    @admin.action(description='Mark selected appointments as completed', permissions=['change'])
+    def mark_completed(self, request, queryset):
+        count = queryset.filter(status='confirmed').update(
+            status='completed', updated_at=timezone.now()
+        )
+        self.log_bulk_action(request, count, 'Marked as completed')
+
+    @admin.action(description='Mark selected appointments as cancelled', permissions=['change'])
+    def mark_cancelled(self, request, queryset):
+        now = timezone.now()
+        with transaction.atomic():
+            cancellable = queryset.filter(status__in=ACTIVE_STATUSES)
+            # Lock the rows so a payment confirmed meanwhile waits for us instead of losing its email
+            list(cancellable.select_for_update().values_list('pk', flat=True))
+            # Only patients who had paid are told; pending bookings simply lapse
+            queue_unrendered(cancellable.filter(status='confirmed'), 'cancelled')
+            count = cancellable.update(status='cancelled', updated_at=now)
+            # Only freed slots with someone waiting need a promotion
+            cancelled = queryset.filter(status='cancelled', updated_at=now)
+            waited = WaitlistEntry.objects.filter(status='waiting').filter(Exists(cancelled.filter(
+                doctor_id=OuterRef('doctor_id'), date=OuterRef('date'), time=OuterRef('time')
+            )))
+            for slot in waited.values_list('doctor_id', 'date', 'time').distinct():
+                promote_next(*slot)
+        self.log_bulk_action(request, count, 'Marked as cancelled')
     
     # Optional: Add custom method to show doctor specialization
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('user', 'doctor')
 
+@admin.register(AppointmentArchive)
+class AppointmentArchiveAdmin(LargeTableAdmin):
+    list_display = ['id', 'patient_name', 'doctor', 'user', 'date', 'time', 'status', 'fee', 'archived_at']
+    list_filter = ['status', DoctorAutocompleteFilter, UserAutocompleteFilter]
+    search_fields = ['patient_name__startswith', 'doctor__name__startswith']
+    autocomplete_fields = ['user', 'doctor']
+    date_hierarchy = 'date'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'doctor')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(ExportActionsMixin, LargeTableAdmin):
     list_display = [
         'user', 
         'doctor', 
@@ -69,15 +340,20 @@ class ReviewAdmin(admin.ModelAdmin):
     list_filter = [
         'rating', 
         'created_at',
-        'doctor'
+        DoctorAutocompleteFilter,
+        UserAutocompleteFilter
     ]
     search_fields = [
-        'user__username', 
-        'doctor__name', 
-        'comment'
+        'user__username__startswith', 
+        'doctor__name__startswith'
     ]
+    autocomplete_fields = ['user', 'doctor']
     readonly_fields = ['created_at', 'updated_at']
-    list_per_page = 20
+    actions = ['export_csv', 'export_jsonl']
+    export_kind = 'reviews'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'doctor')
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -95,6 +371,38 @@ class UserProfileAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     list_per_page = 20
 
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(BulkActionMixin, admin.ModelAdmin):
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+    list_display = ['to', 'kind', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['to__startswith']
+    readonly_fields = ['appointment', 'kind', 'to', 'subject', 'body', 'attempts', 'last_error', 'created_at', 'sent_at']
+    actions = ['retry_now']
+
+    @admin.action(description='Retry selected emails now', permissions=['change'])
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status='sent').update(status='pending', next_attempt_at=timezone.now())
+        self.log_bulk_action(request, count, 'Queued for retry')
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(LargeTableAdmin):
+    list_display = ['patient_name', 'doctor', 'user', 'date', 'time', 'status', 'created_at', 'promoted_at']
+    list_filter = ['status', DoctorAutocompleteFilter]
+    search_fields = ['patient_name__startswith', 'doctor__name__startswith']
+    autocomplete_fields = ['user', 'doctor']
+    readonly_fields = ['appointment', 'created_at', 'promoted_at']
+    actions = ['withdraw']
+
+    @admin.action(description='Withdraw selected waitlist entries', permissions=['change'])
+    def withdraw(self, request, queryset):
+        count = queryset.filter(status='waiting').update(status='withdrawn')
+        self.log_bulk_action(request, count, 'Withdrawn from waitlist')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'doctor')
+
 # Optional: You can also customize the admin site header and title
 admin.site.site_header = "MediCare+ Administration"
 admin.site.site_title = "MediCare+ Admin Portal"
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Appointment, AppointmentArchive
+
+ARCHIVABLE_STATUSES = ['completed', 'cancelled']
+
+# Columns copied verbatim from Appointment into AppointmentArchive
+COPIED_FIELDS = [field.attname for field in AppointmentArchive._meta.concrete_fields if field.name != 'archived_at']
+
+
+def archive_cutoff(days=None):
+    days = settings.APPOINTMENT_ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.localdate() - timedelta(days=days)
+
+
+def archivable(cutoff):
+    return Appointment.objects.filter(status__in=ARCHIVABLE_STATUSES, date__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move up to batch_size finished appointments older than cutoff into the archive.
+
+    Copy and delete happen in one short transaction, so a row is never in
+    both tables or in neither. Returns the number of rows moved.
+    """
+    with transaction.atomic():
+        rows = archivable(cutoff).order_by('pk')
+        if connection.features.has_select_for_update_skip_locked:
+            rows = rows.select_for_update(skip_locked=True)
+        rows = list(rows.values(*COPIED_FIELDS)[:batch_size])
+        if not rows:
+            return 0
+        AppointmentArchive.objects.bulk_create(
+            [AppointmentArchive(**row) for row in rows], ignore_conflicts=True
+        )
+        Appointment.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def user_history(user):
+    """A user's archived appointments, newest first"""
+    return AppointmentArchive.objects.filter(user=user).select_related('doctor').order_by('-date', '-time')
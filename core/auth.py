@@ -0,0 +1,97 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import UserProfile
+
+# Backends named by sessions from before CachedModelBackend; they resolve the same users
+LEGACY_BACKENDS = {'django.contrib.auth.backends.ModelBackend'}
+
+# user id -> (expires at, pickled user); a short-lived copy per worker process.
+# Every entry lives AUTH_USER_LOCAL_SECONDS, so insertion order is expiry order.
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def load_user(user_id):
+    """The user with their profile (or its absence) attached, from one query"""
+    return User._default_manager.select_related('profile').filter(pk=user_id).first()
+
+
+def cached_user(user_id):
+    """
+    A fresh User instance for ``user_id``, read through the per-worker copy
+    and then the shared cache before the database. Each call unpickles its
+    own instance, so requests never share a mutable User object.
+    """
+    now = time.monotonic()
+    entry = _local.get(user_id)
+    if entry is not None and entry[0] > now:
+        return pickle.loads(entry[1])
+
+    cache = caches[settings.AUTH_USER_CACHE]
+    data = cache.get(cache_key(user_id))
+    if data is None:
+        user = load_user(user_id)
+        if user is None:
+            return None
+        if not hasattr(user, 'profile'):
+            # Remember that there is no profile, so user.profile does not query again
+            User.profile.related.set_cached_value(user, None)
+        data = pickle.dumps(user, pickle.HIGHEST_PROTOCOL)
+        cache.set(cache_key(user_id), data, settings.AUTH_USER_CACHE_SECONDS)
+    remember(user_id, now + settings.AUTH_USER_LOCAL_SECONDS, data)
+    return pickle.loads(data)
+
+
+def remember(user_id, expires_at, data):
+    """Keep a local copy, dropping expired ones and the oldest past AUTH_USER_LOCAL_MAX_ENTRIES"""
+    with _local_lock:
+        _local.pop(user_id, None)
+        _local[user_id] = (expires_at, data)
+        now = time.monotonic()
+        while _local and (next(iter(_local.values()))[0] <= now
+                          or len(_local) > settings.AUTH_USER_LOCAL_MAX_ENTRIES):
+            _local.popitem(last=False)
+
+
+def invalidate_user(user_id):
+    """Drop a cached user; other workers' local copies expire within AUTH_USER_LOCAL_SECONDS"""
+    with _local_lock:
+        _local.pop(user_id, None)
+    caches[settings.AUTH_USER_CACHE].delete(cache_key(user_id))
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose per-request user lookup (and user.profile) is served from cache"""
+
+    def get_user(self, user_id):
+        try:
+            user_id = User._meta.pk.to_python(user_id)
+        except ValidationError:
+            return None
+        user = cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
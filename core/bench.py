@@ -0,0 +1,249 @@
+"""Shared helpers for the seed/benchmark management commands."""
+import asyncio
+import io
+import json
+import platform
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.db import connection
+from django.utils import timezone
+from importlib import import_module
+
+BENCH_USER_PREFIX = 'bench_user_'
+BENCH_STAFF_USERNAME = 'bench_admin'
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed, errors=0, statuses=None):
+    """Throughput and latency distribution for a list of request durations (seconds)"""
+    ordered = sorted(latencies)
+    count = len(ordered)
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        'requests': count,
+        'errors': errors,
+        'statuses': statuses or {},
+        'throughput_rps': round(count / elapsed, 2) if elapsed else None,
+        'mean_ms': ms(sum(ordered) / count) if count else None,
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'max_ms': ms(ordered[-1]) if ordered else None,
+    }
+
+
+def run_metadata(**extra):
+    """Describe the environment so two result files can be judged comparable"""
+    return {
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': connection.vendor,
+        'debug': settings.DEBUG,
+        **extra,
+    }
+
+
+def compare_results(baseline, current, metric='p95_ms', tolerance=0.10):
+    """
+    Compare two result documents route by route.
+
+    Returns a list of (route, baseline value, current value, relative change,
+    regressed) tuples. A route regresses when `metric` grew by more than
+    `tolerance` (a fraction).
+    """
+    rows = []
+    for route, stats in current['routes'].items():
+        before = baseline.get('routes', {}).get(route, {}).get(metric)
+        after = stats.get(metric)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        rows.append((route, before, after, change, change > tolerance))
+    return rows
+
+
+def session_cookie_for(user):
+    """Create a logged-in session for `user` and return the Cookie header value"""
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+def site_host():
+    """A host the site answers to: the first ALLOWED_HOSTS entry that names one"""
+    for host in settings.ALLOWED_HOSTS:
+        # '.example.com' matches example.com itself as well as its subdomains
+        host = host.lstrip('.')
+        if host and host != '*':
+            return host
+    return 'localhost'
+
+
+def wsgi_environ(path, query_string='', cookie=None):
+    """
+    WSGI environ for an in-process GET request, made over HTTPS to an
+    allowed host, so production settings (SECURE_SSL_REDIRECT) serve it
+    rather than redirect it
+    """
+    host = site_host()
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query_string,
+        'SERVER_NAME': host,
+        'SERVER_PORT': '443',
+        'HTTP_HOST': host,
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'https',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if cookie:
+        environ['HTTP_COOKIE'] = cookie
+    return environ
+
+
+def wsgi_get(application, path, query_string='', cookie=None):
+    """Issue a GET through a WSGI application in-process; return (status code, seconds)"""
+    environ = wsgi_environ(path, query_string, cookie)
+    status_holder = []
+
+    def start_response(status, headers, exc_info=None):
+        status_holder.append(int(status.split(' ', 1)[0]))
+
+    start = time.perf_counter()
+    result = application(environ, start_response)
+    try:
+        for _chunk in result:
+            pass
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return status_holder[0], time.perf_counter() - start
+
+
+async def asgi_get(application, path, query_string='', cookie=None):
+    """Issue a GET through an ASGI application in-process; return (status code, seconds)"""
+    headers = [(b'host', b'localhost')]
+    if cookie:
+        headers.append((b'cookie', cookie.encode()))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query_string.encode(),
+        'root_path': '',
+        'headers': headers,
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 80),
+    }
+    request_sent = False
+    disconnected = asyncio.Event()
+    status_holder = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client never disconnects early
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status_holder.append(message['status'])
+
+    start = time.perf_counter()
+    await application(scope, receive, send)
+    return status_holder[0], time.perf_counter() - start
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    """Emulates the Razorpay orders API with a fixed artificial latency"""
+    latency = 0.05
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, payload, status=200):
+        time.sleep(self.latency)
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = json.loads(self.rfile.read(length) or b'{}')
+        if self.path.rstrip('/').endswith('/orders'):
+            self._reply({
+                'id': f'order_{uuid.uuid4().hex[:14]}',
+                'entity': 'order',
+                'amount': data.get('amount'),
+                'currency': data.get('currency', 'INR'),
+                'notes': data.get('notes', {}),
+                'status': 'created',
+            })
+        else:
+            self._reply({'error': {'description': 'Not found'}}, status=404)
+
+    def do_GET(self):
+        if '/orders/' in self.path:
+            self._reply({'id': self.path.rsplit('/', 1)[-1], 'entity': 'order', 'status': 'created'})
+        else:
+            self._reply({'error': {'description': 'Not found'}}, status=404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGatewayServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_stub_gateway(port=0, latency=0.05):
+    """Start the stub gateway on a daemon thread; return (server, base URL)"""
+    handler = type('ConfiguredStubGatewayHandler', (StubGatewayHandler,), {'latency': latency})
+    server = StubGatewayServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+
+def write_json(data, path=None, stdout=None):
+    text = json.dumps(data, indent=2, default=str)
+    if path:
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(text + '\n')
+    elif stdout is not None:
+        stdout.write(text)
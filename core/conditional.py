@@ -0,0 +1,54 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.session import SessionStorage
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+
+def has_pending_messages(request):
+    """True if a flash message is waiting to be shown on the next rendered page"""
+    if CookieStorage.cookie_name in request.COOKIES:
+        return True
+    return SessionStorage.session_key in getattr(request, 'session', {})
+
+
+def conditional_page(validators):
+    """
+    Answer GET/HEAD with 304 Not Modified when the page's data has not changed.
+
+    ``validators(request, *args, **kwargs)`` returns ``(parts, last_modified)``
+    from a cheap query, or None if the resource does not exist. ``parts`` is
+    hashed into a weak ETag together with the viewer's id, because pages show
+    the logged-in user; responses carry ``Vary: Cookie`` for the same reason.
+    Last-Modified is only sent to anonymous visitors, since a timestamp alone
+    cannot tell one user's copy from another's; return None for it when
+    deletions would not move the timestamp.
+    """
+    def compute(request, *args, **kwargs):
+        if not hasattr(request, '_page_validators'):
+            result = None
+            # A 304 would leave a pending flash message unshown
+            if not has_pending_messages(request):
+                result = validators(request, *args, **kwargs)
+            request._page_validators = result
+        return request._page_validators
+
+    def etag(request, *args, **kwargs):
+        result = compute(request, *args, **kwargs)
+        if result is None:
+            return None
+        parts, _ = result
+        key = repr((settings.PAGE_ETAG_VERSION, request.user.pk, *parts))
+        return f'W/"{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"'
+
+    def last_modified(request, *args, **kwargs):
+        result = compute(request, *args, **kwargs)
+        if result is None or request.user.is_authenticated:
+            return None
+        return result[1]
+
+    def decorator(view_func):
+        return vary_on_cookie(condition(etag_func=etag, last_modified_func=last_modified)(view_func))
+    return decorator
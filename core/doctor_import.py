@@ -0,0 +1,211 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urlparse
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, transaction
+from django.utils._os import safe_join
+from django.utils.text import slugify
+
+from .models import Doctor
+
+# Columns read from an import file; registration_number is the natural key
+IMPORT_FIELDS = [
+    'registration_number', 'name', 'specialization', 'experience', 'hospital', 'address',
+    'city', 'fee', 'description', 'rating', 'is_available',
+]
+# Columns overwritten when a row matches an existing doctor
+UPDATE_FIELDS = [name for name in IMPORT_FIELDS if name != 'registration_number'] + ['updated_at']
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+BOOLEANS = {'yes': True, 'y': True, 'no': False, 'n': False}
+
+
+class ImportRowError(Exception):
+    pass
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f'Cannot tell the format of {filename!r}; use a .csv or .jsonl file')
+
+
+def read_rows(fileobj, fmt):
+    """Yield (line number, row dict) from a binary CSV or JSON Lines file, one line at a time"""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = e
+        yield number, row
+
+
+def clean_row(row):
+    """Validate a raw row with the Doctor field definitions; returns (values, image source)"""
+    if not isinstance(row, dict):
+        raise ImportRowError(f'not a JSON object: {row}')
+    values, errors = {}, []
+    for name in IMPORT_FIELDS:
+        field = Doctor._meta.get_field(name)
+        value = row.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+            if field.get_internal_type() == 'BooleanField':
+                value = BOOLEANS.get(value.lower(), value)
+        if value in (None, ''):
+            if name == 'registration_number':
+                errors.append(f'{name}: this field is required')
+                continue
+            value = field.get_default() if field.has_default() else (None if field.null else '')
+        try:
+            values[name] = field.clean(value, None)
+        except ValidationError as e:
+            errors.append(f'{name}: {" ".join(e.messages)}')
+    if errors:
+        raise ImportRowError('; '.join(errors))
+    return values, str(row.get('image') or '').strip()
+
+
+def image_name(registration_number, source):
+    """Stable storage name, so re-importing the same source skips the download"""
+    extension = os.path.splitext(urlparse(source).path)[1].lower()
+    if extension not in IMAGE_EXTENSIONS:
+        raise ImportRowError(f'unsupported file type {extension or "(none)"}')
+    digest = hashlib.md5(source.encode(), usedforsecurity=False).hexdigest()[:10]
+    return f'doctors/{slugify(registration_number)}-{digest}{extension}'
+
+
+class DoctorImporter:
+    """
+    Upsert doctors from validated rows in batches.
+
+    Each batch is one INSERT ... ON CONFLICT (registration_number) DO UPDATE
+    per image state; rows that fail validation or image ingestion are
+    reported through ``on_error(line, message)`` and never abort the batch.
+    Images are fetched (http/https) or copied (paths under ``image_root``)
+    into MEDIA_ROOT/doctors/ by a thread pool while the batch is prepared.
+    A registration number repeated within one batch keeps its last row.
+    """
+
+    def __init__(self, batch_size=1000, image_workers=8, image_root=None, dry_run=False, on_error=None):
+        self.batch_size = batch_size
+        self.image_workers = image_workers
+        self.image_root = image_root
+        self.dry_run = dry_run
+        self.on_error = on_error or (lambda line, message: None)
+        self.processed = self.imported = self.failed = self.images = 0
+
+    def run(self, rows, on_batch=None):
+        rows = iter(rows)
+        self._http = None
+        self._http_lock = threading.Lock()
+        with ThreadPoolExecutor(max_workers=self.image_workers) as self._pool:
+            try:
+                while batch := list(islice(rows, self.batch_size)):
+                    self.import_batch(batch)
+                    if on_batch:
+                        on_batch(self)
+            finally:
+                if self._http is not None:
+                    self._http.close()
+        return self
+
+    def error(self, line, message):
+        self.failed += 1
+        self.on_error(line, message)
+
+    def import_batch(self, batch):
+        self.processed += len(batch)
+        cleaned = {}
+        for line, row in batch:
+            try:
+                values, source = clean_row(row)
+            except ImportRowError as e:
+                self.error(line, str(e))
+                continue
+            cleaned[values['registration_number']] = (line, values, source)
+        if self.dry_run:
+            self.imported += len(cleaned)
+            return
+
+        with_image = []
+        pending = [(entry, self._pool.submit(self.store_image, entry[1], entry[2]))
+                   for entry in cleaned.values() if entry[2]]
+        for entry, future in pending:
+            line, values, source = entry
+            try:
+                values['image'] = future.result()
+                with_image.append(entry)
+                self.images += 1
+            except Exception as e:
+                # Keep the doctor; leave any image it already has untouched
+                self.on_error(line, f'image: {e}')
+        without_image = [entry for entry in cleaned.values() if 'image' not in entry[1]]
+
+        self.upsert(with_image, UPDATE_FIELDS + ['image'])
+        self.upsert(without_image, UPDATE_FIELDS)
+
+    def upsert(self, entries, update_fields):
+        if not entries:
+            return
+        options = dict(update_conflicts=True, unique_fields=['registration_number'], update_fields=update_fields)
+        try:
+            with transaction.atomic():
+                Doctor.objects.bulk_create([Doctor(**values) for _, values, _ in entries], **options)
+            self.imported += len(entries)
+        except DatabaseError:
+            # Find the offending rows one at a time instead of losing the batch
+            for line, values, _ in entries:
+                try:
+                    with transaction.atomic():
+                        Doctor.objects.bulk_create([Doctor(**values)], **options)
+                    self.imported += 1
+                except DatabaseError as e:
+                    self.error(line, f'database: {e}')
+
+    def store_image(self, values, source):
+        name = image_name(values['registration_number'], source)
+        if default_storage.exists(name):
+            return name
+        if urlparse(source).scheme in ('http', 'https'):
+            return default_storage.save(name, ContentFile(self.download(source)))
+        if not self.image_root:
+            raise ImportRowError('local image paths need an image root')
+        with open(safe_join(self.image_root, source), 'rb') as fh:
+            return default_storage.save(name, File(fh))
+
+    def download(self, url):
+        with self._http_lock:
+            if self._http is None:
+                # Only imports that reference remote images pay for the HTTP client
+                import httpx
+                self._http = httpx.Client(timeout=20.0, follow_redirects=True)
+        content = io.BytesIO()
+        with self._http.stream('GET', url) as response:
+            response.raise_for_status()
+            for chunk in response.iter_bytes():
+                content.write(chunk)
+                if content.tell() > MAX_IMAGE_BYTES:
+                    raise ImportRowError(f'larger than {MAX_IMAGE_BYTES // (1024 * 1024)} MB')
+        return content.getvalue()
@@ -0,0 +1,101 @@
+import csv
+import io
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Appointment, Review
+from .streaming import streaming_response
+
+CHUNK_SIZE = 2000
+# Rows per yielded piece of output; one write per row is slow under WSGI
+ROWS_PER_WRITE = 500
+
+# (column, lookup) pairs. Doctor and user columns are read through joins in
+# the same query, never by loading the related objects.
+EXPORTS = {
+    'appointments': (Appointment, [
+        ('id', 'id'),
+        ('date', 'date'),
+        ('time', 'time'),
+        ('status', 'status'),
+        ('patient_name', 'patient_name'),
+        ('fee', 'fee'),
+        ('doctor_id', 'doctor_id'),
+        ('doctor_name', 'doctor__name'),
+        ('doctor_city', 'doctor__city'),
+        ('user_id', 'user_id'),
+        ('username', 'user__username'),
+        ('email', 'user__email'),
+        ('payment_id', 'payment_id'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ]),
+    'reviews': (Review, [
+        ('id', 'id'),
+        ('rating', 'rating'),
+        ('comment', 'comment'),
+        ('doctor_id', 'doctor_id'),
+        ('doctor_name', 'doctor__name'),
+        ('user_id', 'user_id'),
+        ('username', 'user__username'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ]),
+}
+# Spreadsheets run a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def export_rows(queryset, lookups, chunk_size=CHUNK_SIZE):
+    """Tuples for a queryset, in primary key order, fetched chunk_size rows at a time"""
+    rows = queryset.select_related(None).order_by('pk').values_list(*lookups)
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def csv_chunks(rows, headers):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for count, row in enumerate(rows, start=1):
+        # Quote text a spreadsheet would run as a formula (CSV injection)
+        writer.writerow([
+            "'" + value if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+            for value in row
+        ])
+        if count % ROWS_PER_WRITE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(rows, headers):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    lines = []
+    for row in rows:
+        lines.append(encoder.encode(dict(zip(headers, row))))
+        if len(lines) == ROWS_PER_WRITE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def export_chunks(kind, queryset, fmt, chunk_size=CHUNK_SIZE):
+    """Yield an export of ``queryset`` as text pieces; memory use does not grow with row count"""
+    _, columns = EXPORTS[kind]
+    headers = [column for column, _ in columns]
+    rows = export_rows(queryset, [lookup for _, lookup in columns], chunk_size)
+    return (csv_chunks if fmt == 'csv' else jsonl_chunks)(rows, headers)
+
+
+def streaming_export(request, kind, queryset, fmt):
+    filename = f'{kind}-{timezone.localdate().isoformat()}.{fmt}'
+    response = streaming_response(request, export_chunks(kind, queryset, fmt), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -2,6 +2,23 @@ from django import forms
 from django.contrib.auth.models import User
 from .models import UserProfile
 
+class FeeAdjustmentForm(forms.Form):
+    """Percentage change applied to the fee of selected doctors in the admin"""
+    percentage = forms.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        min_value=-90,
+        max_value=500,
+        help_text='Use a negative value to reduce fees, e.g. -10 for a 10% discount.'
+    )
+
+class DoctorImportForm(forms.Form):
+    """CSV or JSON Lines file of doctors uploaded through the admin"""
+    file = forms.FileField(
+        help_text='A .csv or .jsonl file with a registration_number column. Images must be http(s) URLs. '
+                  'For very large files use the import_doctors command.'
+    )
+
 class UserProfileForm(forms.ModelForm):
     # Add email field from User model
     email = forms.EmailField(
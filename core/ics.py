@@ -0,0 +1,120 @@
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .models import Appointment
+
+# Feeds cover appointments from this many days back; older ones are history
+FEED_PAST_DAYS = 90
+EVENT_DURATION = timedelta(minutes=30)
+CHUNK_SIZE = 500
+PRODID = '-//MediCare+//Appointments//EN'
+
+STATUS = {
+    'pending_payment': 'TENTATIVE',
+    'confirmed': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+}
+
+
+def feed_token(kind, pk):
+    """Secret for a feed URL; calendar apps cannot log in, so the URL is the credential"""
+    return salted_hmac('core.ics.feed', f'{kind}:{pk}', algorithm='sha256').hexdigest()[:32]
+
+
+def check_token(kind, pk, token):
+    return constant_time_compare(feed_token(kind, pk), token)
+
+
+def feed_appointments(**filters):
+    """Appointments a feed shows: active ones from FEED_PAST_DAYS ago onwards"""
+    since = timezone.localdate() - timedelta(days=FEED_PAST_DAYS)
+    return Appointment.objects.filter(date__gte=since, status__in=list(STATUS), **filters)
+
+
+def feed_etag(appointments):
+    """
+    Strong ETag from one aggregate: any booking, cancellation or edit moves
+    the latest updated_at or the count, and the date window moves daily.
+    """
+    state = appointments.aggregate(latest=Max('updated_at'), total=Count('id'))
+    key = repr((timezone.localdate(), state['latest'], state['total']))
+    return f'"{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+def escape(text):
+    return (
+        str(text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Fold a content line at 75 octets without splitting a UTF-8 character (RFC 5545 3.1)"""
+    out, size = [], 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > 75:
+            # The continuation line's leading space counts towards its 75
+            out.append('\r\n ')
+            size = 1
+        out.append(char)
+        size += width
+    return ''.join(out) + '\r\n'
+
+
+def utc_stamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event(pk, date, time, status, updated_at, summary, location='', description=''):
+    start = timezone.make_aware(datetime.combine(date, time))
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:appointment-{pk}@medicare',
+        f'DTSTAMP:{utc_stamp(updated_at)}',
+        f'LAST-MODIFIED:{utc_stamp(updated_at)}',
+        f'DTSTART:{utc_stamp(start)}',
+        f'DTEND:{utc_stamp(start + EVENT_DURATION)}',
+        f'STATUS:{STATUS[status]}',
+        f'SUMMARY:{escape(summary)}',
+    ]
+    if location:
+        lines.append(f'LOCATION:{escape(location)}')
+    if description:
+        lines.append(f'DESCRIPTION:{escape(description)}')
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
+
+
+def calendar(name, events):
+    """Yield an iCalendar document piece by piece around an iterable of VEVENT strings"""
+    yield ''.join(fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape(name)}',
+    ])
+    yield from events
+    yield fold('END:VCALENDAR')
+
+
+def patient_events(appointments):
+    rows = appointments.values_list(
+        'id', 'date', 'time', 'status', 'updated_at', 'patient_name', 'doctor__name', 'doctor__hospital',
+    ).order_by('date', 'time')
+    for pk, date, time, status, updated_at, patient_name, doctor_name, hospital in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield event(pk, date, time, status, updated_at, f'Dr. {doctor_name} ({patient_name})', hospital)
+
+
+def doctor_events(appointments):
+    rows = appointments.values_list(
+        'id', 'date', 'time', 'status', 'updated_at', 'patient_name', 'notes',
+    ).order_by('date', 'time')
+    for pk, date, time, status, updated_at, patient_name, notes in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield event(pk, date, time, status, updated_at, patient_name, description=notes)
@@ -0,0 +1,122 @@
+import statistics
+import time
+from datetime import time as dt_time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.archive import archive_batch, archivable, archive_cutoff
+from core.bench import write_json
+from core.models import Appointment, AppointmentArchive
+
+
+def relation_sizes(table):
+    """Bytes used by a table and each of its indexes, or None if the backend cannot tell"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT indexrelid::regclass::text, pg_relation_size(indexrelid) '
+                'FROM pg_index WHERE indrelid = %s::regclass '
+                'UNION ALL SELECT %s, pg_relation_size(%s::regclass)',
+                [table, table, table],
+            )
+            return dict(cursor.fetchall())
+        if connection.vendor == 'sqlite':
+            names = [table] + [
+                name for name, info in connection.introspection.get_constraints(cursor, table).items()
+                if info['index']
+            ]
+            try:
+                cursor.execute(
+                    f'SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ({", ".join(["%s"] * len(names))}) '
+                    'GROUP BY name',
+                    names,
+                )
+            except Exception:
+                # SQLite built without the dbstat virtual table
+                return None
+            return dict(cursor.fetchall())
+    return None
+
+
+def hot_query_latency(samples=200):
+    """Median ms for the per-user list and the booking conflict check on the hot table"""
+    users = list(Appointment.objects.values_list('user_id', flat=True).distinct()[:20])
+    doctors = list(Appointment.objects.values_list('doctor_id', flat=True).distinct()[:20])
+    if not users:
+        return None
+
+    def median_ms(run):
+        timings = []
+        for i in range(samples):
+            start = time.perf_counter()
+            run(i)
+            timings.append((time.perf_counter() - start) * 1000)
+        return round(statistics.median(timings), 3)
+
+    return {
+        'my_appointments_ms': median_ms(lambda i: list(
+            Appointment.objects.filter(user_id=users[i % len(users)]).order_by('-date', '-time')
+        )),
+        'slot_conflict_ms': median_ms(lambda i: Appointment.objects.filter(
+            doctor_id=doctors[i % len(doctors)], date='2099-01-01', time=dt_time(10, 0),
+            status__in=['confirmed', 'pending_payment'],
+        ).exists()),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Move completed and cancelled appointments older than a cut-off into AppointmentArchive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int,
+                            help='Archive appointments dated before this many days ago '
+                                 '(default: APPOINTMENT_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows moved per transaction')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+        parser.add_argument('--report', action='store_true',
+                            help='Print hot-table and index sizes and query latency before and after, as JSON')
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['older_than_days'])
+        pending = archivable(cutoff).count()
+        self.stderr.write(f'{pending} appointment(s) dated before {cutoff} to archive')
+        if options['dry_run'] or not pending:
+            return
+
+        before = self.snapshot() if options['report'] else None
+
+        moved = 0
+        while True:
+            count = archive_batch(cutoff, options['batch_size'])
+            if not count:
+                break
+            moved += count
+            self.stderr.write(f'archived {moved}/{pending}')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        if options['report']:
+            report = {'archived': moved, 'before': before, 'after': self.snapshot(vacuum=True)}
+            if connection.vendor == 'postgresql':
+                report['note'] = (
+                    'pg_relation_size does not shrink when rows are deleted: VACUUM makes the space '
+                    'reusable for new rows, only VACUUM FULL or pg_repack returns it to the OS'
+                )
+            write_json(report, None, self.stdout)
+        else:
+            self.stdout.write(f'{moved} appointment(s) archived')
+
+    def snapshot(self, vacuum=False):
+        # Refresh planner statistics so timings reflect the current table; on
+        # PostgreSQL also clear the dead tuples the archive run left behind
+        statement = 'VACUUM (ANALYZE)' if vacuum and connection.vendor == 'postgresql' else 'ANALYZE'
+        with connection.cursor() as cursor:
+            cursor.execute(f'{statement} {connection.ops.quote_name(Appointment._meta.db_table)}')
+        return {
+            'hot_rows': Appointment.objects.count(),
+            'archive_rows': AppointmentArchive.objects.count(),
+            'hot_table_bytes': relation_sizes(Appointment._meta.db_table),
+            'latency': hot_query_latency(),
+        }
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time as dt_time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+from django.utils import timezone
+
+from core.bench import (
+    BENCH_USER_PREFIX, asgi_get, run_metadata, session_cookie_for,
+    start_stub_gateway, summarize, wsgi_get, write_json,
+)
+from core.models import Doctor, Appointment
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent-request capacity of one ASGI worker against a sync WSGI '
+        'worker on the payment-order endpoint, using a local stub gateway'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=50, help='In-flight requests for the ASGI worker')
+        parser.add_argument('--wsgi-threads', type=int, default=1,
+                            help='Threads per WSGI worker (1 = gunicorn sync worker)')
+        parser.add_argument('--latency-ms', type=float, default=50.0, help='Stub gateway latency per call')
+        parser.add_argument('--output', help='Write the JSON result to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username__startswith=BENCH_USER_PREFIX).order_by('id').first()
+        doctor = Doctor.objects.first()
+        if user is None or doctor is None:
+            raise CommandError('No bench data found; run "manage.py seed_bench" first.')
+
+        server, base_url = start_stub_gateway(latency=options['latency_ms'] / 1000)
+        settings.RAZORPAY_API_BASE = base_url
+        settings.RATELIMIT_ENABLED = False
+
+        appointment = Appointment.objects.create(
+            user=user,
+            doctor=doctor,
+            patient_name='Bench patient',
+            date=timezone.localdate() + timedelta(days=30),
+            time=dt_time(10, 0),
+            fee=doctor.fee,
+            status='pending_payment',
+        )
+        path = reverse('create_payment_order', kwargs={'appointment_id': appointment.id})
+        cookie = session_cookie_for(user)
+
+        try:
+            wsgi = self.run_wsgi(path, cookie, options)
+            asgi = asyncio.run(self.run_asgi(path, cookie, options))
+        finally:
+            appointment.delete()
+            server.shutdown()
+
+        document = {
+            'meta': run_metadata(
+                endpoint='create_payment_order',
+                requests=options['requests'],
+                asgi_concurrency=options['concurrency'],
+                wsgi_threads=options['wsgi_threads'],
+                gateway_latency_ms=options['latency_ms'],
+            ),
+            'wsgi': wsgi,
+            'asgi': asgi,
+            'capacity_ratio': round(asgi['throughput_rps'] / wsgi['throughput_rps'], 2)
+            if wsgi['throughput_rps'] else None,
+        }
+        write_json(document, options['output'], self.stdout)
+
+    def run_wsgi(self, path, cookie, options):
+        application = get_wsgi_application()
+        wsgi_get(application, path, cookie=cookie)
+
+        latencies, statuses = [], {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['wsgi_threads']) as pool:
+            for status, seconds in pool.map(
+                lambda _: wsgi_get(application, path, cookie=cookie), range(options['requests'])
+            ):
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                latencies.append(seconds)
+        return summarize(latencies, time.perf_counter() - start, statuses=statuses)
+
+    async def run_asgi(self, path, cookie, options):
+        application = get_asgi_application()
+        await asgi_get(application, path, cookie=cookie)
+
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def one_request():
+            async with semaphore:
+                return await asgi_get(application, path, cookie=cookie)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one_request() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - start
+
+        statuses = {}
+        for status, _ in results:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return summarize([seconds for _, seconds in results], elapsed, statuses=statuses)
@@ -0,0 +1,91 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bench import run_metadata, write_json
+
+# What a WSGI worker does before it can serve its first request
+BOOT_SCRIPT = (
+    'import django; django.setup(); '
+    'from django.urls import get_resolver; get_resolver().url_patterns; '
+    'from medi_care.wsgi import application; '
+    'import resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)'
+)
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us)} from `python -X importtime` output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Measure worker startup: import time (python -X importtime), wall time and baseline RSS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start')
+        parser.add_argument('--top', type=int, default=15, help='Slowest modules to list')
+        parser.add_argument('--output', help='Write the JSON result to this file instead of stdout')
+        parser.add_argument('--compare', help='Baseline JSON result to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.10,
+                            help='Allowed relative growth in startup time before failing --compare')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'medi_care.settings')}
+
+        wall_ms, rss_kb, import_runs = [], [], []
+        for _ in range(options['runs']):
+            start = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            wall_ms.append((time.perf_counter() - start) * 1000)
+            if proc.returncode != 0:
+                raise CommandError(proc.stderr[-2000:])
+            rss_kb.append(int(proc.stdout.strip().splitlines()[-1]))
+            import_runs.append(parse_importtime(proc.stderr))
+
+        # Median cumulative time per module across runs
+        names = set().union(*import_runs)
+        cumulative = {
+            name: statistics.median(run[name][1] for run in import_runs if name in run)
+            for name in names
+        }
+        top_level = [name for name in names if '.' not in name]
+        slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:options['top']]
+
+        document = {
+            'meta': run_metadata(runs=options['runs']),
+            'startup_ms': round(statistics.median(wall_ms), 1),
+            'import_ms': round(sum(cumulative[name] for name in top_level) / 1000, 1),
+            'rss_mb': round(statistics.median(rss_kb) / 1024, 1),
+            'modules_imported': round(statistics.median(len(run) for run in import_runs)),
+            'slowest_imports_ms': {name: round(us / 1000, 1) for name, us in slowest},
+            'heavy_dependencies_loaded': {
+                name: name in names for name in ('razorpay', 'reportlab', 'httpx', 'requests')
+            },
+        }
+        write_json(document, options['output'], self.stdout)
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as fh:
+                baseline = json.load(fh)
+            change = (document['startup_ms'] - baseline['startup_ms']) / baseline['startup_ms']
+            self.stderr.write(
+                f"startup {baseline['startup_ms']} ms -> {document['startup_ms']} ms ({change:+.1%}), "
+                f"rss {baseline['rss_mb']} MB -> {document['rss_mb']} MB"
+            )
+            if change > options['tolerance']:
+                raise CommandError('Worker startup time regressed')
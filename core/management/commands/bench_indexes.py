@@ -0,0 +1,151 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.bench import percentile, run_metadata, write_json
+from core.models import Appointment, Doctor, Review
+from core.slot_events import COMMIT_LAG
+
+# Indexes added for the hot query shapes, by model
+HOT_INDEXES = [
+    (Appointment, 'appt_slot_idx'),
+    (Appointment, 'appt_updated_idx'),
+    (Review, 'review_doctor_created_idx'),
+    (Doctor, 'doctor_available_rank_idx'),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+def hot_queries(samples):
+    """
+    name -> (index it is meant for, queryset for sample i, how to run it).
+    Queries with no index of their own are controls, served by the foreign
+    key indexes Django creates.
+    """
+    users, doctors, slots = samples['users'], samples['doctors'], samples['slots']
+    recent = timezone.now() - COMMIT_LAG
+    return {
+        'slot_conflict': ('appt_slot_idx', lambda i: Appointment.objects.filter(
+            doctor_id=slots[i % len(slots)][0], date=slots[i % len(slots)][1], time=slots[i % len(slots)][2],
+            status__in=['confirmed', 'pending_payment'],
+        ), 'exists'),
+        'slot_changes': ('appt_updated_idx', lambda i: Appointment.objects.filter(
+            updated_at__gt=recent,
+        ).order_by('updated_at').values_list('doctor_id', 'date', 'time', 'status', 'updated_at'), 'list'),
+        'my_appointments': (None, lambda i: Appointment.objects.filter(
+            user_id=users[i % len(users)],
+        ).order_by('-date', '-time'), 'list'),
+        'has_consulted': (None, lambda i: Appointment.objects.filter(
+            user_id=users[i % len(users)], doctor_id=doctors[i % len(doctors)], status='completed',
+        ), 'exists'),
+        'doctor_reviews': ('review_doctor_created_idx', lambda i: Review.objects.filter(
+            doctor_id=doctors[i % len(doctors)],
+        ).order_by('-created_at')[:20], 'list'),
+        'home_top_rated': ('doctor_available_rank_idx', lambda i: Doctor.objects.filter(
+            is_available=True,
+        ).order_by('-rating', '-experience')[:3], 'list'),
+    }
+
+
+def statement(queryset, kind):
+    """
+    The SQL a queryset runs, so timings cover the database and not building
+    model instances, which no index can speed up.
+    """
+    query = queryset.query.exists() if kind == 'exists' else queryset.query
+    return query.get_compiler(queryset.db).as_sql()
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the hot queries and capture their plans with and without the composite indexes. '
+        'The "without" pass drops the indexes inside a transaction that is rolled back; on '
+        'PostgreSQL that holds an exclusive lock on the tables, so run it against bench data only.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=200, help='Executions per query and pass')
+        parser.add_argument('--samples', type=int, default=50, help='Distinct users/doctors/slots cycled through')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            existing = {
+                table: connection.introspection.get_constraints(cursor, table)
+                for table in {model._meta.db_table for model, _ in HOT_INDEXES}
+            }
+        missing = [name for model, name in HOT_INDEXES if name not in existing[model._meta.db_table]]
+        if missing:
+            raise CommandError(f'Indexes missing (run migrate first): {", ".join(missing)}')
+
+        samples = self.pick_samples(options['samples'])
+        if not samples['users']:
+            raise CommandError('No appointments to query; seed data first (seed_bench)')
+        queries = hot_queries(samples)
+
+        before = None
+        try:
+            with transaction.atomic():
+                # Plain DROP INDEX statements: SQLite's schema editor refuses to run inside atomic()
+                template = connection.SchemaEditorClass.sql_delete_index
+                quote = connection.ops.quote_name
+                with connection.cursor() as cursor:
+                    for model, name in HOT_INDEXES:
+                        cursor.execute(template % {'name': quote(name), 'table': quote(model._meta.db_table)})
+                before = self.measure(queries, options['runs'])
+                raise Rollback
+        except Rollback:
+            pass
+        after = self.measure(queries, options['runs'])
+
+        report = {'metadata': run_metadata(runs=options['runs']), 'queries': {}}
+        for name, (index, _, _) in queries.items():
+            report['queries'][name] = {'index': index, 'before': before[name], 'after': after[name]}
+            speedup = before[name]['median_ms'] / after[name]['median_ms'] if after[name]['median_ms'] else None
+            report['queries'][name]['speedup'] = round(speedup, 2) if speedup else None
+            uses = f"uses {index}: {after[name]['uses_index']}" if index else 'control'
+            self.stderr.write(
+                f"{name:16} {before[name]['median_ms']:8.3f} ms -> {after[name]['median_ms']:8.3f} ms "
+                f"(x{report['queries'][name]['speedup']})  {uses}"
+            )
+        write_json(report, options['output'], self.stdout)
+
+    def pick_samples(self, count):
+        rows = Appointment.objects.values_list('user_id', 'doctor_id', 'date', 'time').order_by('?')[:count]
+        rows = list(rows)
+        return {
+            'users': [row[0] for row in rows],
+            'doctors': [row[1] for row in rows],
+            'slots': [(row[1], row[2], row[3]) for row in rows],
+        }
+
+    def measure(self, queries, runs):
+        # Fresh planner statistics for whichever indexes exist in this pass
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        results = {}
+        for name, (index, build, kind) in queries.items():
+            # exists() drops the ordering; explain the statement that actually runs
+            plan = (build(0).order_by()[:1] if kind == 'exists' else build(0)).explain()
+            timings = []
+            with connection.cursor() as cursor:
+                for i in range(runs):
+                    sql, params = statement(build(i), kind)
+                    start = time.perf_counter()
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                    timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[name] = {
+                'median_ms': round(statistics.median(timings), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'plan': plan,
+                'uses_index': index in plan if index else None,
+            }
+        return results
@@ -0,0 +1,224 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+
+from core import urls as core_urls
+from core.bench import (
+    BENCH_USER_PREFIX, BENCH_STAFF_USERNAME, compare_results, run_metadata,
+    session_cookie_for, summarize, wsgi_get, write_json,
+)
+from core.models import Doctor, Appointment
+
+# Routes that call out to third parties or only make sense as POST targets
+DEFAULT_EXCLUDE = ['create_payment_order', 'logout']
+
+
+class Command(BaseCommand):
+    help = 'Drive every core route concurrently through the WSGI app and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per route')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent in-process clients')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per route')
+        parser.add_argument('--route', action='append', dest='routes', help='Only run these URL names')
+        parser.add_argument('--exclude', action='append', default=None,
+                            help=f'URL names to skip (default: {", ".join(DEFAULT_EXCLUDE)})')
+        parser.add_argument('--anonymous', action='store_true', help='Send requests without a session')
+        parser.add_argument('--admin', action='store_true',
+                            help='Also benchmark the Appointment and Review admin changelists')
+        parser.add_argument('--output', help='Write the JSON result to this file instead of stdout')
+        parser.add_argument('--compare', help='Baseline JSON result to compare against')
+        parser.add_argument('--metric', default='p95_ms', help='Metric used for --compare')
+        parser.add_argument('--tolerance', type=float, default=0.10,
+                            help='Allowed relative slowdown before a route counts as regressed')
+        parser.add_argument('--perf-overhead', type=float, nargs='?', const=1.0, metavar='RATE',
+                            help='Time each route, one request at a time, with PerformanceMiddleware off and '
+                                 'sampling at RATE (default 1)')
+
+    def handle(self, *args, **options):
+        if options['perf_overhead'] and options['compare']:
+            raise CommandError('--perf-overhead results cannot be compared with --compare')
+        user = User.objects.filter(username__startswith=BENCH_USER_PREFIX).order_by('id').first()
+        if user is None:
+            raise CommandError('No bench data found; run "manage.py seed_bench" first.')
+
+        # Prefer the busiest bench user and doctor so pages have realistic content
+        appointment = (
+            Appointment.objects.filter(user__username__startswith=BENCH_USER_PREFIX, status='completed')
+            .select_related('user').order_by('-date').first()
+        )
+        if appointment is not None:
+            user = appointment.user
+        doctor = Doctor.objects.filter(appointments__user=user).first() or Doctor.objects.first()
+        # One client hammering each route would otherwise just measure 429s
+        settings.RATELIMIT_ENABLED = False
+        targets = self.build_targets(user, doctor, appointment, options)
+
+        cookie = None if options['anonymous'] else session_cookie_for(user)
+        staff_cookie = None
+        if options['admin']:
+            staff_cookie = session_cookie_for(User.objects.get(username=BENCH_STAFF_USERNAME))
+            targets += self.admin_targets()
+
+        if options['perf_overhead']:
+            applications = self.perf_applications(options['perf_overhead'])
+        else:
+            application = get_wsgi_application()
+        results = {}
+        for name, path, query, needs_staff in targets:
+            self.stderr.write(f'{name} {path}{"?" + query if query else ""}')
+            route_cookie = staff_cookie if needs_staff else cookie
+            if options['perf_overhead']:
+                results[name] = self.run_perf_overhead(applications, path, query, route_cookie, options)
+            else:
+                results[name] = self.run_route(application, path, query, route_cookie, options)
+
+        document = {
+            'meta': run_metadata(
+                requests_per_route=options['requests'],
+                concurrency=options['concurrency'],
+                anonymous=options['anonymous'],
+                perf_overhead=options['perf_overhead'],
+            ),
+            'routes': results,
+        }
+        write_json(document, options['output'], self.stdout)
+
+        if options['compare']:
+            self.compare(document, options)
+
+    def build_targets(self, user, doctor, appointment, options):
+        exclude = set(options['exclude'] if options['exclude'] is not None else DEFAULT_EXCLUDE)
+        values = {
+            'id': doctor.id,
+            'doctor_id': doctor.id,
+            'appointment_id': appointment.id if appointment else 0,
+        }
+        queries = {'unified_search': f'q={doctor.city}'}
+
+        targets = []
+        for pattern in core_urls.urlpatterns:
+            name = getattr(pattern, 'name', None)
+            if not name or name in exclude:
+                continue
+            if options['routes'] and name not in options['routes']:
+                continue
+            missing = set(pattern.pattern.converters) - set(values)
+            if missing:
+                # Routes keyed on tokens or rows the bench data does not provide
+                self.stderr.write(f'Skipping {name}: no bench value for {", ".join(sorted(missing))}')
+                continue
+            kwargs = {key: values[key] for key in pattern.pattern.converters}
+            targets.append((name, reverse(name, kwargs=kwargs), queries.get(name, ''), False))
+        return targets
+
+    def admin_targets(self):
+        appointments = reverse('admin:core_appointment_changelist')
+        reviews = reverse('admin:core_review_changelist')
+        return [
+            ('admin:appointment_changelist', appointments, '', True),
+            ('admin:appointment_changelist_deep', appointments, 'p=500', True),
+            ('admin:appointment_changelist_search', appointments, 'q=bench', True),
+            ('admin:review_changelist', reviews, '', True),
+        ]
+
+    def run_route(self, application, path, query, cookie, options):
+        for _ in range(options['warmup']):
+            wsgi_get(application, path, query, cookie)
+
+        def one_request(_):
+            queries = [0]
+
+            def count(execute, sql, params, many, context):
+                queries[0] += 1
+                return execute(sql, params, many, context)
+
+            try:
+                with connection.execute_wrapper(count):
+                    status, seconds = wsgi_get(application, path, query, cookie)
+            except Exception:
+                return None, None, queries[0]
+            return status, seconds, queries[0]
+
+        latencies, statuses, errors, total_queries = [], {}, 0, 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for status, seconds, queries in pool.map(one_request, range(options['requests'])):
+                total_queries += queries
+                if status is None or status >= 500:
+                    errors += 1
+                    continue
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                latencies.append(seconds)
+        elapsed = time.perf_counter() - start
+
+        stats = summarize(latencies, elapsed, errors=errors, statuses=statuses)
+        stats['queries_per_request'] = round(total_queries / options['requests'], 2)
+        return stats
+
+    def perf_applications(self, rate):
+        """The WSGI app without PerformanceMiddleware, and with it sampling at ``rate``"""
+        applications = []
+        for sample_rate in (0, rate):
+            # The middleware reads the rate once, when the handler loads it
+            with override_settings(PERF_SAMPLE_RATE=sample_rate):
+                applications.append(WSGIHandler())
+        return applications
+
+    def run_perf_overhead(self, applications, path, query, cookie, options):
+        """
+        Alternate single requests between the two applications, so load and
+        cache drift during the run land on both sides alike.
+        """
+        for application in applications:
+            for _ in range(options['warmup']):
+                wsgi_get(application, path, query, cookie)
+
+        latencies, errors = ([], []), [0, 0]
+        for n in range(options['requests']):
+            # Swap who goes first every round so neither side always follows the other
+            for index in ((0, 1) if n % 2 else (1, 0)):
+                try:
+                    status, seconds = wsgi_get(applications[index], path, query, cookie)
+                except Exception:
+                    status = None
+                if status is None or status >= 500:
+                    errors[index] += 1
+                else:
+                    latencies[index].append(seconds)
+
+        off, on = (summarize(latencies[index], None, errors=errors[index]) for index in (0, 1))
+        result = {'off': off, 'on': on}
+        # Below a rate of 1 only some requests pay, which the mean reflects and the median may not
+        for metric in ('p50_ms', 'mean_ms'):
+            if not (off[metric] and on[metric]):
+                continue
+            overhead = on[metric] / off[metric] - 1
+            result[f'{metric[:-3]}_overhead'] = round(overhead, 4)
+            self.stderr.write(f'  {metric[:-3]} {off[metric]:.3f} -> {on[metric]:.3f} ms ({overhead:+.1%})')
+        return result
+
+    def compare(self, document, options):
+        with open(options['compare'], encoding='utf-8') as fh:
+            baseline = json.load(fh)
+
+        regressed = []
+        for route, before, after, change, is_regression in compare_results(
+            baseline, document, options['metric'], options['tolerance']
+        ):
+            marker = 'REGRESSED' if is_regression else 'ok'
+            self.stderr.write(f'{route:<45} {before:>10.2f} -> {after:>10.2f} ({change:+.1%}) {marker}')
+            if is_regression:
+                regressed.append(route)
+
+        if regressed:
+            raise CommandError(f'{len(regressed)} route(s) regressed on {options["metric"]}: {", ".join(regressed)}')
@@ -0,0 +1,48 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.recommendations import (
+    TOP_K, all_patient_ids, build_doctor_recommendations, build_user_recommendations,
+    drop_stale_user_recommendations, recently_active_user_ids,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Build doctor-to-doctor recommendations from appointment co-occurrence, '
+        'then per-user recommendations for the home page'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since-hours', type=float,
+                            help='Incremental run: only refresh users with appointment activity in this window, '
+                                 'reusing the existing doctor recommendations')
+        parser.add_argument('--top-k', type=int, default=TOP_K)
+        parser.add_argument('--doctor-chunk-size', type=int, default=500)
+        parser.add_argument('--user-chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        if options['since_hours'] is not None:
+            since = timezone.now() - timedelta(hours=options['since_hours'])
+            users = recently_active_user_ids(since)
+            refreshed = build_user_recommendations(users, options['user_chunk_size'], options['top_k'])
+            self.stdout.write(
+                f'{refreshed} recently active user(s) refreshed in {time.perf_counter() - start:.1f}s'
+            )
+            return
+
+        doctors = build_doctor_recommendations(options['doctor_chunk_size'], options['top_k'])
+        self.stderr.write(f'doctor recommendations: {doctors} doctor(s) ({time.perf_counter() - start:.1f}s)')
+
+        patients = all_patient_ids()
+        users = build_user_recommendations(patients, options['user_chunk_size'], options['top_k'])
+        dropped = drop_stale_user_recommendations(patients)
+        self.stdout.write(
+            f'{doctors} doctor(s) and {users} user(s) updated, {dropped} stale user(s) dropped '
+            f'in {time.perf_counter() - start:.1f}s'
+        )
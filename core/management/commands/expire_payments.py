@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Appointment
+from core.waitlist import cancel_and_promote
+
+
+class Command(BaseCommand):
+    help = 'Cancel appointments left unpaid too long and hand their slots to the waitlist; run from cron'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-minutes', type=int,
+                            help='Expire appointments unpaid for this long (default: PAYMENT_EXPIRY_MINUTES)')
+
+    def handle(self, *args, **options):
+        minutes = options['older_than_minutes']
+        if minutes is None:
+            minutes = settings.PAYMENT_EXPIRY_MINUTES
+        cutoff = timezone.now() - timedelta(minutes=minutes)
+
+        expired = 0
+        for appointment in Appointment.objects.filter(status='pending_payment', updated_at__lt=cutoff).iterator():
+            # A payment verified meanwhile wins: the cancel only applies while still unpaid
+            if cancel_and_promote(appointment, ['pending_payment']):
+                expired += 1
+        self.stdout.write(f'{expired} unpaid appointment(s) expired')
@@ -0,0 +1,55 @@
+import resource
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import CHUNK_SIZE, EXPORTS, FORMATS, export_chunks
+from core.models import Appointment
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = 'Stream appointments or reviews to CSV or JSON Lines with flat memory use'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', '-o', default='-', help="File to write, or '-' for stdout")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows fetched from the database at a time')
+        parser.add_argument('--status', help='Only appointments with this status')
+        parser.add_argument('--since', help='Only rows created on or after this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        model, _ = EXPORTS[options['kind']]
+        queryset = model.objects.all()
+        if options['status']:
+            if model is not Appointment:
+                raise CommandError('--status only applies to appointments')
+            queryset = queryset.filter(status=options['status'])
+        if options['since']:
+            queryset = queryset.filter(created_at__date__gte=options['since'])
+
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', newline='', encoding='utf-8')
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        written = 0
+        try:
+            for piece in export_chunks(options['kind'], queryset, options['format'], options['chunk_size']):
+                output.write(piece)
+                written += len(piece)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = time.perf_counter() - start
+
+        rows = queryset.count()
+        self.stderr.write(
+            f'{rows} row(s), {written / 1e6:.1f} MB in {elapsed:.1f}s '
+            f'({rows / elapsed if elapsed else 0:.0f} rows/s); '
+            f'peak RSS {peak_rss_mb():.0f} MB (+{peak_rss_mb() - rss_before:.0f} MB during export)'
+        )
@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from core.snapshots import (
+    doctor_paths, doctor_versions, listing_paths, read_manifest, remove_doctor,
+    render_to_file, write_manifest,
+)
+
+_application = None
+
+
+def _init_worker():
+    global _application
+    from django.core.wsgi import get_wsgi_application
+    # Render through Django itself, never from the snapshots being replaced
+    settings.SNAPSHOT_MAX_AGE = 0
+    _application = get_wsgi_application()
+
+
+def _render(paths):
+    return [(path, render_to_file(_application, path)) for path in paths]
+
+
+class Command(BaseCommand):
+    help = (
+        'Render home, the doctor list and every doctor page as anonymous HTML snapshots '
+        'under SNAPSHOT_ROOT; only doctors changed since the last run are re-rendered'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Rendering processes (1 renders in this process)')
+        parser.add_argument('--full', action='store_true', help='Re-render every doctor page')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        os.makedirs(settings.SNAPSHOT_ROOT, exist_ok=True)
+
+        manifest = {'doctors': {}} if options['full'] else read_manifest()
+        previous = manifest.get('doctors', {})
+        versions = doctor_versions()
+
+        removed = [pk for pk in previous if pk not in versions]
+        for pk in removed:
+            remove_doctor(pk)
+        changed = [pk for pk, version in versions.items() if previous.get(pk) != version]
+
+        owner = {}
+        for pk in changed:
+            for path in doctor_paths(pk):
+                owner[path] = pk
+        # Listings show every doctor, so they are always refreshed
+        paths = listing_paths() + list(owner)
+
+        results = self.render(paths, options['workers'])
+
+        failed = [(path, status) for path, status in results if status != 200]
+        for path, status in failed:
+            self.stderr.write(f'{path}: HTTP {status}, not exported')
+        if any(path not in owner for path, _ in failed):
+            raise CommandError('A listing page failed to render; the previous snapshot manifest is kept')
+
+        # Doctors that failed keep their old version so the next run retries them
+        failed_doctors = {owner[path] for path, _ in failed}
+        manifest = {
+            'generated_at': timezone.now().isoformat(),
+            'doctors': {
+                pk: (previous.get(pk) if pk in failed_doctors else version)
+                for pk, version in versions.items()
+                if pk not in failed_doctors or pk in previous
+            },
+        }
+        write_manifest(manifest)
+        self.stdout.write(
+            f'{len(results) - len(failed)} page(s) rendered ({len(changed)} changed doctor(s), '
+            f'{len(removed)} removed) in {time.perf_counter() - start:.1f}s'
+        )
+
+    def render(self, paths, workers):
+        if workers <= 1:
+            _init_worker()
+            return _render(paths)
+
+        # Child processes must open their own database connections
+        connections.close_all()
+        chunks = [paths[i::workers * 4] for i in range(workers * 4)]
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+            return [result for chunk in pool.map(_render, chunks) for result in chunk]
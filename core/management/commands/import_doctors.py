@@ -0,0 +1,67 @@
+import csv
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.doctor_import import DoctorImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Create or update doctors from a CSV or JSON Lines file, keyed on registration_number'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows upserted per statement')
+        parser.add_argument('--image-workers', type=int, default=8, help='Images fetched or copied in parallel')
+        parser.add_argument('--image-root', help='Directory that relative image paths in the file are read from')
+        parser.add_argument('--errors', help='Write rejected rows to this CSV file instead of stderr')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = options['format'] or detect_format(path)
+        except ValueError as e:
+            raise CommandError(e)
+
+        error_file = open(options['errors'], 'w', newline='', encoding='utf-8') if options['errors'] else None
+        if error_file:
+            error_writer = csv.writer(error_file)
+            error_writer.writerow(['line', 'error'])
+            on_error = lambda line, message: error_writer.writerow([line, message])
+        else:
+            on_error = lambda line, message: self.stderr.write(f'line {line}: {message}')
+
+        importer = DoctorImporter(
+            batch_size=options['batch_size'],
+            image_workers=options['image_workers'],
+            image_root=options['image_root'],
+            dry_run=options['dry_run'],
+            on_error=on_error,
+        )
+        progress = lambda importer: self.stderr.write(
+            f'{importer.processed} rows read, {importer.imported} imported, {importer.failed} rejected'
+        )
+
+        start = time.perf_counter()
+        try:
+            source = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        except OSError as e:
+            raise CommandError(e)
+        try:
+            importer.run(read_rows(source, fmt), on_batch=progress)
+        finally:
+            if path != '-':
+                source.close()
+            if error_file:
+                error_file.close()
+        elapsed = time.perf_counter() - start
+
+        verb = 'validated' if options['dry_run'] else 'imported'
+        self.stdout.write(
+            f'{importer.imported} doctor(s) {verb}, {importer.failed} row(s) rejected, '
+            f'{importer.images} image(s) stored in {elapsed:.1f}s '
+            f'({importer.processed / elapsed if elapsed else 0:.0f} rows/s)'
+        )
@@ -0,0 +1,102 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import profiling
+from core.profiling import ProfilingError
+
+ACTIONS = ['status', 'memory-start', 'memory-snapshot', 'memory-stop', 'cpu', 'cpu-stop', 'report']
+
+
+class Command(BaseCommand):
+    help = (
+        'Profile the running workers that share PROFILING_ROOT (PROFILING_ENABLED must be on): '
+        'tracemalloc snapshots with top allocation growth, and sampled (collapsed stacks) or '
+        'cProfile (pstats) CPU profiles of the next requests to a URL name.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=ACTIONS)
+        parser.add_argument('target', nargs='?',
+                            help='URL name for cpu, command id for report')
+        parser.add_argument('--frames', type=int, default=10, help='memory-start: traceback depth to record')
+        parser.add_argument('--top', type=int, default=25, help='memory-snapshot: allocation sites to list')
+        parser.add_argument('--requests', type=int, default=20, help='cpu: requests to profile in each worker')
+        parser.add_argument('--format', choices=sorted(profiling.CPU_FORMATS), default='collapsed')
+        parser.add_argument('--interval-ms', type=float, default=5.0, help='cpu: sampling interval')
+        parser.add_argument('--timeout', type=int, default=600, help='cpu: disarm after this many seconds')
+        parser.add_argument('--wait', type=float, default=0,
+                            help='Wait up to this many seconds for results, then print the report')
+        parser.add_argument('--sort', choices=profiling.PSTATS_SORTS, default='cumulative',
+                            help='report: pstats sort order')
+        parser.add_argument('-o', '--output', help='report: write to this file (pstats: a .prof file)')
+
+    def handle(self, *args, **options):
+        if not settings.PROFILING_ENABLED:
+            self.stderr.write('PROFILING_ENABLED is off: workers are not listening for commands')
+        action = options['action']
+        try:
+            if action == 'status':
+                return self.status()
+            if action == 'report':
+                return self.report(self.command_id(options['target']), options)
+            if action.startswith('memory-'):
+                command = profiling.issue_memory(action[len('memory-'):], options['frames'], options['top'])
+            elif action == 'cpu-stop':
+                command = profiling.stop_cpu()
+            else:
+                if not options['target']:
+                    raise CommandError('cpu needs a URL name, e.g. download_receipt')
+                command = profiling.issue_cpu(
+                    options['target'], options['requests'], options['format'],
+                    options['interval_ms'], options['timeout'],
+                )
+        except ProfilingError as e:
+            raise CommandError(e)
+
+        self.stdout.write(f"Issued command {command['id']}; workers apply it within "
+                          f"{settings.PROFILING_POLL_SECONDS:g}s")
+        if options['wait'] and (action == 'memory-snapshot' or action == 'cpu'):
+            self.wait_for(command['id'], options['wait'])
+            self.report(command['id'], options)
+
+    def command_id(self, target):
+        try:
+            return int(target)
+        except (TypeError, ValueError):
+            raise CommandError('report needs a command id (see status)')
+
+    def status(self):
+        control = profiling.read_control()
+        for kind, command in sorted(control.items()):
+            details = ', '.join(f'{key}={value}' for key, value in command.items() if key not in ('id', 'issued_at'))
+            self.stdout.write(f"{kind}: command {command['id']} ({details})")
+        for entry in profiling.results():
+            self.stdout.write(f"  {entry['name']:32} {entry['size']:>10} bytes  "
+                              f"{time.strftime('%H:%M:%S', time.localtime(entry['modified']))}")
+
+    def wait_for(self, command_id, seconds):
+        deadline = time.monotonic() + seconds
+        while not profiling.results(command_id) and time.monotonic() < deadline:
+            time.sleep(0.5)
+        # Let the other workers catch up with the first one
+        time.sleep(min(settings.PROFILING_POLL_SECONDS, max(0.0, deadline - time.monotonic())))
+
+    def report(self, command_id, options):
+        try:
+            kind, content = profiling.report(command_id)
+        except ProfilingError as e:
+            raise CommandError(e)
+        output = options['output']
+        if kind == 'pstats':
+            if output:
+                with open(output, 'wb') as fh:
+                    fh.write(profiling.dump_stats(content))
+                return self.stderr.write(f'Wrote {output}')
+            content = profiling.pstats_text(content, sort=options['sort'])
+        if output:
+            with open(output, 'w', encoding='utf-8') as fh:
+                fh.write(content)
+            return self.stderr.write(f'Wrote {output}')
+        self.stdout.write(content, ending='')
@@ -0,0 +1,71 @@
+import glob
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Summarise captured SQL fingerprints per view (requires QUERY_INSIGHTS_ENABLED)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help='Number of fingerprints to show')
+        parser.add_argument('--view', help='Only include requests handled by this view name')
+        parser.add_argument(
+            '--sort', choices=['total', 'count', 'max'], default='total',
+            help='Rank fingerprints by total time, execution count or worst single execution'
+        )
+        parser.add_argument('--file', default=settings.QUERY_INSIGHTS_LOG_FILE, help='Query log to read')
+        parser.add_argument('--json', action='store_true', help='Emit the report as JSON')
+
+    def handle(self, *args, **options):
+        report = {}
+        requests = 0
+
+        # Read the current log and any rotated backups
+        for path in sorted(glob.glob(options['file'] + '*')):
+            with open(path, encoding='utf-8') as fh:
+                for line in fh:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if options['view'] and record['view'] != options['view']:
+                        continue
+                    requests += 1
+                    for query in record['queries']:
+                        key = (record['view'], query['fingerprint'])
+                        entry = report.setdefault(key, {
+                            'view': record['view'],
+                            'fingerprint': query['fingerprint'],
+                            'count': 0,
+                            'total_ms': 0.0,
+                            'max_ms': 0.0,
+                            'explain': None,
+                        })
+                        entry['count'] += query['count']
+                        entry['total_ms'] += query['total_ms']
+                        if query['max_ms'] >= entry['max_ms']:
+                            entry['max_ms'] = query['max_ms']
+                            entry['explain'] = query['explain'] or entry['explain']
+
+        sort_key = {'total': 'total_ms', 'count': 'count', 'max': 'max_ms'}[options['sort']]
+        top = sorted(report.values(), key=lambda e: e[sort_key], reverse=True)[:options['top']]
+        for entry in top:
+            entry['total_ms'] = round(entry['total_ms'], 3)
+            entry['avg_ms'] = round(entry['total_ms'] / entry['count'], 3)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'requests': requests, 'queries': top}, indent=2))
+            return
+
+        self.stdout.write(f'{requests} requests analysed\n')
+        for rank, entry in enumerate(top, 1):
+            self.stdout.write(
+                f"{rank:>3}. [{entry['view']}] {entry['count']} calls, "
+                f"total {entry['total_ms']:.1f} ms, avg {entry['avg_ms']:.2f} ms, max {entry['max_ms']:.1f} ms"
+            )
+            self.stdout.write(f"     {entry['fingerprint']}")
+            if entry['explain']:
+                for plan_line in entry['explain'].splitlines():
+                    self.stdout.write(f'       {plan_line}')
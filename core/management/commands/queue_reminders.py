@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.notifications import queue_reminders
+
+
+class Command(BaseCommand):
+    help = 'Queue "appointment tomorrow" reminder emails; run daily from cron before send_emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat,
+                            help='Appointment date to remind about (YYYY-MM-DD, default tomorrow)')
+
+    def handle(self, *args, **options):
+        count = queue_reminders(options['date'])
+        self.stdout.write(f'{count} reminder(s) queued')
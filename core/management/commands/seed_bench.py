@@ -0,0 +1,222 @@
+import random
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.bench import BENCH_USER_PREFIX, BENCH_STAFF_USERNAME
+from core.models import Doctor, Appointment, Review, UserProfile
+
+CITIES = [
+    ('Mumbai', 18), ('Delhi', 16), ('Bengaluru', 14), ('Hyderabad', 10), ('Chennai', 9),
+    ('Kolkata', 8), ('Pune', 8), ('Ahmedabad', 6), ('Jaipur', 5), ('Lucknow', 4),
+    ('Kochi', 2),
+]
+SPECIALIZATION_WEIGHTS = {
+    'general': 22, 'pediatrics': 12, 'gynecology': 11, 'dermatology': 10, 'orthopedics': 10,
+    'cardiology': 9, 'dentistry': 9, 'ophthalmology': 7, 'neurology': 5, 'psychiatry': 5,
+}
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Ananya', 'Diya', 'Ishaan', 'Kavya', 'Meera',
+               'Rohan', 'Saanvi', 'Arjun', 'Priya', 'Rahul', 'Neha', 'Vikram', 'Sneha']
+LAST_NAMES = ['Sharma', 'Verma', 'Iyer', 'Reddy', 'Patel', 'Gupta', 'Nair', 'Rao',
+              'Singh', 'Mehta', 'Das', 'Kulkarni', 'Menon', 'Bose', 'Joshi', 'Khan']
+COMMENTS = [
+    'Very patient and explained everything clearly.',
+    'Long waiting time but the consultation was good.',
+    'Helpful advice, would visit again.',
+    'Did not feel the diagnosis was thorough.',
+    'Excellent doctor, highly recommended.',
+]
+# 30-minute slots between 09:00 and 17:30
+SLOTS = [time(hour, minute) for hour in range(9, 18) for minute in (0, 30)]
+
+
+def weighted(rng, weights):
+    items, cumulative, total = [], [], 0
+    for item, weight in weights:
+        total += weight
+        items.append(item)
+        cumulative.append(total)
+    return lambda: rng.choices(items, cum_weights=cumulative)[0]
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create synthetic users, doctors, appointments and reviews for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--doctors', type=int, default=500)
+        parser.add_argument('--appointments', type=int, default=100000)
+        parser.add_argument('--reviews', type=int, default=20000)
+        parser.add_argument('--profile-ratio', type=float, default=0.7,
+                            help='Fraction of users that get a UserProfile')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, for reproducible datasets')
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded bench data first')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        if options['clear']:
+            self.clear()
+        elif User.objects.filter(username__startswith=BENCH_USER_PREFIX).exists():
+            raise CommandError('Bench data already exists; pass --clear to reseed.')
+
+        user_ids = self.seed_users(options['users'], options['profile_ratio'])
+        doctor_ids = self.seed_doctors(options['doctors'])
+        completed_pairs = self.seed_appointments(options['appointments'], user_ids, doctor_ids)
+        self.seed_reviews(options['reviews'], completed_pairs)
+
+        self.stdout.write(self.style.SUCCESS('Bench dataset ready'))
+
+    def clear(self):
+        # Appointments, reviews and profiles cascade from users and doctors
+        User.objects.filter(username__startswith=BENCH_USER_PREFIX).delete()
+        User.objects.filter(username=BENCH_STAFF_USERNAME).delete()
+        Doctor.objects.filter(hospital__startswith='Bench ').delete()
+
+    def bulk_insert(self, model, rows, total, label):
+        """Insert rows from a generator in fixed-size batches, one transaction each"""
+        batch, created = [], 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch, batch_size=self.batch_size)
+                created += len(batch)
+                batch = []
+                self.stdout.write(f'  {label}: {created}/{total}', ending='\r')
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+            created += len(batch)
+        self.stdout.write(f'  {label}: {created}/{total}')
+
+    def seed_users(self, count, profile_ratio):
+        # Hash once: per-user hashing would dominate the run time
+        password = make_password('bench-password')
+        rng = self.rng
+
+        def users():
+            for n in range(count):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                yield User(
+                    username=f'{BENCH_USER_PREFIX}{n}',
+                    email=f'{first.lower()}.{last.lower()}{n}@example.com',
+                    first_name=first,
+                    last_name=last,
+                    password=password,
+                )
+
+        self.bulk_insert(User, users(), count, 'users')
+        User.objects.create_superuser(BENCH_STAFF_USERNAME, 'bench-admin@example.com', 'bench-password')
+        user_ids = list(
+            User.objects.filter(username__startswith=BENCH_USER_PREFIX).values_list('id', flat=True)
+        )
+
+        def profiles():
+            for user_id in user_ids:
+                if rng.random() < profile_ratio:
+                    yield UserProfile(
+                        user_id=user_id,
+                        phone_number=f'9{rng.randrange(10 ** 9):09d}',
+                        date_of_birth=date(1950, 1, 1) + timedelta(days=rng.randrange(365 * 55)),
+                        address=f'{rng.randrange(1, 500)} MG Road',
+                    )
+
+        self.bulk_insert(UserProfile, profiles(), int(len(user_ids) * profile_ratio), 'profiles')
+        return user_ids
+
+    def seed_doctors(self, count):
+        rng = self.rng
+        city = weighted(rng, CITIES)
+        specialization = weighted(rng, SPECIALIZATION_WEIGHTS.items())
+
+        def doctors():
+            for n in range(count):
+                experience = min(45, int(rng.expovariate(1 / 10)))
+                doctor_city = city()
+                yield Doctor(
+                    name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {n}',
+                    specialization=specialization(),
+                    experience=experience,
+                    hospital=f'Bench {rng.choice(LAST_NAMES)} Hospital',
+                    address=f'{rng.randrange(1, 300)} Hospital Road, {doctor_city}',
+                    city=doctor_city,
+                    fee=Decimal(rng.randrange(300, 2500, 50)),
+                    description='Synthetic benchmark doctor profile. ' * rng.randrange(1, 6),
+                    rating=Decimal(str(round(min(5.0, max(1.0, rng.gauss(4.1, 0.6))), 1))),
+                    is_available=rng.random() < 0.9,
+                )
+
+        self.bulk_insert(Doctor, doctors(), count, 'doctors')
+        return list(Doctor.objects.filter(hospital__startswith='Bench ').values_list('id', flat=True))
+
+    def seed_appointments(self, count, user_ids, doctor_ids):
+        """Create appointments and return the (user, doctor) pairs with a completed visit"""
+        rng = self.rng
+        today = date.today()
+        fees = dict(Doctor.objects.filter(hospital__startswith='Bench ').values_list('id', 'fee'))
+        completed_pairs = set()
+        # (doctor, date, time) slots already held by a visit that was not cancelled
+        taken = set()
+
+        # Doctor popularity and user activity are both long-tailed
+        pick_doctor = weighted(rng, [(pk, rng.paretovariate(1.2)) for pk in doctor_ids])
+        pick_user = weighted(rng, [(pk, rng.paretovariate(1.5)) for pk in user_ids])
+
+        def appointments():
+            for _ in range(count):
+                doctor_id = pick_doctor()
+                user_id = pick_user()
+                # Mostly history, with about two months of upcoming bookings
+                appointment_date = today + timedelta(days=rng.randint(-720, 60))
+                if appointment_date < today:
+                    status = 'completed' if rng.random() < 0.85 else 'cancelled'
+                else:
+                    roll = rng.random()
+                    status = 'confirmed' if roll < 0.8 else 'pending_payment' if roll < 0.9 else 'cancelled'
+                slot_time = rng.choice(SLOTS)
+                if status != 'cancelled':
+                    # A draw landing on a held slot becomes a cancelled attempt, never a double booking
+                    slot = (doctor_id, appointment_date, slot_time)
+                    if slot in taken:
+                        status = 'cancelled'
+                    else:
+                        taken.add(slot)
+                if status == 'completed':
+                    completed_pairs.add((user_id, doctor_id))
+                yield Appointment(
+                    user_id=user_id,
+                    doctor_id=doctor_id,
+                    patient_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                    date=appointment_date,
+                    time=slot_time,
+                    fee=fees[doctor_id],
+                    status=status,
+                    notes='Follow-up visit' if rng.random() < 0.2 else None,
+                )
+
+        self.bulk_insert(Appointment, appointments(), count, 'appointments')
+        return completed_pairs
+
+    def seed_reviews(self, count, completed_pairs):
+        rng = self.rng
+        # Only patients with a completed visit may review, once per doctor
+        pairs = rng.sample(sorted(completed_pairs), min(count, len(completed_pairs)))
+        rating = weighted(rng, [(5, 40), (4, 32), (3, 15), (2, 7), (1, 6)])
+
+        def reviews():
+            for user_id, doctor_id in pairs:
+                yield Review(
+                    user_id=user_id,
+                    doctor_id=doctor_id,
+                    rating=rating(),
+                    comment=rng.choice(COMMENTS),
+                )
+
+        self.bulk_insert(Review, reviews(), len(pairs), 'reviews')
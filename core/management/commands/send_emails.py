@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.notifications import claim_batch, send_batch
+
+
+class Command(BaseCommand):
+    help = 'Drain the email outbox in batches, one SMTP connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Give up on an email after this many failed sends')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new email instead of exiting once the outbox is empty')
+        parser.add_argument('--interval', type=float, default=10.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            batch = claim_batch(options['batch_size'])
+            if batch:
+                sent, failed = send_batch(batch, options['max_attempts'])
+                total_sent += sent
+                total_failed += failed
+                self.stderr.write(f'batch of {len(batch)}: {sent} sent, {failed} failed')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(f'{total_sent} sent, {total_failed} failed')
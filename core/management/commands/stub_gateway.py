@@ -0,0 +1,21 @@
+import threading
+
+from django.core.management.base import BaseCommand
+
+from core.bench import start_stub_gateway
+
+
+class Command(BaseCommand):
+    help = 'Run a local stand-in for the Razorpay orders API (for benchmarks and offline testing)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=float, default=50.0, help='Artificial delay per call')
+
+    def handle(self, *args, **options):
+        server, base_url = start_stub_gateway(options['port'], options['latency_ms'] / 1000)
+        self.stdout.write(f'Stub gateway listening; set RAZORPAY_API_BASE={base_url}')
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
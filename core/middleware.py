@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import http_date
+
+from . import auth, perf, profiling, snapshots
+from .querylog import QueryInsights
+from .routers import STICKY_COOKIE_NAME, replica_aliases
+
+perf_logger = logging.getLogger('core.perf')
+querylog_logger = logging.getLogger('core.querylog')
+
+
+class PerformanceMiddleware:
+    """
+    Record SQL, template, external-call and total time for a sample of requests.
+
+    Results are sent as a Server-Timing header and as one JSON line per request
+    to the `core.perf` logger. Disabled entirely when PERF_SAMPLE_RATE is 0.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PERF_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        os.makedirs(os.path.dirname(settings.PERF_LOG_FILE), exist_ok=True)
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings = perf.RequestTimings()
+        token = perf.activate(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings.sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            perf.deactivate(token)
+        total = time.perf_counter() - start
+
+        metrics = [f'db;dur={timings.sql_time * 1000:.1f};desc="{timings.sql_count} queries"']
+        metrics += [f'{name};dur={duration * 1000:.1f}' for name, duration in timings.spans.items()]
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(metrics)
+
+        match = request.resolver_match
+        perf_logger.info(json.dumps({
+            'ts': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sql_count': timings.sql_count,
+            'sql_ms': round(timings.sql_time * 1000, 2),
+            **{f'{name}_ms': round(duration * 1000, 2) for name, duration in timings.spans.items()},
+        }))
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Staff-triggered memory and CPU profiling of live workers (core.profiling).
+
+    Disabled entirely unless PROFILING_ENABLED. When enabled and idle, each
+    request costs one attribute check; requests are only resolved and
+    profiled while a CPU profile is armed.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        worker = profiling.worker
+        worker.ensure_running()
+        # Read once: the control thread may disarm the profile at any time
+        cpu = worker.cpu
+        if cpu is not None and worker.wants(request, cpu):
+            return worker.profile(request, cpu, self.get_response)
+        return self.get_response(request)
+
+
+class LegacyAuthBackendMiddleware(MiddlewareMixin):
+    """
+    Move sessions that name a retired auth backend onto the first configured
+    one, so the retired backend need not stay in AUTHENTICATION_BACKENDS,
+    where it would check every failed login's password a second time.
+    """
+
+    def process_request(self, request):
+        backend = request.session.get(BACKEND_SESSION_KEY)
+        if backend in auth.LEGACY_BACKENDS and backend not in settings.AUTHENTICATION_BACKENDS:
+            request.session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+
+
+class QueryInsightsMiddleware:
+    """
+    Opt-in capture of per-view SQL fingerprints, with EXPLAIN plans for slow statements.
+
+    Each request appends one JSON line to the `core.querylog` logger; the
+    `query_report` management command aggregates them. Enabled with
+    QUERY_INSIGHTS_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not settings.QUERY_INSIGHTS_ENABLED:
+            raise MiddlewareNotUsed
+        self.explain_threshold = settings.QUERY_INSIGHTS_EXPLAIN_MS
+        os.makedirs(os.path.dirname(settings.QUERY_INSIGHTS_LOG_FILE), exist_ok=True)
+
+    def __call__(self, request):
+        insights = QueryInsights(self.explain_threshold)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(insights.wrapper))
+            response = self.get_response(request)
+
+        if insights.stats:
+            match = request.resolver_match
+            querylog_logger.info(json.dumps({
+                'ts': time.time(),
+                'view': match.view_name if match else request.path,
+                'queries': insights.as_list(),
+            }))
+        return response
+
+
+class ReplicaStickinessMiddleware(MiddlewareMixin):
+    """
+    Pin a client to the primary database for a short window after it writes,
+    so replica-safe pages always show the client's own bookings and reviews.
+    """
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_response(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            window = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE_NAME,
+                f'{time.time() + window:.0f}',
+                max_age=window,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class SnapshotMiddleware:
+    """
+    Serve pages pre-rendered by export_snapshots to anonymous visitors.
+
+    Only plain GET/HEAD requests with no session or message cookie are
+    answered, and only while the last export finished less than
+    SNAPSHOT_MAX_AGE seconds ago; anything else falls through to Django.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SNAPSHOT_MAX_AGE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.serve_snapshot(request) or self.get_response(request)
+
+    def serve_snapshot(self, request):
+        if request.method not in ('GET', 'HEAD') or request.META.get('QUERY_STRING'):
+            return None
+        if not request.path_info.endswith('/'):
+            return None
+        if settings.SESSION_COOKIE_NAME in request.COOKIES or CookieStorage.cookie_name in request.COOKIES:
+            return None
+        try:
+            if time.time() - os.stat(snapshots.manifest_path()).st_mtime > settings.SNAPSHOT_MAX_AGE:
+                return None
+            path = snapshots.file_for(request.path_info)
+            stat = os.stat(path)
+        except (OSError, SuspiciousFileOperation):
+            return None
+
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            with open(path, 'rb') as fh:
+                response = HttpResponse(fh.read(), content_type='text/html; charset=utf-8')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = f'public, max-age={settings.SNAPSHOT_CACHE_SECONDS}'
+        response['X-Frame-Options'] = settings.X_FRAME_OPTIONS
+        response['X-Snapshot'] = 'hit'
+        patch_vary_headers(response, ['Cookie'])
+        return response
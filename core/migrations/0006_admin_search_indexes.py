@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_appointment_patient_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='patient_name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='doctor',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_outbound_email'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('patient_name', models.CharField(max_length=100)),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('fee', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending_payment', 'Pending Payment'), ('confirmed', 'Confirmed'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('razorpay_order_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('payment_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='core.doctor')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date', '-time'],
+                'indexes': [models.Index(fields=['user', '-date'], name='archive_user_date_idx')],
+            },
+        ),
+    ]
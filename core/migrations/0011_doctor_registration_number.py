@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='registration_number',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+    ]
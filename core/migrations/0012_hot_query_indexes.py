@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_doctor_registration_number'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'date', 'time', 'status'], name='appt_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['-rating', '-experience'], name='doctor_available_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['doctor', '-created_at'], name='review_doctor_created_idx'),
+        ),
+    ]
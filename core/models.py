@@ -1,8 +1,50 @@
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from datetime import datetime, timedelta
 
+class DoctorQuerySet(models.QuerySet):
+    """
+    Named loading profiles, so each page fetches what its templates read
+    in one query instead of one per property access.
+    """
+
+    def with_review_stats(self):
+        """review_total and review_average, read by review_count and avg_rating"""
+        # Correlated subqueries rather than a join and GROUP BY, so sliced and
+        # ordered queries still use their index and only the returned rows are counted
+        reviews = Review.objects.filter(doctor=models.OuterRef('pk')).order_by().values('doctor')
+        return self.annotate(
+            review_total=Coalesce(models.Subquery(reviews.annotate(n=models.Count('pk')).values('n')), 0),
+            review_average=models.Subquery(reviews.annotate(average=models.Avg('rating')).values('average')),
+        )
+
+    def with_consulted(self, user):
+        """has_consulted: whether ``user`` completed an appointment with the doctor, current or archived"""
+        if not user.is_authenticated:
+            return self.annotate(has_consulted=models.Value(False))
+        completed = {'user': user, 'doctor': models.OuterRef('pk'), 'status': 'completed'}
+        return self.annotate(has_consulted=models.ExpressionWrapper(
+            models.Exists(Appointment.objects.filter(**completed))
+            | models.Exists(AppointmentArchive.objects.filter(**completed)),
+            output_field=models.BooleanField(),
+        ))
+
+    def with_card_data(self, review_stats=True):
+        """Doctor cards: without the long description, with review stats unless the cards show none"""
+        doctors = self.defer('description')
+        return doctors.with_review_stats() if review_stats else doctors
+
+    def with_detail_data(self, user, recent_reviews=3):
+        """The doctor page: review stats, has_consulted and the latest reviews with their authors"""
+        latest = Review.objects.select_related('user').order_by('-created_at')[:recent_reviews]
+        return self.with_review_stats().with_consulted(user).prefetch_related(
+            models.Prefetch('reviews', queryset=latest, to_attr='recent_reviews')
+        )
+
+
 class Doctor(models.Model):
     SPECIALIZATION_CHOICES = [
         ('cardiology', 'Cardiology'),
@@ -17,7 +59,9 @@ class Doctor(models.Model):
         ('general', 'General Medicine'),
     ]
 
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
+    # Medical council registration number; the natural key for bulk imports
+    registration_number = models.CharField(max_length=50, unique=True, blank=True, null=True)
     specialization = models.CharField(max_length=50, choices=SPECIALIZATION_CHOICES, default='general')
     experience = models.PositiveIntegerField(default=0)
     hospital = models.CharField(max_length=200)
@@ -32,15 +76,24 @@ class Doctor(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = DoctorQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Home page "top rated": available doctors by rating then experience
+            models.Index(fields=['-rating', '-experience'], name='doctor_available_rank_idx',
+                         condition=models.Q(is_available=True)),
+        ]
 
     def __str__(self):
         return f"Dr. {self.name} - {self.get_specialization_display()}"
 
     @property
     def avg_rating(self):
-        """Calculate average rating from reviews"""
+        """Average rating from reviews; annotated by with_review_stats, else queried"""
+        if hasattr(self, 'review_average'):
+            return self.review_average or 0
         from django.db.models import Avg
         if hasattr(self, 'reviews'):
             result = self.reviews.aggregate(avg_rating=Avg('rating'))
@@ -49,7 +102,9 @@ class Doctor(models.Model):
     
     @property
     def review_count(self):
-        """Get total number of reviews"""
+        """Total number of reviews; annotated by with_review_stats, else queried"""
+        if hasattr(self, 'review_total'):
+            return self.review_total
         if hasattr(self, 'reviews'):
             return self.reviews.count()
         return 0
@@ -60,7 +115,9 @@ class Doctor(models.Model):
         return f"₹{self.fee}"
     
     def get_recent_reviews(self, count=3):
-        """Get recent reviews for this doctor"""
+        """Get recent reviews for this doctor; prefetched by with_detail_data"""
+        if hasattr(self, 'recent_reviews'):
+            return self.recent_reviews[:count]
         if hasattr(self, 'reviews'):
             return self.reviews.all().order_by('-created_at')[:count]
         return []
@@ -75,7 +132,7 @@ class Appointment(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='appointments')
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='appointments')
-    patient_name = models.CharField(max_length=100)
+    patient_name = models.CharField(max_length=100, db_index=True)
     date = models.DateField()
     time = models.TimeField()
     fee = models.DecimalField(max_digits=8, decimal_places=2, validators=[MinValueValidator(0)])
@@ -88,15 +145,73 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Status transitions: target status -> statuses it may be reached from.
+    # pending_payment -> pending_payment records a (new) gateway order.
+    TRANSITIONS = {
+        'pending_payment': ['pending_payment'],
+        'confirmed': ['pending_payment'],
+        'completed': ['confirmed'],
+        'cancelled': ['pending_payment', 'confirmed'],
+    }
+
     class Meta:
         ordering = ['-date', '-time']
+        # Matched to the hot queries; bench_indexes measures each one
+        indexes = [
+            # Booking conflict check and waitlist slot lookups
+            models.Index(fields=['doctor', 'date', 'time', 'status'], name='appt_slot_idx'),
+            # Change stream followed by the live slot events publisher
+            models.Index(fields=['updated_at'], name='appt_updated_idx'),
+            # No (user, ...) index: a user has few rows and the user foreign key
+            # index already serves my_appointments and has_consulted as fast
+        ]
 
     def __str__(self):
         return f"Appointment #{self.id} - {self.patient_name} with Dr. {self.doctor.name}"
 
+    def _transition_query(self, to_status, from_statuses, changes):
+        if to_status not in self.TRANSITIONS:
+            raise ValueError(f"Unknown appointment status transition: {to_status!r}")
+        allowed = self.TRANSITIONS[to_status]
+        if from_statuses is not None:
+            allowed = [status for status in allowed if status in from_statuses]
+        values = {'status': to_status, 'updated_at': timezone.now(), **changes}
+        query = Appointment.objects.filter(pk=self.pk, status__in=allowed)
+        return query, values
+
+    def _apply(self, values):
+        for field, value in values.items():
+            setattr(self, field, value)
+
+    def transition(self, to_status, from_statuses=None, **changes):
+        """
+        Move to ``to_status`` with one conditional UPDATE; return True if it applied.
+
+        The UPDATE only matches while the row's status is one the transition
+        may start from (narrowed further by ``from_statuses``), so two racing
+        transitions cannot overwrite each other. Only status, updated_at and
+        the columns in ``changes`` are written.
+        """
+        query, values = self._transition_query(to_status, from_statuses, changes)
+        applied = query.update(**values) == 1
+        if applied:
+            self._apply(values)
+        return applied
+
+    async def atransition(self, to_status, from_statuses=None, **changes):
+        query, values = self._transition_query(to_status, from_statuses, changes)
+        applied = await query.aupdate(**values) == 1
+        if applied:
+            self._apply(values)
+        return applied
+
     def save(self, *args, **kwargs):
-        if not self.fee and self.doctor:
+        if not self.fee and self.doctor_id:
             self.fee = self.doctor.fee
+            # Keep a partial save consistent with the derived fee
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'fee'}
         super().save(*args, **kwargs)
 
     @property
@@ -109,9 +224,7 @@ class Appointment(models.Model):
     def mark_completed_if_due(self):
         """Mark appointment as completed if time has passed"""
         if self.status == 'confirmed' and self.is_completed:
-            self.status = 'completed'
-            self.save()
-            return True
+            return self.transition('completed')
         return False
 
     @property
@@ -158,6 +271,41 @@ class Appointment(models.Model):
             doctor=self.doctor
         ).exists()
 
+class AppointmentArchive(models.Model):
+    """
+    Cold storage for finished appointments, moved out of the hot Appointment
+    table by the archive_appointments command. Rows keep their original id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_appointments')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='archived_appointments')
+    patient_name = models.CharField(max_length=100)
+    date = models.DateField()
+    time = models.TimeField()
+    fee = models.DecimalField(max_digits=8, decimal_places=2)
+    notes = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    razorpay_order_id = models.CharField(max_length=255, blank=True, null=True)
+    payment_id = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # Archived rows are finished: never cancellable, otherwise read like Appointment
+    is_archived = True
+    can_cancel = False
+    can_download_receipt = Appointment.can_download_receipt
+    has_reviewed = Appointment.has_reviewed
+
+    class Meta:
+        ordering = ['-date', '-time']
+        indexes = [
+            models.Index(fields=['user', '-date'], name='archive_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived appointment #{self.id} - {self.patient_name} with Dr. {self.doctor.name}"
+
 class Review(models.Model):
     RATING_CHOICES = [
         (1, '1 Star'),
@@ -177,6 +325,10 @@ class Review(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'doctor']
+        indexes = [
+            # A doctor's reviews, newest first
+            models.Index(fields=['doctor', '-created_at'], name='review_doctor_created_idx'),
+        ]
 
     def __str__(self):
         return f"Review by {self.user.username} for Dr. {self.doctor.name}"
@@ -191,4 +343,110 @@ class UserProfile(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"Profile of {self.user.username}"
\ No newline at end of file
+        return f"Profile of {self.user.username}"
+
+
+class OutboundEmail(models.Model):
+    """Transactional email waiting to be sent by the send_emails command"""
+    KIND_CHOICES = [
+        ('confirmed', 'Booking confirmed'),
+        ('cancelled', 'Booking cancelled'),
+        ('reminder', 'Appointment reminder'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    appointment = models.ForeignKey(Appointment, on_delete=models.SET_NULL, null=True, blank=True, related_name='emails')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    to = models.EmailField()
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+        constraints = [
+            # Makes enqueueing idempotent: one email of each kind per appointment
+            models.UniqueConstraint(fields=['appointment', 'kind'], name='unique_email_per_appointment'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.to}"
+
+class DoctorRecommendation(models.Model):
+    """Top-k doctors to suggest alongside a doctor, built by build_recommendations"""
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['doctor', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'rank'], name='unique_doctor_recommendation_rank'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} for Dr. {self.doctor_id}: Dr. {self.recommended_id}"
+
+class UserRecommendation(models.Model):
+    """Top-k doctors to suggest to a user on the home page, built by build_recommendations"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recommendations')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['user', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'rank'], name='unique_user_recommendation_rank'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} for user {self.user_id}: Dr. {self.doctor_id}"
+
+class WaitlistEntry(models.Model):
+    """A patient queued for a taken slot; promoted first-in first-out when the slot frees up"""
+    STATUS_CHOICES = [
+        ('waiting', 'Waiting'),
+        ('promoted', 'Promoted'),
+        ('withdrawn', 'Withdrawn'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='waitlist_entries')
+    date = models.DateField()
+    time = models.TimeField()
+    patient_name = models.CharField(max_length=100)
+    notes = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='waiting')
+    appointment = models.OneToOneField(Appointment, on_delete=models.SET_NULL, null=True, blank=True, related_name='waitlist_entry')
+    created_at = models.DateTimeField(auto_now_add=True)
+    promoted_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name_plural = 'waitlist entries'
+        indexes = [
+            # Head of a slot's queue is the first row of this index: one seek per promotion
+            models.Index(fields=['doctor', 'date', 'time', 'id'], name='waitlist_queue_idx',
+                         condition=models.Q(status='waiting')),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'doctor', 'date', 'time'], name='unique_waiting_entry',
+                                    condition=models.Q(status='waiting')),
+        ]
+
+    def __str__(self):
+        return f"{self.patient_name} waiting for Dr. {self.doctor_id} on {self.date} at {self.time}"
@@ -0,0 +1,161 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Appointment, OutboundEmail
+
+SUBJECTS = {
+    'confirmed': 'Your appointment with Dr. {doctor} is confirmed',
+    'cancelled': 'Your appointment with Dr. {doctor} has been cancelled',
+    'reminder': 'Reminder: your appointment with Dr. {doctor} is tomorrow',
+}
+
+# A claimed batch is hidden from other senders for this long
+CLAIM_LEASE = timedelta(minutes=5)
+RETRY_BASE_DELAY = timedelta(minutes=1)
+RETRY_MAX_DELAY = timedelta(hours=1)
+
+
+def render_email(email, appointment):
+    """Fill in an outbox row's subject and body; expects user and doctor loaded"""
+    email.subject = SUBJECTS[email.kind].format(doctor=appointment.doctor.name)
+    email.body = render_to_string(f'emails/appointment_{email.kind}.txt', {'appointment': appointment})
+    return email
+
+
+def build_email(appointment, kind):
+    """Unsaved outbox row for an appointment; expects user and doctor loaded"""
+    return render_email(OutboundEmail(appointment=appointment, kind=kind, to=appointment.user.email), appointment)
+
+
+def queue_emails(emails):
+    """Append to the outbox; an email already queued for the same appointment and kind is skipped"""
+    emails = [email for email in emails if email.to]
+    OutboundEmail.objects.bulk_create(emails, ignore_conflicts=True)
+    return len(emails)
+
+
+def queue_unrendered(appointments, kind, batch_size=1000):
+    """
+    Queue ``kind`` emails for a queryset of appointments of any size without
+    rendering them: rows go in with an empty body, in batches, and
+    send_batch renders them once claimed.
+    """
+    rows = appointments.exclude(user__email='').values_list('pk', 'user__email').iterator(chunk_size=batch_size)
+    queued = 0
+    while batch := list(islice(rows, batch_size)):
+        queued += queue_emails(OutboundEmail(appointment_id=pk, kind=kind, to=to) for pk, to in batch)
+    return queued
+
+
+def render_unrendered(batch, max_attempts):
+    """Render claimed emails queued by queue_unrendered; return the ones ready to send"""
+    pending = [email for email in batch if not email.body]
+    appointments = Appointment.objects.select_related('user', 'doctor').in_bulk(
+        [email.appointment_id for email in pending if email.appointment_id]
+    )
+    rendered, ready = [], []
+    for email in batch:
+        if email.body:
+            ready.append(email)
+        elif email.appointment_id in appointments:
+            rendered.append(render_email(email, appointments[email.appointment_id]))
+            ready.append(email)
+        else:
+            record_failure(email, 'appointment no longer exists', max_attempts=1)
+    OutboundEmail.objects.bulk_update(rendered, ['subject', 'body'])
+    return ready
+
+
+def transition_and_notify(appointment, to_status, kind, from_statuses=None, **changes):
+    """Apply a status transition and queue its email in one transaction; return whether it applied"""
+    with transaction.atomic():
+        applied = appointment.transition(to_status, from_statuses, **changes)
+        if applied:
+            queue_emails([build_email(appointment, kind)])
+    return applied
+
+
+def queue_reminders(day=None):
+    """Queue reminders for every confirmed appointment on ``day`` (default tomorrow)"""
+    day = day or timezone.localdate() + timedelta(days=1)
+    appointments = (
+        Appointment.objects.filter(date=day, status='confirmed')
+        .exclude(user__email='')
+        .select_related('user', 'doctor')
+    )
+    return queue_emails(build_email(appointment, 'reminder') for appointment in appointments)
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def claim_batch(batch_size):
+    """Take up to batch_size due emails, leasing them so a concurrent sender skips them"""
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboundEmail.objects.filter(status='pending', next_attempt_at__lte=now).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:batch_size])
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+            next_attempt_at=now + CLAIM_LEASE
+        )
+    return batch
+
+
+def record_failure(email, error, max_attempts):
+    attempts = email.attempts + 1
+    OutboundEmail.objects.filter(pk=email.pk).update(
+        attempts=F('attempts') + 1,
+        last_error=str(error)[:1000],
+        status='failed' if attempts >= max_attempts else 'pending',
+        next_attempt_at=timezone.now() + retry_delay(attempts),
+    )
+
+
+def send_batch(batch, max_attempts=5):
+    """
+    Send claimed emails over one SMTP connection.
+
+    Each message is handed to the open connection separately so one bad
+    address does not fail the rest. Failures are retried with exponential
+    backoff until max_attempts, then marked failed. Returns (sent, failed).
+    """
+    ready = render_unrendered(batch, max_attempts)
+    failed = len(batch) - len(ready)
+    batch = ready
+
+    mail = get_connection()
+    try:
+        mail.open()
+    except Exception as e:
+        for email in batch:
+            record_failure(email, e, max_attempts)
+        return 0, failed + len(batch)
+
+    sent_ids = []
+    try:
+        for email in batch:
+            message = EmailMessage(email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to], connection=mail)
+            try:
+                mail.send_messages([message])
+            except Exception as e:
+                failed += 1
+                record_failure(email, e, max_attempts)
+            else:
+                sent_ids.append(email.pk)
+    finally:
+        mail.close()
+
+    OutboundEmail.objects.filter(pk__in=sent_ids).update(
+        status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1, last_error=''
+    )
+    return len(sent_ids), failed
@@ -0,0 +1,107 @@
+import asyncio
+import contextlib
+import functools
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+
+class PaymentGatewayError(Exception):
+    """Raised when the payment gateway cannot be reached or rejects a request"""
+
+
+class PaymentSignatureError(PaymentGatewayError):
+    """Raised when a checkout callback signature does not verify"""
+
+
+@functools.cache
+def get_client():
+    """Shared Razorpay SDK client; the SDK is imported on first use only"""
+    import razorpay
+    return razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+
+
+def verify_payment_signature(params):
+    """Check a checkout callback's signature (a local HMAC, no network call)"""
+    from razorpay.errors import SignatureVerificationError
+    try:
+        get_client().utility.verify_payment_signature(params)
+    except SignatureVerificationError as e:
+        raise PaymentSignatureError(str(e)) from e
+
+
+class AsyncRazorpayClient:
+    """Minimal non-blocking client for the Razorpay orders API"""
+
+    def __init__(self, key_id, key_secret, base_url, timeout=10.0):
+        import httpx
+        self._httpx = httpx
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            auth=(key_id, key_secret),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+
+    async def _request(self, method, path, **kwargs):
+        try:
+            response = await self._http.request(method, path, **kwargs)
+        except self._httpx.HTTPError as e:
+            raise PaymentGatewayError(str(e)) from e
+        if response.status_code >= 400:
+            try:
+                description = response.json()['error']['description']
+            except (ValueError, KeyError, TypeError):
+                description = response.text
+            raise PaymentGatewayError(description)
+        return response.json()
+
+    async def create_order(self, data):
+        return await self._request('POST', '/orders', json=data)
+
+    async def fetch_order(self, order_id):
+        return await self._request('GET', f'/orders/{order_id}')
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+def new_async_client():
+    return AsyncRazorpayClient(
+        settings.RAZORPAY_KEY_ID,
+        settings.RAZORPAY_KEY_SECRET,
+        settings.RAZORPAY_API_BASE,
+    )
+
+
+# One client (and connection pool) per event loop. Under ASGI the loop lives as
+# long as the worker, so the pool is shared across requests.
+_clients = {}
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        # Drop clients whose loop has finished
+        for stale in [key for key in _clients if key.is_closed()]:
+            del _clients[stale]
+        client = _clients[loop] = new_async_client()
+    return client
+
+
+@contextlib.asynccontextmanager
+async def async_client(request):
+    """
+    The gateway client for ``request``: the worker's shared client under ASGI,
+    otherwise a client of its own that is closed once the request is done, as
+    each async view called from WSGI runs in a loop that ends with it.
+    """
+    if isinstance(request, ASGIRequest):
+        yield get_async_client()
+        return
+    client = new_async_client()
+    try:
+        yield client
+    finally:
+        await client.aclose()
@@ -0,0 +1,100 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from logging.handlers import MemoryHandler, RotatingFileHandler
+
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template import TemplateDoesNotExist
+
+# Timings of the request currently being sampled, if any
+_current = contextvars.ContextVar('perf_timings', default=None)
+
+
+class RequestTimings:
+    """Accumulates SQL, template and external-call time for one request"""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.spans = {}
+
+    def add(self, name, duration):
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook counting and timing every query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - start
+
+
+def activate(timings):
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def timed(name):
+    """Add the duration of the block to the current request under `name`"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class BufferedRotatingFileHandler(MemoryHandler):
+    """
+    RotatingFileHandler that writes lines in batches: every ``capacity``
+    records or ``flush_interval`` seconds, whichever comes first. A write
+    per sampled request would otherwise be the largest part of its cost.
+    """
+
+    def __init__(self, filename, capacity=100, flush_interval=1.0, **kwargs):
+        super().__init__(capacity, target=RotatingFileHandler(filename, **kwargs))
+        self.flush_interval = flush_interval
+        self.flushed_at = time.monotonic()
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def shouldFlush(self, record):
+        return super().shouldFlush(record) or time.monotonic() - self.flushed_at >= self.flush_interval
+
+    def flush(self):
+        super().flush()
+        self.flushed_at = time.monotonic()
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend that reports render time to the current request"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,349 @@
+import cProfile
+import json
+import marshal
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from io import StringIO
+
+from django.conf import settings
+from django.urls import Resolver404, get_resolver, resolve
+from django.utils._os import safe_join
+
+CONTROL_NAME = 'control.json'
+# <kind>-<command id>-<worker pid>.<ext>
+RESULT_NAME = re.compile(r'^(memory|cpu)-(\d+)-(\d+)\.(txt|collapsed|prof)$')
+CPU_FORMATS = {'collapsed': 'collapsed', 'pstats': 'prof'}
+MEMORY_ACTIONS = ('start', 'snapshot', 'stop')
+PSTATS_SORTS = ('cumulative', 'tottime', 'calls')
+# Allocations made by the profiler and the import system, not by the app
+MEMORY_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+class ProfilingError(Exception):
+    pass
+
+
+def control_path():
+    return os.path.join(settings.PROFILING_ROOT, CONTROL_NAME)
+
+
+def read_control():
+    try:
+        with open(control_path(), encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def issue(kind, **command):
+    """
+    Publish a command for every worker sharing PROFILING_ROOT. Workers pick
+    it up within PROFILING_POLL_SECONDS; commands get increasing ids, which
+    also name their result files.
+    """
+    os.makedirs(settings.PROFILING_ROOT, exist_ok=True)
+    control = read_control()
+    command['id'] = max([entry['id'] for entry in control.values()] + [0]) + 1
+    command['issued_at'] = time.time()
+    control[kind] = command
+    tmp = control_path() + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(control, fh)
+    os.replace(tmp, control_path())
+    return command
+
+
+def issue_memory(action, frames=10, top=25):
+    if action not in MEMORY_ACTIONS:
+        raise ProfilingError(f'Unknown memory action {action!r}; use one of {", ".join(MEMORY_ACTIONS)}')
+    if not 1 <= frames <= 100 or not 1 <= top <= 500:
+        raise ProfilingError('frames must be 1-100 and top 1-500')
+    return issue('memory', action=action, frames=frames, top=top)
+
+
+def issue_cpu(url_name, requests=20, fmt='collapsed', interval_ms=5.0, timeout=600):
+    """Profile each worker's next ``requests`` requests to the view named ``url_name``"""
+    if url_name not in get_resolver().reverse_dict:
+        raise ProfilingError(f'No URL named {url_name!r}')
+    if fmt not in CPU_FORMATS:
+        raise ProfilingError(f'Unknown format {fmt!r}; use collapsed or pstats')
+    if not 1 <= requests <= 1000 or not 0.5 <= interval_ms <= 1000:
+        raise ProfilingError('requests must be 1-1000 and interval_ms 0.5-1000')
+    return issue('cpu', action='profile', url_name=url_name, requests=requests, format=fmt,
+                 interval_ms=interval_ms, expires_at=time.time() + timeout)
+
+
+def stop_cpu():
+    return issue('cpu', action='stop')
+
+
+def results(command_id=None):
+    """Result files written by the workers, newest command first"""
+    try:
+        names = os.listdir(settings.PROFILING_ROOT)
+    except FileNotFoundError:
+        return []
+    found = []
+    for name in names:
+        match = RESULT_NAME.match(name)
+        if not match or (command_id is not None and int(match[2]) != command_id):
+            continue
+        stat = os.stat(os.path.join(settings.PROFILING_ROOT, name))
+        found.append({
+            'name': name, 'kind': match[1], 'id': int(match[2]), 'pid': int(match[3]),
+            'size': stat.st_size, 'modified': stat.st_mtime,
+        })
+    return sorted(found, key=lambda entry: (-entry['id'], entry['pid']))
+
+
+def result_path(name):
+    if not RESULT_NAME.match(name):
+        raise ProfilingError(f'Not a result file: {name!r}')
+    return safe_join(settings.PROFILING_ROOT, name)
+
+
+def report(command_id):
+    """
+    One command's results merged across workers: (kind, content). Content is
+    text for memory reports and collapsed stacks, and a pstats.Stats for
+    pstats profiles.
+    """
+    found = results(command_id)
+    if not found:
+        raise ProfilingError(f'No results for command {command_id} yet')
+    paths = [result_path(entry['name']) for entry in found]
+    if found[0]['kind'] == 'memory':
+        return 'memory', '\n'.join(open(path, encoding='utf-8').read() for path in paths)
+    if paths[0].endswith('.prof'):
+        return 'pstats', pstats.Stats(*paths)
+    stacks = Counter()
+    for path in paths:
+        with open(path, encoding='utf-8') as fh:
+            for line in fh:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                stacks[stack] += int(count)
+    return 'collapsed', ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def pstats_text(stats, sort='cumulative', limit=40):
+    if sort not in PSTATS_SORTS:
+        sort = 'cumulative'
+    out = StringIO()
+    stats.stream = out
+    stats.sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def dump_stats(stats):
+    """A merged profile as a .prof file, as pstats, snakeviz or gprof2dot load it"""
+    return marshal.dumps(stats.stats)
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def short_path(filename):
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base):
+        return os.path.relpath(filename, base)
+    return filename.rpartition(f'site-packages{os.sep}')[2]
+
+
+def collapse(frame):
+    """A frame's stack, outermost call first, in the collapsed format flame graph tools read"""
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(f'{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's stack every ``interval`` seconds until stopped"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profiling-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.finished = threading.Event()
+
+    def run(self):
+        while not self.finished.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+        return self.stacks
+
+
+class WorkerProfiler:
+    """
+    The per-process side: a thread that applies commands from the control
+    file, and the request hook used while a CPU profile is armed. Nothing
+    runs until the first request after the process starts (gunicorn forks
+    workers after loading the app, and threads do not survive a fork).
+    """
+
+    def __init__(self):
+        self.pid = None
+        self.cpu = None
+        self.lock = threading.Lock()
+
+    def ensure_running(self):
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.reset()
+            threading.Thread(target=self.watch, name='profiling-control', daemon=True).start()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.applied = {'memory': 0, 'cpu': 0}
+        self.control_mtime = None
+        self.previous = None
+        self.cpu = None
+        self.busy = threading.Lock()
+
+    def watch(self):
+        while True:
+            try:
+                mtime = os.stat(control_path()).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime is not None and mtime != self.control_mtime:
+                self.control_mtime = mtime
+                self.apply(read_control())
+            time.sleep(settings.PROFILING_POLL_SECONDS)
+
+    def apply(self, control):
+        first_read = not any(self.applied.values())
+        memory = control.get('memory')
+        if memory and memory['id'] > self.applied['memory']:
+            self.applied['memory'] = memory['id']
+            # A worker started after `start` joins in; older snapshots are not replayed
+            if memory['action'] == 'start' or (first_read and memory['action'] == 'snapshot'):
+                self.memory_start(memory)
+            elif memory['action'] == 'snapshot':
+                self.memory_snapshot(memory)
+            else:
+                self.memory_stop()
+        cpu = control.get('cpu')
+        if cpu and cpu['id'] > self.applied['cpu']:
+            self.applied['cpu'] = cpu['id']
+            armed = cpu['action'] == 'profile' and cpu['expires_at'] > time.time()
+            self.cpu = {**cpu, 'remaining': cpu['requests'], 'stacks': Counter(), 'stats': None} if armed else None
+
+    def take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(MEMORY_FILTERS)
+
+    def memory_start(self, command):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        tracemalloc.start(command['frames'])
+        self.frames = command['frames']
+        self.previous = (time.time(), self.take_snapshot())
+
+    def memory_snapshot(self, command):
+        if self.previous is None or not tracemalloc.is_tracing():
+            return
+        taken_at, previous = self.previous
+        snapshot = self.take_snapshot()
+        diff = snapshot.compare_to(previous, 'lineno' if self.frames == 1 else 'traceback')
+        current, peak = tracemalloc.get_traced_memory()
+        rss = rss_mb()
+        lines = [
+            f'worker {os.getpid()}: RSS {f"{rss:.1f} MB" if rss is not None else "n/a"}, '
+            f'traced {current / 2**20:.1f} MB (peak {peak / 2**20:.1f} MB), '
+            f'{sum(stat.size_diff for stat in diff) / 2**20:+.2f} MB since '
+            f'{datetime.fromtimestamp(taken_at):%Y-%m-%d %H:%M:%S}',
+        ]
+        for stat in diff[:command['top']]:
+            lines.append(f'{stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks), '
+                         f'{stat.size / 1024:.1f} KiB now')
+            lines.extend(f'    {line}' for line in stat.traceback.format(most_recent_first=True))
+        self.write(f'memory-{command["id"]}-{os.getpid()}.txt', '\n'.join(lines) + '\n')
+        self.previous = (time.time(), snapshot)
+
+    def memory_stop(self):
+        tracemalloc.stop()
+        self.previous = None
+
+    def write(self, name, text):
+        os.makedirs(settings.PROFILING_ROOT, exist_ok=True)
+        path = os.path.join(settings.PROFILING_ROOT, name)
+        with open(path + '.tmp', 'w', encoding='utf-8') as fh:
+            fh.write(text)
+        os.replace(path + '.tmp', path)
+
+    def wants(self, request, cpu):
+        """
+        Whether to profile this request under ``cpu``, the armed command the
+        caller read once: the watcher thread may replace or clear self.cpu at
+        any moment, so it is never re-read mid-request.
+        """
+        if cpu['expires_at'] <= time.time():
+            if self.cpu is cpu:
+                self.cpu = None
+            return False
+        try:
+            return resolve(request.path_info).view_name == cpu['url_name']
+        except Resolver404:
+            return False
+
+    def profile(self, request, cpu, get_response):
+        # One request at a time: cProfile allows a single active profiler
+        if not self.busy.acquire(blocking=False):
+            return get_response(request)
+        try:
+            if cpu['format'] == 'pstats':
+                profiler = cProfile.Profile()
+                response = profiler.runcall(get_response, request)
+                cpu['stats'] = pstats.Stats(profiler) if cpu['stats'] is None else cpu['stats'].add(profiler)
+                path = os.path.join(settings.PROFILING_ROOT, f'cpu-{cpu["id"]}-{os.getpid()}.prof')
+                os.makedirs(settings.PROFILING_ROOT, exist_ok=True)
+                cpu['stats'].dump_stats(path)
+            else:
+                sampler = StackSampler(threading.get_ident(), cpu['interval_ms'] / 1000)
+                sampler.start()
+                try:
+                    response = get_response(request)
+                finally:
+                    cpu['stacks'].update(sampler.stop())
+                self.write(f'cpu-{cpu["id"]}-{os.getpid()}.collapsed',
+                           ''.join(f'{stack} {count}\n' for stack, count in cpu['stacks'].most_common()))
+            cpu['remaining'] -= 1
+            if cpu['remaining'] <= 0 and self.cpu is cpu:
+                self.cpu = None
+            return response
+        finally:
+            self.busy.release()
+
+
+worker = WorkerProfiler()
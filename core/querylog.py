@@ -0,0 +1,78 @@
+import re
+import time
+
+from django.db import DatabaseError, transaction
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST_RE = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Normalise a statement so that queries differing only in parameters match"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST_RE.sub('(?+)', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+class QueryInsights:
+    """Per-request aggregation of statements by fingerprint, with EXPLAIN for slow ones"""
+
+    def __init__(self, explain_threshold):
+        self.explain_threshold = explain_threshold
+        self.stats = {}
+        self._explaining = False
+
+    def wrapper(self, execute, sql, params, many, context):
+        if self._explaining:
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = execute(sql, params, many, context)
+            failed = False
+            return result
+        finally:
+            duration = time.perf_counter() - start
+            key = fingerprint(sql)
+            entry = self.stats.get(key)
+            if entry is None:
+                entry = self.stats[key] = {
+                    'fingerprint': key,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'sql': sql,
+                    'explain': None,
+                }
+            entry['count'] += 1
+            entry['total_ms'] += duration * 1000
+            entry['max_ms'] = max(entry['max_ms'], duration * 1000)
+
+            if (not failed and not many and entry['explain'] is None
+                    and duration * 1000 >= self.explain_threshold
+                    and sql.lstrip()[:6].upper() == 'SELECT'):
+                entry['explain'] = self.explain(context['connection'], sql, params)
+
+    def explain(self, connection, sql, params):
+        """Return the plan for a statement using the backend's EXPLAIN syntax"""
+        self._explaining = True
+        try:
+            # In a savepoint: on PostgreSQL a failed statement would otherwise abort the request's transaction
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+        except DatabaseError as e:
+            return f'EXPLAIN failed: {e}'
+        finally:
+            self._explaining = False
+
+    def as_list(self):
+        for entry in self.stats.values():
+            entry['total_ms'] = round(entry['total_ms'], 3)
+            entry['max_ms'] = round(entry['max_ms'], 3)
+        return list(self.stats.values())
@@ -0,0 +1,102 @@
+import functools
+import math
+import time
+from asyncio import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'30/m' -> (30, 60)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def client_ip(request):
+    header = settings.RATELIMIT_IP_HEADER
+    value = request.META.get(header, '')
+    if header != 'REMOTE_ADDR':
+        # The last hop is the one added by our own proxy; earlier ones are client-supplied
+        value = value.rsplit(',', 1)[-1].strip()
+    return value or request.META.get('REMOTE_ADDR', '')
+
+
+def _incr(cache, key, timeout):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # First hit in this window; add() is atomic, so only one worker creates the key
+        if cache.add(key, 1, timeout):
+            return 1
+        return cache.incr(key)
+
+
+def hit(group, identity, limit, period):
+    """
+    Count one request and return 0 if it is allowed, else seconds to wait.
+
+    A sliding-window counter: the current window's count is kept with an
+    atomic cache incr() and the previous window's count is weighted by how
+    much of it still overlaps the last ``period`` seconds. This behaves like a
+    token bucket of size ``limit`` refilled at ``limit/period`` per second,
+    using only operations every cache backend makes atomic across workers.
+    """
+    cache = caches[settings.RATELIMIT_CACHE]
+    now = time.time()
+    window, offset = divmod(now, period)
+    key = f'rl:{group}:{identity}:{int(window)}'
+    current = _incr(cache, key, period * 2)
+    previous = cache.get(f'rl:{group}:{identity}:{int(window) - 1}', 0)
+
+    overlap = 1 - offset / period
+    if previous * overlap + current <= limit:
+        return 0
+    if current > limit or not previous:
+        return math.ceil(period - offset)
+    # Wait until enough of the previous window has slid out
+    return max(1, math.ceil((1 - (limit - current) / previous) * period - offset))
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse('Too many requests. Please slow down.', status=429, content_type='text/plain')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(group, rate, key='user_or_ip', methods=None):
+    """
+    Limit a view to ``rate`` requests ('N/s', 'N/m', 'N/h' or 'N/d') per client.
+
+    ``key`` is 'ip', or 'user_or_ip' to count signed-in users by account.
+    settings.RATELIMITS[group] overrides the rate, and RATELIMIT_ENABLED turns
+    all limits off. With ``methods`` set, other methods are not counted.
+    """
+    def check(request, user):
+        if not settings.RATELIMIT_ENABLED:
+            return None
+        if methods and request.method not in methods:
+            return None
+        limit, period = parse_rate(settings.RATELIMITS.get(group, rate))
+        if key == 'user_or_ip' and user.is_authenticated:
+            identity = f'u{user.pk}'
+        else:
+            identity = client_ip(request)
+        retry_after = hit(group, identity, limit, period)
+        return too_many_requests(retry_after) if retry_after else None
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            async def _view(request, *args, **kwargs):
+                user = await request.auser() if key == 'user_or_ip' else None
+                # Cache calls stay synchronous: a thread hop would cost more than the lookup
+                return check(request, user) or await view_func(request, *args, **kwargs)
+        else:
+            def _view(request, *args, **kwargs):
+                user = request.user if key == 'user_or_ip' else None
+                return check(request, user) or view_func(request, *args, **kwargs)
+        return functools.wraps(view_func)(_view)
+    return decorator
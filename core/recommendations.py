@@ -0,0 +1,171 @@
+import heapq
+import math
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+from .models import (
+    Appointment, AppointmentArchive, Doctor, DoctorRecommendation, UserRecommendation,
+)
+
+TOP_K = 10
+# Score multipliers on top of normalised co-occurrence
+SAME_CITY_BOOST = 0.5
+RATING_BOOST = 0.2
+
+
+def visits_sql():
+    """Distinct (user_id, doctor_id) pairs across current and archived appointments"""
+    quote = connection.ops.quote_name
+    return ' UNION '.join(
+        f"SELECT user_id, doctor_id FROM {quote(model._meta.db_table)} WHERE status <> 'cancelled'"
+        for model in (Appointment, AppointmentArchive)
+    )
+
+
+@contextmanager
+def visits_table(name='recommendation_visits'):
+    """
+    Materialise visits_sql() once as a temporary table for the chunked self-joins.
+
+    Without it every chunk would re-read and de-duplicate both appointment
+    tables; with it each chunk is an index range scan plus index lookups.
+    """
+    quote = connection.ops.quote_name
+    table = quote(name)
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TEMPORARY TABLE {table} AS {visits_sql()}')
+        cursor.execute(f'CREATE INDEX {quote(name + "_doctor")} ON {table} (doctor_id, user_id)')
+        cursor.execute(f'CREATE INDEX {quote(name + "_user")} ON {table} (user_id, doctor_id)')
+        # Temporary tables are never analysed by autovacuum
+        cursor.execute(f'ANALYZE {table}')
+    try:
+        yield table
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {table}')
+
+
+def visitor_counts(visits):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT doctor_id, COUNT(*) FROM {visits} GROUP BY doctor_id')
+        return dict(cursor.fetchall())
+
+
+def cooccurrence(visits, low, high):
+    """
+    (doctor, other doctor, shared patients) for doctors with low <= id < high.
+
+    The matrix block is computed by the database as one self-join and
+    GROUP BY, so only non-zero cells ever reach Python.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT a.doctor_id, b.doctor_id, COUNT(*) FROM {visits} a '
+            f'JOIN {visits} b ON b.user_id = a.user_id AND b.doctor_id <> a.doctor_id '
+            'WHERE a.doctor_id >= %s AND a.doctor_id < %s '
+            'GROUP BY a.doctor_id, b.doctor_id',
+            [low, high],
+        )
+        return cursor.fetchall()
+
+
+def build_doctor_recommendations(chunk_size=500, top_k=TOP_K):
+    """Rebuild DoctorRecommendation in chunks of doctor ids; returns doctors covered"""
+    with visits_table() as visits:
+        visitors = visitor_counts(visits)
+        doctors = {
+            pk: (city, float(rating), available)
+            for pk, city, rating, available in Doctor.objects.values_list('id', 'city', 'rating', 'is_available')
+        }
+        ids = sorted(doctors)
+        covered = 0
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            scores = defaultdict(list)
+            for doctor_id, other_id, shared in cooccurrence(visits, chunk[0], chunk[-1] + 1):
+                other = doctors.get(other_id)
+                if other is None or not other[2]:
+                    continue
+                score = shared / math.sqrt(visitors[doctor_id] * visitors[other_id])
+                if other[0] == doctors[doctor_id][0]:
+                    score *= 1 + SAME_CITY_BOOST
+                score *= 1 + RATING_BOOST * other[1] / 5
+                scores[doctor_id].append((score, other_id))
+
+            rows = [
+                DoctorRecommendation(doctor_id=doctor_id, recommended_id=other_id, rank=rank, score=score)
+                for doctor_id, candidates in scores.items()
+                for rank, (score, other_id) in enumerate(heapq.nlargest(top_k, candidates), start=1)
+            ]
+            with transaction.atomic():
+                DoctorRecommendation.objects.filter(doctor_id__in=chunk).delete()
+                DoctorRecommendation.objects.bulk_create(rows)
+            covered += len(scores)
+        return covered
+
+
+def user_visits(user_ids):
+    visits = defaultdict(set)
+    for model in (Appointment, AppointmentArchive):
+        pairs = model.objects.filter(user_id__in=user_ids).exclude(status='cancelled').values_list('user_id', 'doctor_id')
+        for user_id, doctor_id in pairs:
+            visits[user_id].add(doctor_id)
+    return visits
+
+
+def build_user_recommendations(user_ids, chunk_size=1000, top_k=TOP_K):
+    """
+    Rebuild UserRecommendation for the given users from the doctor table.
+
+    A user's candidates are the recommendations of every doctor they have
+    seen, scores summed, minus doctors they have already seen.
+    """
+    user_ids = sorted(user_ids)
+    covered = 0
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        visits = user_visits(chunk)
+        seen = set().union(*visits.values())
+        neighbours = defaultdict(list)
+        for doctor_id, recommended_id, score in DoctorRecommendation.objects.filter(
+            doctor_id__in=seen
+        ).values_list('doctor_id', 'recommended_id', 'score'):
+            neighbours[doctor_id].append((recommended_id, score))
+
+        rows = []
+        for user_id, doctor_ids in visits.items():
+            scores = defaultdict(float)
+            for doctor_id in doctor_ids:
+                for recommended_id, score in neighbours[doctor_id]:
+                    if recommended_id not in doctor_ids:
+                        scores[recommended_id] += score
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            rows += [
+                UserRecommendation(user_id=user_id, doctor_id=doctor_id, rank=rank, score=score)
+                for rank, (doctor_id, score) in enumerate(best, start=1)
+            ]
+        with transaction.atomic():
+            UserRecommendation.objects.filter(user_id__in=chunk).delete()
+            UserRecommendation.objects.bulk_create(rows)
+        covered += len(visits)
+    return covered
+
+
+def all_patient_ids():
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT DISTINCT user_id FROM ({visits_sql()}) visits')
+        return [row[0] for row in cursor.fetchall()]
+
+
+def recently_active_user_ids(since):
+    return set(Appointment.objects.filter(updated_at__gte=since).values_list('user_id', flat=True))
+
+
+def drop_stale_user_recommendations(patient_ids):
+    """Remove recommendations for users who no longer have any visits"""
+    stale = set(UserRecommendation.objects.values_list('user_id', flat=True).distinct()) - set(patient_ids)
+    if stale:
+        UserRecommendation.objects.filter(user_id__in=stale).delete()
+    return len(stale)
@@ -0,0 +1,75 @@
+import contextvars
+import functools
+import random
+import time
+from asyncio import iscoroutinefunction
+
+from django.conf import settings
+
+# Set while a replica-safe view is running for a request that may read from a replica
+_read_from_replica = contextvars.ContextVar('read_from_replica', default=False)
+
+STICKY_COOKIE_NAME = 'primary_until'
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+def is_sticky(request):
+    """True if the client wrote recently and must keep reading from the primary"""
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE_NAME, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def replica_safe(view_func):
+    """
+    Mark a read-only view as safe to serve from a read replica.
+
+    GET/HEAD requests run with reads routed to a replica unless the client
+    is inside its sticky-primary window after a write.
+    """
+    def use_replica(request):
+        return request.method in ('GET', 'HEAD') and not is_sticky(request)
+
+    if iscoroutinefunction(view_func):
+        async def _view(request, *args, **kwargs):
+            token = _read_from_replica.set(use_replica(request))
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _read_from_replica.reset(token)
+    else:
+        def _view(request, *args, **kwargs):
+            token = _read_from_replica.set(use_replica(request))
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                _read_from_replica.reset(token)
+
+    _view = functools.wraps(view_func)(_view)
+    _view.replica_safe = True
+    return _view
+
+
+class ReplicaRouter:
+    """Send reads from replica-safe views to a replica; everything else to default"""
+
+    def db_for_read(self, model, **hints):
+        if _read_from_replica.get():
+            replicas = replica_aliases()
+            if replicas:
+                return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
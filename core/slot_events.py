@@ -0,0 +1,250 @@
+import asyncio
+import contextvars
+import json
+from datetime import date as dt_date, timedelta
+from importlib import import_module
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.db import close_old_connections
+from django.http import QueryDict, parse_cookie
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from .models import Appointment, Doctor
+from .waitlist import ACTIVE_STATUSES
+
+# Each read looks this far behind the last change seen, so a write whose
+# transaction commits a little after its updated_at is still picked up
+COMMIT_LAG = timedelta(seconds=2)
+BATCH_SIZE = 1000
+# Events buffered per page; a page further behind than this is sent a snapshot
+QUEUE_SIZE = 100
+RESYNC = object()
+
+
+def slot_key(time):
+    return time.strftime('%H:%M')
+
+
+def taken_times(doctor_id, date):
+    """The slots held for a doctor on a date; served by appt_slot_idx"""
+    return Appointment.objects.filter(
+        doctor_id=doctor_id, date=date, status__in=ACTIVE_STATUSES,
+    ).order_by('time').values_list('time', flat=True)
+
+
+def snapshot(doctor_id, date):
+    # No request cycle closes broken connections here; do it before each use
+    close_old_connections()
+    return [slot_key(time) for time in taken_times(doctor_id, date)]
+
+
+def changes_since(since, after=None):
+    """
+    Appointment writes from ``since`` on, oldest first; served by appt_updated_idx.
+    ``after`` is the (updated_at, pk) of the last row of the previous batch:
+    bulk updates give many rows one updated_at, so batches page on both.
+    """
+    close_old_connections()
+    changes = Appointment.objects.filter(updated_at__gt=since)
+    if after is not None:
+        changes = changes.filter(updated_at__gte=after[0]).exclude(updated_at=after[0], pk__lte=after[1])
+    return list(
+        changes.order_by('updated_at', 'pk')
+        .values_list('doctor_id', 'date', 'time', 'status', 'updated_at', 'pk')[:BATCH_SIZE]
+    )
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+class SlotPublisher:
+    """
+    Fan slot taken/freed events out to the booking pages open in this process.
+
+    Every path that writes an appointment moves its updated_at, so one task
+    per process follows that change stream with a single indexed query every
+    SLOT_EVENTS_POLL_SECONDS, and only while a page is listening. Each change
+    goes to the queues of the pages watching that doctor and date; pages
+    never query on their own after the initial snapshot.
+    """
+
+    def __init__(self):
+        self.listeners = {}  # (doctor_id, date) -> set of queues
+        self.latest = {}  # (doctor_id, date, time) -> updated_at last published
+        self.cursor = None
+        self.task = None
+
+    def subscribe(self, doctor_id, date):
+        queue = asyncio.Queue(QUEUE_SIZE)
+        self.listeners.setdefault((doctor_id, date), set()).add(queue)
+        if self.task is None or self.task.done() or self.task.get_loop() is not asyncio.get_running_loop():
+            self.cursor = timezone.now() - COMMIT_LAG
+            self.latest = {}
+            # Started in an empty context, so it never runs on a thread Django
+            # keeps for one request
+            self.task = contextvars.Context().run(asyncio.create_task, self.run())
+        return queue
+
+    def unsubscribe(self, doctor_id, date, queue):
+        queues = self.listeners.get((doctor_id, date))
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.listeners[(doctor_id, date)]
+
+    async def run(self):
+        while self.listeners:
+            await self.poll()
+            await asyncio.sleep(settings.SLOT_EVENTS_POLL_SECONDS)
+
+    async def poll(self):
+        """Publish every change since the last poll, a batch at a time"""
+        since, after = self.cursor - COMMIT_LAG, None
+        while True:
+            rows = await sync_to_async(changes_since)(since, after)
+            self.publish(rows)
+            if len(rows) < BATCH_SIZE:
+                return
+            after = rows[-1][-2:]
+
+    def publish(self, rows):
+        for doctor_id, date, time, status, updated_at, _ in rows:
+            self.cursor = max(self.cursor, updated_at)
+            slot = (doctor_id, date, time)
+            # Rows are re-read within COMMIT_LAG; a slot's newest write wins
+            if self.latest.get(slot, updated_at - COMMIT_LAG) >= updated_at:
+                continue
+            self.latest[slot] = updated_at
+            queues = self.listeners.get((doctor_id, date))
+            if queues:
+                message = format_event('slot', {
+                    'time': slot_key(time),
+                    'state': 'taken' if status in ACTIVE_STATUSES else 'free',
+                })
+                for queue in queues:
+                    self.deliver(queue, message)
+        horizon = self.cursor - COMMIT_LAG
+        self.latest = {slot: seen for slot, seen in self.latest.items() if seen > horizon}
+
+    def deliver(self, queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+    async def stream(self, doctor_id, date):
+        """
+        Yield a booking page's event stream: the slots taken now, then each
+        change, with a comment line as a heartbeat so proxies keep it open.
+        Subscribing before the snapshot means no change can fall between them.
+        """
+        queue = self.subscribe(doctor_id, date)
+        try:
+            yield f'retry: {settings.SLOT_EVENTS_RETRY_MS}\n\n'
+            message = RESYNC
+            while True:
+                if message is RESYNC:
+                    taken = await sync_to_async(snapshot)(doctor_id, date)
+                    message = format_event('snapshot', {'taken': taken})
+                yield message
+                try:
+                    message = await asyncio.wait_for(queue.get(), settings.SLOT_EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    message = ': ping\n\n'
+        finally:
+            self.unsubscribe(doctor_id, date, queue)
+
+
+
+publisher = SlotPublisher()
+
+
+class SlotEventsApp:
+    """
+    ASGI wrapper that serves the slot_events URL ahead of Django's handler.
+
+    Django keeps a thread (and with it a database connection) for each
+    request until its response ends, so thousands of open event streams
+    would hold thousands of threads. Here an open stream is a coroutine and
+    a queue; session checks and queries run on asgiref's one shared thread.
+    Every other request is passed to ``app``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        doctor_id = self.match(scope)
+        if doctor_id is None:
+            await self.app(scope, receive, send)
+        else:
+            await self.serve(scope, receive, send, doctor_id)
+
+    def match(self, scope):
+        if scope['type'] != 'http' or scope['method'] != 'GET' or not scope['path'].endswith('/events/'):
+            return None
+        path, root = scope['path'], scope.get('root_path', '')
+        if root and path.startswith(root):
+            path = path[len(root):]
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return None
+        return match.kwargs['doctor_id'] if match.url_name == 'slot_events' else None
+
+    async def serve(self, scope, receive, send, doctor_id):
+        query = QueryDict(scope.get('query_string', b'').decode('latin-1'))
+        try:
+            slot_date = dt_date.fromisoformat(query.get('date', ''))
+        except ValueError:
+            return await self.respond(send, 400, 'date must be YYYY-MM-DD')
+        if not await self.logged_in(scope):
+            return await self.respond(send, 403, 'Log in to follow slot availability')
+        if not await Doctor.objects.filter(pk=doctor_id).aexists():
+            return await self.respond(send, 404, 'Doctor not found')
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            # Stop nginx from buffering the stream
+            (b'x-accel-buffering', b'no'),
+        ]})
+        pump = asyncio.ensure_future(self.pump(send, publisher.stream(doctor_id, slot_date)))
+        disconnect = asyncio.ensure_future(self.disconnected(receive))
+        await asyncio.wait({pump, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        for task in (pump, disconnect):
+            task.cancel()
+        await asyncio.gather(pump, disconnect, return_exceptions=True)
+
+    async def pump(self, send, stream):
+        async for message in stream:
+            await send({'type': 'http.response.body', 'body': message.encode(), 'more_body': True})
+
+    async def disconnected(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def logged_in(self, scope):
+        """The same session and auth hash checks AuthenticationMiddleware makes"""
+        cookies = parse_cookie('; '.join(
+            value.decode('latin-1') for name, value in scope.get('headers', []) if name == b'cookie'
+        ))
+        session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+        if not session_key:
+            return False
+        session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        user = await aget_user(SimpleNamespace(session=session))
+        return user.is_authenticated
+
+    async def respond(self, send, status, text):
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'text/plain; charset=utf-8'),
+        ]})
+        await send({'type': 'http.response.body', 'body': text.encode()})
@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.utils._os import safe_join
+
+from .models import Doctor
+
+MANIFEST_NAME = 'snapshot.json'
+
+
+def manifest_path():
+    return os.path.join(settings.SNAPSHOT_ROOT, MANIFEST_NAME)
+
+
+def file_for(path):
+    """Snapshot file for a URL path: /doctors/ -> <root>/doctors/index.html"""
+    return safe_join(settings.SNAPSHOT_ROOT, path.strip('/'), 'index.html')
+
+
+def read_manifest():
+    try:
+        with open(manifest_path(), encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {'doctors': {}}
+
+
+def write_manifest(manifest):
+    """Written last, so its mtime marks when every snapshot was last known current"""
+    tmp = manifest_path() + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp, manifest_path())
+
+
+def doctor_versions():
+    """{doctor id: version string} from the doctor row and its review aggregate, in one query"""
+    rows = Doctor.objects.annotate(
+        review_total=Count('reviews'),
+        review_latest=Max('reviews__updated_at'),
+    ).values_list('id', 'updated_at', 'review_total', 'review_latest')
+    return {
+        str(pk): f'{updated_at.isoformat()}|{review_total}|{review_latest.isoformat() if review_latest else ""}'
+        for pk, updated_at, review_total, review_latest in rows
+    }
+
+
+def listing_paths():
+    return [reverse('home'), reverse('doctors')]
+
+
+def doctor_paths(doctor_id):
+    return [
+        reverse('doctor_detail', kwargs={'id': doctor_id}),
+        reverse('doctor_reviews', kwargs={'doctor_id': doctor_id}),
+    ]
+
+
+def remove_doctor(doctor_id):
+    shutil.rmtree(os.path.dirname(file_for(reverse('doctor_detail', kwargs={'id': doctor_id}))),
+                  ignore_errors=True)
+
+
+def render_to_file(application, path):
+    """Render a path as an anonymous visitor and write it atomically; returns the status code"""
+    from .bench import wsgi_environ
+    status_holder = []
+
+    def start_response(status, headers, exc_info=None):
+        status_holder.append(int(status.split(' ', 1)[0]))
+
+    result = application(wsgi_environ(path), start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+    if status_holder[0] == 200:
+        target = file_for(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target + '.tmp', 'wb') as fh:
+            fh.write(body)
+        os.replace(target + '.tmp', target)
+    return status_holder[0]
@@ -0,0 +1,40 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+# Text pulled from a sync iterator per thread hop when serving under ASGI
+ASGI_BUFFER_SIZE = 64 * 1024
+
+
+def next_parts(iterator, size):
+    """Up to ``size`` characters of parts from ``iterator``; empty once it is exhausted"""
+    parts, total = [], 0
+    for part in iterator:
+        parts.append(part)
+        total += len(part)
+        if total >= size:
+            break
+    return parts
+
+
+async def pull(chunks, size=ASGI_BUFFER_SIZE):
+    """
+    Serve a sync iterator to an async consumer a buffer at a time. Handed a
+    sync iterator, Django's ASGI handler would list() it first and hold the
+    whole body in memory.
+    """
+    iterator = iter(chunks)
+    try:
+        while parts := await sync_to_async(next_parts)(iterator, size):
+            yield ''.join(parts)
+    finally:
+        # The client may leave early: close the generator (and its cursor) on its own thread
+        if hasattr(iterator, 'close'):
+            await sync_to_async(iterator.close)()
+
+
+def streaming_response(request, chunks, **kwargs):
+    """A StreamingHttpResponse over text ``chunks`` that stays streamed under WSGI and ASGI alike"""
+    if isinstance(request, ASGIRequest):
+        chunks = pull(chunks)
+    return StreamingHttpResponse(chunks, **kwargs)
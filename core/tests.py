@@ -1,3 +1,1476 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import date, time as dt_time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, OperationalError, close_old_connections, connection, connections
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.template import engines
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from . import auth, perf, profiling
+from .archive import COPIED_FIELDS, archive_batch
+from .doctor_import import DoctorImporter, read_rows
+from .exports import export_chunks
+from .forms import UserProfileForm
+from .ics import FEED_PAST_DAYS, event, feed_token
+from .middleware import PerformanceMiddleware, ProfilingMiddleware, ReplicaStickinessMiddleware
+from .models import (
+    Appointment, AppointmentArchive, Doctor, DoctorQuerySet, DoctorRecommendation, OutboundEmail, Review,
+    UserProfile, UserRecommendation, WaitlistEntry,
+)
+from .notifications import build_email, claim_batch, queue_emails, send_batch
+from .pagination import LargeTablePaginator
+from .payments import async_client
+from .querylog import QueryInsights, fingerprint
+from .ratelimit import ratelimit
+from .recommendations import RATING_BOOST, SAME_CITY_BOOST
+from .routers import STICKY_COOKIE_NAME
+from .slot_events import BATCH_SIZE, QUEUE_SIZE, RESYNC, SlotEventsApp, SlotPublisher, format_event
+from .streaming import ASGI_BUFFER_SIZE, streaming_response
+from .views.api import MAX_LIMIT, STREAM_THRESHOLD, encode_cursor
+from .waitlist import cancel_and_promote
+
+
+def create_appointment(status):
+    user = User.objects.create_user(f'patient{User.objects.count()}', password='x')
+    doctor = Doctor.objects.create(name='Test', hospital='H', address='A', city='C', fee=500)
+    return Appointment.objects.create(
+        user=user, doctor=doctor, patient_name='Patient',
+        date=date(2030, 1, 1), time=dt_time(10, 0), fee=500, status=status,
+    )
+
+
+class AppointmentTransitionTests(TestCase):
+    def test_transition_applies_from_allowed_status(self):
+        appointment = create_appointment('pending_payment')
+        self.assertTrue(appointment.transition('confirmed', payment_id='pay_1'))
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.status, 'confirmed')
+        self.assertEqual(appointment.payment_id, 'pay_1')
+
+    def test_transition_refused_from_other_status(self):
+        appointment = create_appointment('cancelled')
+        self.assertFalse(appointment.transition('confirmed', payment_id='pay_1'))
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.status, 'cancelled')
+        self.assertIsNone(appointment.payment_id)
+
+    def test_transition_uses_database_status_not_instance(self):
+        appointment = create_appointment('pending_payment')
+        stale = Appointment.objects.get(pk=appointment.pk)
+        self.assertTrue(appointment.transition('cancelled'))
+        self.assertFalse(stale.transition('confirmed'))
+        self.assertEqual(stale.status, 'pending_payment')
+
+    def test_transition_writes_only_changed_columns(self):
+        appointment = create_appointment('confirmed')
+        Appointment.objects.filter(pk=appointment.pk).update(notes='edited elsewhere')
+        self.assertTrue(appointment.transition('completed'))
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.notes, 'edited elsewhere')
+
+    def test_from_statuses_narrows_transition(self):
+        appointment = create_appointment('confirmed')
+        self.assertFalse(appointment.transition('cancelled', from_statuses=['pending_payment']))
+        self.assertTrue(appointment.transition('cancelled', from_statuses=['confirmed']))
+
+
+class BouncingEmailBackend(LocmemEmailBackend):
+    """locmem, except that addresses at bounce.example fail"""
+
+    def send_messages(self, messages):
+        if any(address.endswith('@bounce.example') for message in messages for address in message.to):
+            raise ConnectionError('mailbox unavailable')
+        return super().send_messages(messages)
+
+
+class OutboxTests(TestCase):
+    def confirmed(self, email):
+        appointment = create_appointment('confirmed')
+        User.objects.filter(pk=appointment.user_id).update(email=email)
+        appointment.user.email = email
+        return appointment
+
+    def test_booking_queues_its_confirmation(self):
+        user = User.objects.create_user('booker', email='booker@example.com', password='x')
+        doctor = Doctor.objects.create(name='Test', hospital='H', address='A', city='C', fee=500)
+        self.client.force_login(user)
+        day = timezone.localdate() + timedelta(days=2)
+
+        response = self.client.post(reverse('book_appointment', args=[doctor.pk]), {
+            'date': day.isoformat(), 'time': '10:00', 'patient_name': 'Booker',
+        })
+
+        appointment = Appointment.objects.get(user=user)
+        self.assertRedirects(response, reverse('appointment_success', args=[appointment.pk]),
+                             fetch_redirect_response=False)
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.appointment, email.kind, email.to), (appointment, 'confirmed', 'booker@example.com'))
+
+    def test_queueing_is_idempotent_per_appointment_and_kind(self):
+        appointment = self.confirmed('patient@example.com')
+        queue_emails([build_email(appointment, 'confirmed')])
+        queue_emails([build_email(appointment, 'confirmed'), build_email(appointment, 'reminder')])
+        self.assertEqual(sorted(OutboundEmail.objects.values_list('kind', flat=True)), ['confirmed', 'reminder'])
+
+    def test_send_emails_drains_in_batches(self):
+        queue_emails([build_email(self.confirmed(f'p{i}@example.com'), 'confirmed') for i in range(5)])
+        err = StringIO()
+
+        call_command('send_emails', batch_size=2, stdout=StringIO(), stderr=err)
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(err.getvalue().count('batch of'), 3)
+        self.assertEqual(set(OutboundEmail.objects.values_list('status', 'attempts')), {('sent', 1)})
+
+    @override_settings(EMAIL_BACKEND='core.tests.BouncingEmailBackend')
+    def test_failed_sends_are_retried_then_given_up(self):
+        queue_emails([build_email(self.confirmed('ok@example.com'), 'confirmed'),
+                      build_email(self.confirmed('gone@bounce.example'), 'confirmed')])
+
+        call_command('send_emails', max_attempts=2, stdout=StringIO(), stderr=StringIO())
+        bounced = OutboundEmail.objects.get(to='gone@bounce.example')
+        self.assertEqual((bounced.status, bounced.attempts), ('pending', 1))
+        self.assertGreater(bounced.next_attempt_at, timezone.now())
+        self.assertEqual([message.to for message in mail.outbox], [['ok@example.com']])
+
+        # Not due yet: the backoff keeps it out of the next run
+        call_command('send_emails', max_attempts=2, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(OutboundEmail.objects.get(pk=bounced.pk).attempts, 1)
+
+        OutboundEmail.objects.filter(pk=bounced.pk).update(next_attempt_at=timezone.now())
+        call_command('send_emails', max_attempts=2, stdout=StringIO(), stderr=StringIO())
+        bounced.refresh_from_db()
+        self.assertEqual((bounced.status, bounced.attempts), ('failed', 2))
+        self.assertIn('mailbox unavailable', bounced.last_error)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ratelimit-tests'}},
+    RATELIMIT_ENABLED=True, RATELIMIT_IP_HEADER='REMOTE_ADDR', RATELIMITS={},
+)
+class RateLimitTests(TestCase):
+    # The start of a one-minute window, so the sliding count is exact
+    NOW = 6000.0
+
+    def setUp(self):
+        cache.clear()
+        clock = mock.patch('core.ratelimit.time.time', return_value=self.NOW)
+        self.clock = clock.start()
+        self.addCleanup(clock.stop)
+        self.users = [User.objects.create_user(f'patient{n}') for n in range(2)]
+
+    def get(self, view, user=None, ip='10.0.0.1'):
+        request = RequestFactory().get('/', REMOTE_ADDR=ip)
+        request.user = user or AnonymousUser()
+        return view(request)
+
+    def limited_view(self, key='user_or_ip'):
+        return ratelimit('test', '2/m', key=key)(lambda request: HttpResponse('ok'))
+
+    def test_limit_answers_429_with_retry_after(self):
+        view = self.limited_view()
+        self.assertEqual([self.get(view).status_code for _ in range(2)], [200, 200])
+
+        response = self.get(view)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+    def test_previous_window_slides_out(self):
+        view = self.limited_view()
+        for _ in range(2):
+            self.get(view)
+
+        # Halfway through the next minute half of the last minute still counts
+        self.clock.return_value = self.NOW + 90
+        self.assertEqual(self.get(view).status_code, 200)
+        response = self.get(view)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+    def test_signed_in_users_are_counted_per_account(self):
+        view = self.limited_view()
+        for user in self.users:
+            self.assertEqual([self.get(view, user).status_code for _ in range(2)], [200, 200])
+        self.assertEqual(self.get(view, self.users[0]).status_code, 429)
+        # Anonymous clients on the same address have their own count
+        self.assertEqual(self.get(view).status_code, 200)
+
+    def test_ip_key_counts_every_client_on_an_address(self):
+        view = self.limited_view(key='ip')
+        for user in self.users:
+            self.get(view, user)
+        self.assertEqual(self.get(view).status_code, 429)
+        self.assertEqual(self.get(view, ip='10.0.0.2').status_code, 200)
+
+    def test_search_view_is_limited(self):
+        with override_settings(RATELIMITS={'search': '1/m'}):
+            self.assertEqual(self.client.get(reverse('unified_search'), {'q': 'x'}).status_code, 200)
+            response = self.client.get(reverse('unified_search'), {'q': 'x'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_disabled_limits_let_everything_through(self):
+        view = self.limited_view()
+        with override_settings(RATELIMIT_ENABLED=False):
+            self.assertEqual({self.get(view).status_code for _ in range(5)}, {200})
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """Routing through a replica alias that mirrors the test database"""
+
+    # Resolved in setUpClass, once the replica alias exists
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        # What the test runner does for a configured replica: point it at the test database
+        settings.DATABASES['replica_0'] = {**connections['default'].settings_dict, 'TEST': {'MIRROR': 'default'}}
+        cls.addClassCleanup(settings.DATABASES.pop, 'replica_0')
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica_0'].close()
+        del connections['replica_0']
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = Doctor.objects.create(name='Replica', hospital='H', address='A', city='C', fee=500)
+        User.objects.create_user('patient', password='pw')
+
+    def get_doctor_page(self):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica_0']) as replica:
+            response = self.client.get(reverse('doctor_detail', args=[self.doctor.pk]))
+        self.assertContains(response, 'Replica')
+        return len(primary), len(replica)
+
+    def test_replica_safe_views_read_from_the_replica(self):
+        _, replica = self.get_doctor_page()
+        self.assertGreater(replica, 0)
+        # Outside a replica-safe view reads stay on the primary
+        self.assertEqual(Doctor.objects.all().db, 'default')
+
+    def test_client_reads_its_own_writes_after_a_post(self):
+        response = self.client.post(reverse('login'), {'username': 'patient', 'password': 'pw'})
+        cookie = response.cookies[STICKY_COOKIE_NAME]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        self.assertTrue(cookie['httponly'])
+
+        primary, replica = self.get_doctor_page()
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+        # Once the window has passed the client is back on the replica
+        self.client.cookies[STICKY_COOKIE_NAME] = f'{time.time() - 1:.0f}'
+        _, replica = self.get_doctor_page()
+        self.assertGreater(replica, 0)
+
+    def test_safe_requests_leave_the_sticky_window_alone(self):
+        response = self.client.get(reverse('doctors'))
+        self.assertNotIn(STICKY_COOKIE_NAME, response.cookies)
+
+
+class ReplicaStickinessMiddlewareTests(SimpleTestCase):
+    def test_unused_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaStickinessMiddleware(lambda request: None)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctors = [
+            Doctor.objects.create(name=f'Doctor {n}', hospital='H', address='A', city='C', fee=500) for n in range(4)
+        ]
+
+    def get(self, name='api_doctors', **params):
+        return self.client.get(reverse(name), params)
+
+    def test_cursor_pages_through_every_row_once(self):
+        seen, response = [], self.get(limit=2)
+        while True:
+            page = response.json()
+            seen += [doctor['id'] for doctor in page['results']]
+            if page['next'] is None:
+                break
+            response = self.client.get(page['next'])
+        self.assertEqual(seen, [doctor.pk for doctor in self.doctors])
+
+        # The limit+1 row only decides whether there is a next page
+        page = self.get(limit=2, cursor=encode_cursor(self.doctors[1].pk)).json()
+        self.assertEqual(([doctor['id'] for doctor in page['results']], page['next']),
+                         ([self.doctors[2].pk, self.doctors[3].pk], None))
+
+    def test_bad_cursors_are_client_errors(self):
+        for cursor in ['not base64!', encode_cursor('abc'), encode_cursor(10 ** 40), encode_cursor(-1), 'é']:
+            response = self.get(cursor=cursor)
+            self.assertEqual((response.status_code, response.json()), (400, {'error': 'Invalid cursor'}), cursor)
+
+    def test_fields_select_the_projection(self):
+        page = self.get(fields='id, name', limit=1).json()
+        self.assertEqual(page['results'], [{'id': self.doctors[0].pk, 'name': 'Doctor 0'}])
+
+        for fields in ['id,password', ',']:
+            response = self.get(fields=fields)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('Available: id, name', response.json()['error'])
+
+    def test_limit_bounds(self):
+        for limit in ['0', str(MAX_LIMIT + 1), 'ten']:
+            self.assertEqual(self.get(limit=limit).status_code, 400, limit)
+        self.assertEqual(len(json.loads(b''.join(self.get(limit=MAX_LIMIT).streaming_content))['results']), 4)
+
+    def test_large_pages_are_streamed(self):
+        small, large = self.get(limit=STREAM_THRESHOLD), self.get(limit=STREAM_THRESHOLD + 1)
+        self.assertFalse(small.streaming)
+        self.assertTrue(large.streaming)
+        page = json.loads(b''.join(large.streaming_content))
+        self.assertEqual((len(page['results']), page['next']), (4, None))
+        self.assertEqual(page, small.json())
+
+    def test_reviews_page_newest_first(self):
+        users = [User.objects.create_user(f'reviewer{n}') for n in range(3)]
+        reviews = [Review.objects.create(user=user, doctor=self.doctors[0], rating=5, comment='Good') for user in users]
+        url = reverse('api_doctor_reviews', args=[self.doctors[0].pk])
+
+        page = self.client.get(url, {'limit': 2}).json()
+        self.assertEqual([review['id'] for review in page['results']], [reviews[2].pk, reviews[1].pk])
+        page = self.client.get(page['next']).json()
+        self.assertEqual(([review['id'] for review in page['results']], page['next']), ([reviews[0].pk], None))
+        self.assertEqual(self.client.get(reverse('api_doctor_reviews', args=[0])).status_code, 404)
+
+    def test_my_appointments_requires_login(self):
+        response = self.get('api_my_appointments')
+        self.assertEqual((response.status_code, response.json()), (401, {'error': 'Authentication required'}))
+
+        mine = create_appointment('confirmed')
+        create_appointment('confirmed')
+        self.client.force_login(mine.user)
+        page = self.get('api_my_appointments').json()
+        self.assertEqual([appointment['id'] for appointment in page['results']], [mine.pk])
+
+
+class ConditionalPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = Doctor.objects.create(name='Dr A', hospital='H', address='A', city='C', fee=500)
+        Doctor.objects.create(name='Dr B', hospital='H', address='A', city='C', fee=500)
+
+    def test_weak_etag_answers_304(self):
+        response = self.client.get(reverse('doctors'))
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn('Cookie', response['Vary'])
+
+        response = self.client.get(reverse('doctors'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_is_per_user(self):
+        anonymous = self.client.get(reverse('doctors'))['ETag']
+        self.client.force_login(User.objects.create_user('patient'))
+        response = self.client.get(reverse('doctors'), HTTP_IF_NONE_MATCH=anonymous)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], anonymous)
+
+        url = reverse('doctor_detail', args=[self.doctor.pk])
+        self.assertNotIn('Last-Modified', self.client.get(url))
+        self.client.logout()
+        self.assertIn('Last-Modified', self.client.get(url))
+
+    def test_pending_messages_skip_the_304(self):
+        etag = self.client.get(reverse('doctors'))['ETag']
+        self.client.cookies[CookieStorage.cookie_name] = 'pending'
+        response = self.client.get(reverse('doctors'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_doctor_list_notices_deletions(self):
+        response = self.client.get(reverse('doctors'))
+        self.assertNotIn('Last-Modified', response)
+        Doctor.objects.exclude(pk=self.doctor.pk).delete()
+
+        response = self.client.get(reverse('doctors'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('doctors'), HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.a = self.doctor('X', '4.0', specialization='cardiology')
+        self.b = self.doctor('X', '5.0', experience=5)
+        self.c = self.doctor('Y', '5.0')
+        self.d = self.doctor('X', '5.0', is_available=False)
+        # Never visited: only the new-user fallback can pick it
+        self.e = self.doctor('Y', '5.0', specialization='dermatology', experience=10)
+        self.u1, self.u2, self.u3 = (User.objects.create_user(f'patient{n}') for n in range(3))
+        for user, doctor in [(self.u1, self.a), (self.u1, self.b), (self.u2, self.a), (self.u2, self.c),
+                             (self.u3, self.a), (self.u3, self.b), (self.u3, self.d)]:
+            self.visit(user, doctor)
+        self.visit(self.u3, self.c, status='cancelled')
+        self.visit(self.u1, self.c, model=AppointmentArchive, id=10 ** 6, status='completed',
+                   created_at=timezone.now(), updated_at=timezone.now())
+
+    def doctor(self, city, rating, **fields):
+        return Doctor.objects.create(name='Dr', hospital='H', address='A', city=city, fee=500,
+                                     rating=Decimal(rating), **fields)
+
+    def visit(self, user, doctor, model=Appointment, status='confirmed', **fields):
+        return model.objects.create(user=user, doctor=doctor, patient_name='P', date=date(2030, 1, 1),
+                                    time=dt_time(10, 0), fee=500, status=status, **fields)
+
+    def build(self, *args):
+        call_command('build_recommendations', *args, stdout=StringIO(), stderr=StringIO())
+
+    def recommended(self, **filters):
+        model = DoctorRecommendation if 'doctor' in filters else UserRecommendation
+        field = 'recommended' if 'doctor' in filters else 'doctor'
+        return [(getattr(row, f'{field}_id'), row.score) for row in model.objects.filter(**filters).order_by('rank')]
+
+    def assertRecommended(self, actual, expected):
+        self.assertEqual([pk for pk, _ in actual], [pk for pk, _ in expected])
+        for (_, score), (_, expected_score) in zip(actual, expected):
+            self.assertAlmostEqual(score, expected_score)
+
+    def test_scores_and_boosts(self):
+        # Visitors (cancelled visits ignored, archived counted): a=3, b=2, c=2, d=1 (unavailable)
+        self.build()
+        a_to_b = 2 / math.sqrt(3 * 2) * (1 + SAME_CITY_BOOST) * (1 + RATING_BOOST)
+        a_to_c = 2 / math.sqrt(3 * 2) * (1 + RATING_BOOST)
+        self.assertRecommended(self.recommended(doctor=self.a), [(self.b.pk, a_to_b), (self.c.pk, a_to_c)])
+        b_to_a = 2 / math.sqrt(2 * 3) * (1 + SAME_CITY_BOOST) * (1 + RATING_BOOST * 4 / 5)
+        self.assertRecommended(self.recommended(doctor=self.b), [(self.a.pk, b_to_a), (self.c.pk, 1 / 2 * 1.2)])
+        self.assertFalse(DoctorRecommendation.objects.filter(recommended=self.d).exists())
+
+        # Users get their seen doctors' neighbours, summed, minus what they saw
+        c_to_b = 1 / math.sqrt(2 * 2) * (1 + RATING_BOOST)
+        self.assertRecommended(self.recommended(user=self.u2), [(self.b.pk, a_to_b + c_to_b)])
+        self.assertRecommended(self.recommended(user=self.u3), [(self.c.pk, a_to_c + 1 / 2 * 1.2)])
+
+        # The temporary visits table is dropped, so a second run starts clean
+        self.build()
+        self.assertRecommended(self.recommended(doctor=self.a), [(self.b.pk, a_to_b), (self.c.pk, a_to_c)])
+
+    def test_incremental_run_refreshes_recent_users_only(self):
+        self.build()
+        doctor_rows = self.recommended(doctor=self.b)
+        Appointment.objects.filter(user__in=[self.u1, self.u2]).update(updated_at=timezone.now() - timedelta(days=1))
+        UserRecommendation.objects.filter(user=self.u1).delete()
+        newcomer = User.objects.create_user('newcomer')
+        self.visit(newcomer, self.b)
+
+        self.build('--since-hours', '1')
+        self.assertEqual(self.recommended(user=self.u1), [])
+        self.assertEqual([pk for pk, _ in self.recommended(user=newcomer)], [self.a.pk, self.c.pk])
+        # Doctor recommendations are reused, not rebuilt from the new visit
+        self.assertEqual(self.recommended(doctor=self.b), doctor_rows)
+
+    def test_home_falls_back_without_recommendations(self):
+        self.build()
+        self.client.force_login(self.u2)
+        self.assertEqual(list(self.client.get(reverse('home')).context['featured_doctors']), [self.b])
+
+        # Seen specializations, then top rated available doctors
+        UserRecommendation.objects.all().delete()
+        featured = self.client.get(reverse('home')).context['featured_doctors']
+        self.assertEqual(list(featured), [self.b, self.c, self.a])
+        self.client.force_login(User.objects.create_user('new'))
+        featured = self.client.get(reverse('home')).context['featured_doctors']
+        self.assertEqual(list(featured), [self.e, self.b, self.c])
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        self.appointment = create_appointment('confirmed')
+        self.user, self.doctor = self.appointment.user, self.appointment.doctor
+        Appointment.objects.filter(pk=self.appointment.pk).update(notes='Bring reports, fasting; 8h')
+        self.book('pending_payment', dt_time(11, 0))
+        self.book('cancelled', dt_time(12, 0))
+        self.book('completed', dt_time(9, 0), date=timezone.localdate() - timedelta(days=FEED_PAST_DAYS + 1))
+
+    def book(self, status, time, date=date(2030, 1, 1), user=None):
+        return Appointment.objects.create(
+            user=user or self.user, doctor=self.doctor, patient_name='Patient',
+            date=date, time=time, fee=500, status=status,
+        )
+
+    def url(self, kind, pk, token=None):
+        name = 'patient_calendar' if kind == 'user' else 'doctor_calendar'
+        return reverse(name, kwargs={'pk': pk, 'token': token or feed_token(kind, pk)})
+
+    def body(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_token_is_checked(self):
+        other = User.objects.create_user('other')
+        for url in [
+            self.url('user', self.user.pk, token='0' * 32),
+            self.url('user', self.user.pk, token=feed_token('user', other.pk)),
+            # Tokens are bound to the feed kind as well as the id
+            self.url('doctor', self.user.pk, token=feed_token('user', self.user.pk)),
+        ]:
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+        self.assertEqual(self.client.post(self.url('user', self.user.pk)).status_code, 405)
+
+    def test_patient_feed_is_streamed(self):
+        other = User.objects.create_user('other')
+        self.book('confirmed', dt_time(13, 0), user=other)
+
+        response = self.client.get(self.url('user', self.user.pk))
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertIn('private', response['Cache-Control'])
+        body = self.body(response)
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VEVENT\r\nEND:VCALENDAR\r\n'))
+        # Active appointments in the window only, in date and time order
+        self.assertEqual(re.findall(r'STATUS:(\w+)', body), ['CONFIRMED', 'TENTATIVE'])
+        self.assertIn(f'UID:appointment-{self.appointment.pk}@medicare', body)
+        self.assertIn('SUMMARY:Dr. Test (Patient)', body)
+
+    def test_doctor_feed_is_streamed(self):
+        body = self.body(self.client.get(self.url('doctor', self.doctor.pk)))
+        self.assertIn('X-WR-CALNAME:Dr. Test\r\n', body)
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn('DESCRIPTION:Bring reports\\, fasting\\; 8h\r\n', body)
+
+    def test_unchanged_feed_is_304_from_one_query(self):
+        url = self.url('user', self.user.pk)
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.appointment.transition('cancelled')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_event_escapes_and_folds(self):
+        text = event(
+            1, date(2030, 1, 1), dt_time(10, 0), 'confirmed', timezone.now(),
+            'Dr. Ø; Smith, MD', description='Line one\nback\\slash ' + 'é' * 60,
+        )
+        lines = text.split('\r\n')
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        unfolded = text.replace('\r\n ', '')
+        self.assertIn('SUMMARY:Dr. Ø\\; Smith\\, MD\r\n', unfolded)
+        self.assertIn('DESCRIPTION:Line one\\nback\\\\slash ' + 'é' * 60 + '\r\n', unfolded)
+        # Continuation lines start with a space and never split a UTF-8 character
+        self.assertTrue(any(line.startswith(' é') for line in lines))
+
+
+class LargeTableAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Doctor.objects.bulk_create([
+            Doctor(name=f'Doctor {n}', hospital='H', address='A', city=f'City {n % 7}', fee=500) for n in range(1100)
+        ])
+
+    def test_count_estimates_only_unfiltered_large_tables(self):
+        doctors = Doctor.objects.order_by('pk')
+        with mock.patch('core.pagination.estimated_row_count', return_value=50000) as estimate:
+            self.assertEqual(LargeTablePaginator(doctors, 20).count, 50000)
+            self.assertEqual(LargeTablePaginator(doctors.filter(city='City 1'), 20).count, 157)
+            estimate.return_value = LargeTablePaginator.estimate_threshold - 1
+            self.assertEqual(LargeTablePaginator(doctors, 20).count, 1100)
+            estimate.return_value = None
+            self.assertEqual(LargeTablePaginator(doctors, 20).count, 1100)
+        self.assertEqual(estimate.call_count, 3)
+
+    def test_deep_pages_match_plain_slicing(self):
+        for doctors in [Doctor.objects.order_by('-pk'), Doctor.objects.order_by('city', 'pk')]:
+            paginator = LargeTablePaginator(doctors, 20)
+            for number in [1, 50, 51, 52, 55]:
+                bottom = (number - 1) * 20
+                self.assertEqual(list(paginator.page(number)), list(doctors[bottom:bottom + 20]), number)
+
+    def test_autocomplete_filter_narrows_changelist(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        mine = create_appointment('confirmed')
+        create_appointment('confirmed')
+        url = reverse('admin:core_appointment_changelist')
+
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+        self.assertContains(response, 'name="doctor-autocomplete"')
+        response = self.client.get(url, {'doctor': mine.doctor_id})
+        self.assertEqual(list(response.context['cl'].result_list), [mine])
+        response = self.client.get(url, {'user': mine.user_id, 'status': 'confirmed'})
+        self.assertEqual(list(response.context['cl'].result_list), [mine])
+        # A malformed id is a bad lookup, not a server error
+        self.assertRedirects(self.client.get(url, {'doctor': 'x'}), f'{url}?e=1')
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('patient', password='x')
+        self.doctor = Doctor.objects.create(name='Test', hospital='H', address='A', city='C', fee=500)
+        self.cutoff = date(2024, 1, 1)
+
+    def book(self, status, day, user=None):
+        return Appointment.objects.create(
+            user=user or self.user, doctor=self.doctor, patient_name='Patient',
+            date=day, time=dt_time(10, 0), fee=500, status=status, notes='Notes',
+        )
+
+    def test_moves_finished_rows_before_cutoff_in_batches(self):
+        old = [self.book(status, date(2023, 6, 1)) for status in ['completed', 'cancelled', 'completed']]
+        kept = [
+            self.book('confirmed', date(2023, 6, 1)),
+            self.book('pending_payment', date(2023, 6, 1)),
+            self.book('completed', self.cutoff),
+        ]
+
+        self.assertEqual(archive_batch(self.cutoff, 2), 2)
+        self.assertEqual(set(AppointmentArchive.objects.values_list('pk', flat=True)), {old[0].pk, old[1].pk})
+        self.assertEqual((archive_batch(self.cutoff, 2), archive_batch(self.cutoff, 2)), (1, 0))
+        self.assertEqual(set(Appointment.objects.values_list('pk', flat=True)), {row.pk for row in kept})
+
+        archived = AppointmentArchive.objects.get(pk=old[2].pk)
+        for field in COPIED_FIELDS:
+            self.assertEqual(getattr(archived, field), getattr(old[2], field), field)
+
+    def test_copy_and_delete_share_a_transaction(self):
+        appointment = self.book('completed', date(2023, 6, 1))
+        with mock.patch('django.db.models.query.QuerySet.delete', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                archive_batch(self.cutoff, 10)
+        self.assertFalse(AppointmentArchive.objects.exists())
+        self.assertTrue(Appointment.objects.filter(pk=appointment.pk).exists())
+
+    def test_receipt_resolves_archived_rows(self):
+        appointment = self.book('completed', date(2023, 6, 1))
+        archive_batch(self.cutoff, 10)
+        url = reverse('download_receipt', args=[appointment.pk])
+
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'application/pdf'))
+        self.client.force_login(User.objects.create_user('other'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_report(self):
+        self.book('completed', date(2023, 6, 1))
+        out = StringIO()
+        call_command('archive_appointments', '--older-than-days', '0', '--report', stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['archived'], 1)
+        self.assertEqual((report['before']['hot_rows'], report['after']['hot_rows']), (1, 0))
+        self.assertEqual(report['after']['archive_rows'], 1)
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        rate = override_settings(PERF_SAMPLE_RATE=1, PERF_LOG_FILE=os.path.join(root.name, 'logs', 'perf.jsonl'))
+        rate.enable()
+        self.addCleanup(rate.disable)
+
+    def view(self, request):
+        list(Doctor.objects.all())
+        with perf.timed('razorpay'):
+            pass
+        return HttpResponse(engines.all()[0].from_string('{{ name }}').render({'name': 'page'}))
+
+    def call(self, middleware):
+        request = RequestFactory().get('/doctors/')
+        request.resolver_match = None
+        return middleware(request)
+
+    def test_sampled_request_gets_server_timing_and_a_log_line(self):
+        with self.assertLogs('core.perf', 'INFO') as logs:
+            response = self.call(PerformanceMiddleware(self.view))
+
+        metrics = [metric.split(';') for metric in response['Server-Timing'].split(', ')]
+        self.assertEqual([metric[0] for metric in metrics], ['db', 'razorpay', 'template', 'total'])
+        self.assertEqual(metrics[0][2], 'desc="1 queries"')
+        self.assertTrue(all(re.fullmatch(r'dur=\d+\.\d', metric[1]) for metric in metrics))
+
+        line, = logs.records
+        record = json.loads(line.getMessage())
+        self.assertEqual(
+            {key: record[key] for key in ('method', 'path', 'view', 'status', 'sql_count')},
+            {'method': 'GET', 'path': '/doctors/', 'view': None, 'status': 200, 'sql_count': 1},
+        )
+        self.assertLessEqual({'total_ms', 'sql_ms', 'razorpay_ms', 'template_ms'}, set(record))
+
+    def test_sample_rate(self):
+        with override_settings(PERF_SAMPLE_RATE=0), self.assertRaises(MiddlewareNotUsed):
+            PerformanceMiddleware(self.view)
+
+        with override_settings(PERF_SAMPLE_RATE=0.5):
+            middleware = PerformanceMiddleware(self.view)
+        with mock.patch('core.middleware.random.random', side_effect=[0.2, 0.7]), \
+                self.assertLogs('core.perf', 'INFO') as logs:
+            sampled, skipped = self.call(middleware), self.call(middleware)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('Server-Timing', sampled)
+        self.assertNotIn('Server-Timing', skipped)
+
+    def test_spans_outside_a_sampled_request_are_ignored(self):
+        self.assertIsNone(perf.current())
+        with perf.timed('razorpay'):
+            pass
+
+        timings = perf.RequestTimings()
+        token = perf.activate(timings)
+        try:
+            for _ in range(2):
+                with perf.timed('razorpay'):
+                    time.sleep(0.001)
+        finally:
+            perf.deactivate(token)
+        self.assertEqual(list(timings.spans), ['razorpay'])
+        self.assertGreaterEqual(timings.spans['razorpay'], 0.002)
+
+    def test_log_lines_are_written_in_batches(self):
+        path = os.path.join(tempfile.mkdtemp(), 'perf.jsonl')
+        self.addCleanup(os.unlink, path)
+        handler = perf.BufferedRotatingFileHandler(path, capacity=3, flush_interval=60, delay=True)
+        self.addCleanup(handler.close)
+        logger = logging.getLogger('core.tests.perf')
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        for n in range(2):
+            logger.warning('line %s', n)
+        self.assertFalse(os.path.exists(path))
+        logger.warning('line 2')
+        with open(path) as fh:
+            self.assertEqual(fh.read().splitlines(), ['line 0', 'line 1', 'line 2'])
+
+
+class QueryInsightsTests(TestCase):
+    def test_fingerprint_normalises_parameters(self):
+        cases = {
+            "SELECT * FROM t WHERE name = 'O''Brien' AND id = 42": 'SELECT * FROM t WHERE name = ? AND id = ?',
+            'SELECT * FROM t WHERE fee > 12.50 LIMIT 21': 'SELECT * FROM t WHERE fee > ? LIMIT ?',
+            'SELECT * FROM t WHERE id IN (%s, %s, %s)': 'SELECT * FROM t WHERE id IN (?+)',
+            'SELECT * FROM t WHERE id IN (1,2)': 'SELECT * FROM t WHERE id IN (?+)',
+            'SELECT  *\n  FROM t2\tWHERE id = %s ': 'SELECT * FROM t2 WHERE id = ?',
+        }
+        for sql, expected in cases.items():
+            self.assertEqual(fingerprint(sql), expected, sql)
+        # Lists of any length share one fingerprint
+        self.assertEqual(fingerprint('SELECT a WHERE id IN (%s, %s)'), fingerprint('SELECT a WHERE id IN (%s, %s, %s)'))
+
+    def capture(self, threshold, queries):
+        insights = QueryInsights(threshold)
+        with mock.patch.object(insights, 'explain', wraps=insights.explain) as explain, \
+                connection.execute_wrapper(insights.wrapper):
+            queries()
+        return insights, explain
+
+    def test_only_slow_selects_are_explained_once_per_fingerprint(self):
+        def queries():
+            for pk in (1, 2):
+                list(Doctor.objects.filter(pk=pk))
+            Doctor.objects.filter(pk=1).update(fee=600)
+
+        insights, explain = self.capture(0, queries)
+        entries = {entry['fingerprint'].split()[0]: entry for entry in insights.as_list()}
+        self.assertEqual(entries['SELECT']['count'], 2)
+        self.assertTrue(entries['SELECT']['explain'])
+        self.assertIsNone(entries['UPDATE']['explain'])
+        self.assertEqual(explain.call_count, 1)
+
+        insights, explain = self.capture(60_000, queries)
+        self.assertEqual(explain.call_count, 0)
+
+    def test_failed_explain_is_confined_to_a_savepoint(self):
+        insights = QueryInsights(0)
+        with mock.patch.object(connection.ops, 'explain_query_prefix', return_value='EXPLAIN NONSENSE'), \
+                CaptureQueriesContext(connection) as captured, connection.execute_wrapper(insights.wrapper):
+            list(Doctor.objects.all())
+        entry, = insights.as_list()
+        self.assertTrue(entry['explain'].startswith('EXPLAIN failed'))
+        self.assertFalse(connection.needs_rollback)
+        self.assertTrue(any(query['sql'].startswith('ROLLBACK TO SAVEPOINT') for query in captured))
+        self.assertEqual(Doctor.objects.count(), 0)
+
+    def test_query_report_aggregates_per_view_and_fingerprint(self):
+        def record(view, count, total, worst, plan):
+            return {'ts': 0, 'view': view, 'queries': [
+                {'fingerprint': 'SELECT ?', 'count': count, 'total_ms': total, 'max_ms': worst, 'explain': plan},
+            ]}
+
+        log = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False)
+        self.addCleanup(os.unlink, log.name)
+        with log:
+            for line in (record('home', 2, 10.0, 6.0, 'plan a'), record('home', 3, 30.0, 20.0, 'plan b'),
+                         record('doctors', 1, 1.0, 1.0, None)):
+                log.write(json.dumps(line) + '\n')
+            log.write('not json\n')
+
+        out = StringIO()
+        call_command('query_report', file=log.name, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['requests'], 3)
+        home, doctors = report['queries']
+        self.assertEqual(
+            (home['view'], home['count'], home['total_ms'], home['avg_ms'], home['max_ms'], home['explain']),
+            ('home', 5, 40.0, 8.0, 20.0, 'plan b'),
+        )
+        self.assertEqual(doctors['view'], 'doctors')
+
+        out = StringIO()
+        call_command('query_report', file=log.name, json=True, view='doctors', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['requests'], 1)
+
+
+class AdminActionTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        self.doctor = Doctor.objects.create(name='Test', hospital='H', address='A', city='C', fee=500)
+        self.patient = User.objects.create_user('patient', email='patient@example.com')
+
+    def run_action(self, model, action, objects, **data):
+        url = reverse(f'admin:core_{model}_changelist')
+        return self.client.post(url, {'action': action, '_selected_action': [obj.pk for obj in objects], **data})
+
+    def book(self, status, hour=10, user=None):
+        return Appointment.objects.create(
+            user=user or self.patient, doctor=self.doctor, patient_name='Patient',
+            date=date(2030, 1, 1), time=dt_time(hour, 0), fee=500, status=status,
+        )
+
+    def assertLoggedOnce(self, repr, message):
+        entry = LogEntry.objects.get()
+        self.assertEqual((entry.object_repr, entry.change_message), (repr, message))
+
+    def test_toggle_availability(self):
+        other = Doctor.objects.create(name='Other', hospital='H', address='A', city='C', fee=500, is_available=False)
+        self.run_action('doctor', 'toggle_availability', [self.doctor, other])
+
+        self.assertEqual(
+            dict(Doctor.objects.values_list('pk', 'is_available')), {self.doctor.pk: False, other.pk: True}
+        )
+        self.assertLoggedOnce('2 doctors', 'Toggled availability')
+
+    def test_adjust_fee_asks_for_the_percentage_then_rounds(self):
+        other = Doctor.objects.create(name='Other', hospital='H', address='A', city='C', fee=Decimal('199.99'))
+        Doctor.objects.filter(pk=self.doctor.pk).update(fee=Decimal('333.33'))
+
+        response = self.run_action('doctor', 'adjust_fee', [self.doctor, other])
+        self.assertContains(response, 'applied to 2 selected doctors')
+        response = self.run_action('doctor', 'adjust_fee', [self.doctor, other], apply='1', percentage='-95')
+        self.assertContains(response, 'greater than or equal to -90')
+        self.assertFalse(LogEntry.objects.exists())
+
+        self.run_action('doctor', 'adjust_fee', [self.doctor], apply='1', percentage='12.5')
+        self.run_action('doctor', 'adjust_fee', [other], apply='1', percentage='-10')
+        fees = dict(Doctor.objects.values_list('pk', 'fee'))
+        self.assertEqual((fees[self.doctor.pk], fees[other.pk]), (Decimal('375.00'), Decimal('179.99')))
+        self.assertEqual(LogEntry.objects.count(), 2)
+
+    def test_mark_completed_only_moves_confirmed(self):
+        confirmed, pending = self.book('confirmed'), self.book('pending_payment', hour=11)
+        self.run_action('appointment', 'mark_completed', [confirmed, pending])
+
+        confirmed.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertEqual((confirmed.status, pending.status), ('completed', 'pending_payment'))
+        self.assertLoggedOnce('1 appointment', 'Marked as completed')
+
+    def test_mark_cancelled_queues_emails_and_promotes_waiters(self):
+        confirmed, pending = self.book('confirmed'), self.book('pending_payment', hour=11)
+        done = self.book('completed', hour=12)
+        waiter = User.objects.create_user('waiter', email='waiter@example.com')
+        WaitlistEntry.objects.create(user=waiter, doctor=self.doctor, date=confirmed.date, time=confirmed.time,
+                                     patient_name='Waiter')
+
+        self.run_action('appointment', 'mark_cancelled', [confirmed, pending, done])
+
+        self.assertEqual(
+            set(Appointment.objects.filter(user=self.patient).values_list('status', flat=True)),
+            {'cancelled', 'completed'},
+        )
+        promoted = Appointment.objects.get(user=waiter)
+        self.assertEqual((promoted.time, promoted.status), (confirmed.time, 'confirmed'))
+        self.assertLoggedOnce('2 appointments', 'Marked as cancelled')
+
+        # The cancellation goes in unrendered and is rendered by the sender
+        queued = OutboundEmail.objects.get(kind='cancelled')
+        self.assertEqual((queued.appointment_id, queued.to, queued.body), (confirmed.pk, 'patient@example.com', ''))
+        self.assertEqual(send_batch(claim_batch(10)), (2, 0))
+        cancelled_mail = next(message for message in mail.outbox if message.to == ['patient@example.com'])
+        self.assertIn('has been cancelled', cancelled_mail.body)
+        self.assertIn('Dr. Test', cancelled_mail.subject)
+
+    def test_mark_cancelled_queries_do_not_grow_with_the_selection(self):
+        def cancel(count):
+            Appointment.objects.all().delete()
+            booked = [self.book('confirmed', hour=hour) for hour in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                self.run_action('appointment', 'mark_cancelled', booked)
+            return len(queries)
+
+        cancel(2)  # warms the session and content type caches
+        self.assertEqual(cancel(2), cancel(20))
+
+
+class CachedUserTests(TestCase):
+    MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+
+    def setUp(self):
+        cache.clear()
+        auth._local.clear()
+        self.user = User.objects.create_user('patient', email='old@example.com', password='x')
+        self.profile = UserProfile.objects.create(user=self.user, phone_number='111')
+
+    def test_profile_form_save_invalidates_the_cached_user(self):
+        self.assertEqual(auth.cached_user(self.user.pk).profile.phone_number, '111')
+        form = UserProfileForm({'email': 'new@example.com', 'phone_number': '222'}, instance=self.profile)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+
+        user = auth.cached_user(self.user.pk)
+        self.assertEqual((user.email, user.profile.phone_number), ('new@example.com', '222'))
+
+    def test_local_copies_are_bounded(self):
+        users = [self.user] + [User.objects.create_user(f'other{i}', password='x') for i in range(2)]
+        with override_settings(AUTH_USER_LOCAL_MAX_ENTRIES=2):
+            for user in users:
+                auth.cached_user(user.pk)
+        self.assertEqual(list(auth._local), [users[1].pk, users[2].pk])
+
+        # Expired copies are dropped as others are added
+        auth._local.clear()
+        with override_settings(AUTH_USER_LOCAL_SECONDS=0):
+            for user in users:
+                auth.cached_user(user.pk)
+        self.assertEqual(len(auth._local), 0)
+
+    def profile_page_queries(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('profile'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_cached_backend_saves_the_user_and_profile_queries(self):
+        cached = self.profile_page_queries()
+        with override_settings(AUTHENTICATION_BACKENDS=[self.MODEL_BACKEND]):
+            uncached = self.profile_page_queries()
+        self.assertEqual(uncached - cached, 2)
+
+    def test_sessions_from_model_backend_still_resolve(self):
+        self.client.force_login(self.user, backend=self.MODEL_BACKEND)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+        self.assertEqual(self.client.session[BACKEND_SESSION_KEY], 'core.auth.CachedModelBackend')
+
+    def test_failed_login_checks_the_password_once(self):
+        check_password = User.check_password
+        with mock.patch.object(User, 'check_password', autospec=True, side_effect=check_password) as checked:
+            response = self.client.post(reverse('login'), {'username': 'patient', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(checked.call_count, 1)
+
+        # Unknown usernames pay for one dummy hash, not one per backend
+        set_password = User.set_password
+        with mock.patch.object(User, 'set_password', autospec=True, side_effect=set_password) as hashed:
+            self.client.post(reverse('login'), {'username': 'nobody', 'password': 'wrong'})
+        self.assertEqual(hashed.call_count, 1)
+
+
+class DoctorQuerySetTests(TestCase):
+    def setUp(self):
+        appointment = create_appointment('completed')
+        self.patient, self.doctor = appointment.user, appointment.doctor
+        for rating in (5, 4, 4, 2):
+            reviewer = User.objects.create_user(f'reviewer{rating}{Review.objects.count()}', password='x')
+            Review.objects.create(user=reviewer, doctor=self.doctor, rating=rating, comment='ok')
+
+    def test_detail_data_matches_the_per_property_queries(self):
+        plain = Doctor.objects.get(pk=self.doctor.pk)
+        expected = (plain.review_count, plain.avg_rating, [r.pk for r in plain.get_recent_reviews()])
+
+        with self.assertNumQueries(2):
+            doctor = Doctor.objects.with_detail_data(self.patient).get(pk=self.doctor.pk)
+            recent = doctor.get_recent_reviews()
+            usernames = [review.user.username for review in recent]
+            loaded = (doctor.review_count, doctor.avg_rating, [review.pk for review in recent])
+
+        self.assertEqual(loaded, expected)
+        self.assertEqual(expected[:2], (4, 3.75))
+        self.assertEqual(len(usernames), 3)
+        self.assertTrue(doctor.has_consulted)
+
+    def test_has_consulted_only_for_the_patient(self):
+        stranger = User.objects.create_user('stranger', password='x')
+        for user, consulted in ((self.patient, True), (stranger, False), (AnonymousUser(), False)):
+            self.assertIs(Doctor.objects.with_consulted(user).get(pk=self.doctor.pk).has_consulted, consulted)
+
+    def test_card_data_defers_description(self):
+        doctor = Doctor.objects.with_card_data().get(pk=self.doctor.pk)
+        self.assertEqual(doctor.get_deferred_fields(), {'description'})
+        self.assertEqual(doctor.review_count, 4)
+
+
+class DoctorImportTests(TestCase):
+    HEADER = 'registration_number,name,hospital,address,city,fee,image\n'
+
+    def row(self, number, name='Test', fee='500', image=''):
+        return {
+            'registration_number': number, 'name': name, 'hospital': 'H', 'address': 'A', 'city': 'C',
+            'fee': fee, 'image': image,
+        }
+
+    def importer(self, **kwargs):
+        errors = []
+        return DoctorImporter(on_error=lambda line, message: errors.append((line, message)), **kwargs), errors
+
+    def run_import(self, rows, **kwargs):
+        importer, errors = self.importer(**kwargs)
+        importer.run(enumerate(rows, start=1))
+        return importer, errors
+
+    def test_rows_upsert_on_registration_number(self):
+        existing = Doctor.objects.create(
+            registration_number='R1', name='Old', hospital='H', address='A', city='C', fee=500,
+        )
+
+        importer, errors = self.run_import([self.row('R1', name='New', fee='750'), self.row('R2')])
+
+        self.assertEqual((importer.imported, errors), (2, []))
+        self.assertEqual(Doctor.objects.count(), 2)
+        existing.refresh_from_db()
+        self.assertEqual((existing.name, existing.fee), ('New', 750))
+
+    def test_last_row_wins_for_a_key_repeated_in_a_batch(self):
+        importer, errors = self.run_import([self.row('R1', name='First'), self.row('R1', name='Last')])
+
+        self.assertEqual(errors, [])
+        self.assertEqual(list(Doctor.objects.values_list('name', flat=True)), ['Last'])
+
+    def test_failed_batch_falls_back_to_row_by_row(self):
+        bulk_create = DoctorQuerySet.bulk_create
+
+        def rejecting_bulk_create(queryset, objs, **kwargs):
+            if any(doctor.name == 'Rejected' for doctor in objs):
+                raise DatabaseError('rejected')
+            return bulk_create(queryset, objs, **kwargs)
+
+        rows = [self.row('R1'), self.row('R2', name='Rejected'), self.row('R3')]
+        with mock.patch.object(DoctorQuerySet, 'bulk_create', rejecting_bulk_create):
+            importer, errors = self.run_import(rows)
+
+        self.assertEqual((importer.imported, importer.failed), (2, 1))
+        self.assertEqual(errors, [(2, 'database: rejected')])
+        self.assertEqual(set(Doctor.objects.values_list('registration_number', flat=True)), {'R1', 'R3'})
+
+    def test_row_errors_carry_their_line_number(self):
+        csv_file = BytesIO((self.HEADER + 'R1,A,H,A,C,500,\nR2,B,H,A,C,cheap,\n,C,H,A,C,500,\n').encode())
+        importer, errors = self.importer()
+        importer.run(read_rows(csv_file, 'csv'))
+
+        self.assertEqual(importer.imported, 1)
+        self.assertEqual([line for line, _ in errors], [3, 4])
+        self.assertTrue(errors[0][1].startswith('fee: '))
+        self.assertEqual(errors[1][1], 'registration_number: this field is required')
+
+        jsonl_file = BytesIO(b'{"registration_number": "R3", "name": "D", "hospital": "H", '
+                             b'"address": "A", "city": "C", "fee": 500}\n\n{broken\n')
+        errors.clear()
+        importer.run(read_rows(jsonl_file, 'jsonl'))
+        self.assertEqual([line for line, _ in errors], [3])
+        self.assertTrue(Doctor.objects.filter(registration_number='R3').exists())
+
+    def test_local_images_must_stay_under_the_image_root(self):
+        root, media = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.addCleanup(media.cleanup)
+        os.mkdir(os.path.join(root.name, 'photos'))
+        with open(os.path.join(root.name, 'photos', 'r1.png'), 'wb') as fh:
+            fh.write(b'png')
+        with open(os.path.join(media.name, 'outside.png'), 'wb') as fh:
+            fh.write(b'png')
+
+        rows = [self.row('R1', image='photos/r1.png'), self.row('R2', image='../outside.png'),
+                self.row('R3', image=os.path.join(media.name, 'outside.png'))]
+        with override_settings(MEDIA_ROOT=media.name):
+            importer, errors = self.run_import(rows, image_root=root.name)
+
+        self.assertEqual((importer.imported, importer.images), (3, 1))
+        self.assertEqual([line for line, _ in errors], [2, 3])
+        self.assertTrue(all(message.startswith('image: ') for _, message in errors))
+        images = dict(Doctor.objects.values_list('registration_number', 'image'))
+        self.assertTrue(images['R1'].startswith('doctors/r1-'))
+        self.assertFalse(images['R2'] or images['R3'])
+
+    def test_admin_import_view_upserts_and_reports_rejected_lines(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(admin_user)
+        upload = SimpleUploadedFile('doctors.csv', (self.HEADER + 'R1,A,H,A,C,500,\nR2,B,H,A,C,-5,\n').encode())
+
+        response = self.client.post(reverse('admin:core_doctor_import'), {'file': upload}, follow=True)
+
+        self.assertRedirects(response, reverse('admin:core_doctor_changelist'))
+        self.assertEqual(list(Doctor.objects.values_list('registration_number', flat=True)), ['R1'])
+        reported = [str(message) for message in response.context['messages']]
+        self.assertTrue(any(message.startswith('line 3: fee: ') for message in reported), reported)
+
+
+class AppointmentTransitionConcurrencyTests(TransactionTestCase):
+    THREADS = 16
+
+    def race(self, appointment, actions):
+        """Call each action on its own copy of the appointment from separate threads at once"""
+        barrier = threading.Barrier(len(actions))
+        results = [None] * len(actions)
+        errors = []
+
+        def worker(index, action):
+            try:
+                # Each thread works on its own instance, as separate requests would
+                instance = Appointment.objects.get(pk=appointment.pk)
+                barrier.wait()
+                while True:
+                    try:
+                        results[index] = action(instance)
+                        break
+                    except OperationalError as e:
+                        # The in-memory SQLite test database reports lock contention
+                        # instead of waiting for it; retry as a busy timeout would
+                        if 'locked' not in str(e):
+                            raise
+                        time.sleep(0.001)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=worker, args=(i, action)) for i, action in enumerate(actions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_payment_confirmation_racing_cancellation(self):
+        confirm = lambda appointment: appointment.transition('confirmed')
+        # Cancelling an unpaid appointment only applies while it is still unpaid
+        cancel = lambda appointment: appointment.transition('cancelled', ['pending_payment'])
+        for _ in range(5):
+            appointment = create_appointment('pending_payment')
+            results = self.race(appointment, [confirm, cancel] * (self.THREADS // 2))
+
+            self.assertEqual(results.count(True), 1)
+            winner = 'confirmed' if results.index(True) % 2 == 0 else 'cancelled'
+            appointment.refresh_from_db()
+            self.assertEqual(appointment.status, winner)
+
+    def test_completion_racing_cancellation(self):
+        complete = lambda appointment: appointment.transition('completed')
+        cancel = lambda appointment: appointment.transition('cancelled')
+        appointment = create_appointment('confirmed')
+        results = self.race(appointment, [complete, cancel] * (self.THREADS // 2))
+
+        self.assertEqual(results.count(True), 1)
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.status, 'completed' if results.index(True) % 2 == 0 else 'cancelled')
+
+    def test_concurrent_cancellations_promote_one_waiter(self):
+        appointment = create_appointment('confirmed')
+        waiters = [
+            WaitlistEntry.objects.create(
+                user=User.objects.create_user(f'waiter{i}'), doctor=appointment.doctor,
+                date=appointment.date, time=appointment.time, patient_name=f'Waiter {i}',
+            )
+            for i in range(3)
+        ]
+        cancel = lambda appointment: cancel_and_promote(appointment, ['confirmed'])
+        results = self.race(appointment, [cancel] * self.THREADS)
+
+        self.assertEqual(results.count(True), 1)
+        statuses = list(WaitlistEntry.objects.order_by('id').values_list('status', flat=True))
+        self.assertEqual(statuses, ['promoted', 'waiting', 'waiting'])
+        active = Appointment.objects.filter(status__in=['confirmed', 'pending_payment'])
+        self.assertEqual(list(active.values_list('user', flat=True)), [waiters[0].user_id])
+
+
+class SlotPublisherTests(SimpleTestCase):
+    day = date(2030, 1, 1)
+
+    def setUp(self):
+        self.publisher = SlotPublisher()
+        self.publisher.cursor = timezone.now()
+
+    def listen(self, doctor_id, day):
+        queue = asyncio.Queue(QUEUE_SIZE)
+        self.publisher.listeners.setdefault((doctor_id, day), set()).add(queue)
+        return queue
+
+    def drain(self, queue):
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    def test_events_reach_pages_watching_that_doctor_and_date(self):
+        page = self.listen(1, self.day)
+        other_doctor = self.listen(2, self.day)
+        other_day = self.listen(1, date(2030, 1, 2))
+        written = self.publisher.cursor + timedelta(seconds=1)
+        self.publisher.publish([(1, self.day, dt_time(10, 0), 'confirmed', written, 1)])
+        self.publisher.publish([(1, self.day, dt_time(11, 0), 'cancelled', written, 2)])
+
+        self.assertEqual(self.drain(page), [
+            format_event('slot', {'time': '10:00', 'state': 'taken'}),
+            format_event('slot', {'time': '11:00', 'state': 'free'}),
+        ])
+        self.assertEqual(self.drain(other_doctor), [])
+        self.assertEqual(self.drain(other_day), [])
+
+    def test_newest_write_to_a_slot_wins(self):
+        page = self.listen(1, self.day)
+        cancelled = self.publisher.cursor + timedelta(seconds=1)
+        promoted = cancelled + timedelta(milliseconds=5)
+        # The next read overlaps the last one; old and repeated rows are skipped
+        self.publisher.publish([
+            (1, self.day, dt_time(10, 0), 'cancelled', cancelled, 1),
+            (1, self.day, dt_time(10, 0), 'confirmed', promoted, 2),
+        ])
+        self.publisher.publish([
+            (1, self.day, dt_time(10, 0), 'cancelled', cancelled, 1),
+            (1, self.day, dt_time(10, 0), 'confirmed', promoted, 2),
+        ])
+
+        self.assertEqual(self.drain(page), [
+            format_event('slot', {'time': '10:00', 'state': 'free'}),
+            format_event('slot', {'time': '10:00', 'state': 'taken'}),
+        ])
+
+    def test_page_that_falls_behind_is_resynced(self):
+        page = self.listen(1, self.day)
+        start = self.publisher.cursor
+        self.publisher.publish([
+            (1, self.day, dt_time(9 + i // 60, i % 60), 'confirmed', start + timedelta(seconds=i + 1), i)
+            for i in range(QUEUE_SIZE + 1)
+        ])
+
+        self.assertEqual(self.drain(page), [RESYNC])
+
+    def test_asgi_app_only_serves_the_events_url(self):
+        app = SlotEventsApp(None)
+        scope = {'type': 'http', 'method': 'GET', 'path': '/book-appointment/7/events/'}
+        self.assertEqual(app.match(scope), 7)
+        self.assertIsNone(app.match({**scope, 'method': 'POST'}))
+        self.assertIsNone(app.match({**scope, 'path': '/book-appointment/7/'}))
+        self.assertIsNone(app.match({**scope, 'type': 'websocket'}))
+
+
+class SlotPublisherPollTests(TransactionTestCase):
+    def test_bulk_update_larger_than_a_batch_is_published_in_one_poll(self):
+        user = User.objects.create_user('patient', password='x')
+        doctor = Doctor.objects.create(name='Test', hospital='H', address='A', city='C', fee=500)
+        days = [date(2030, 1, 1) + timedelta(days=i) for i in range(BATCH_SIZE // QUEUE_SIZE + 2)]
+        Appointment.objects.bulk_create([
+            Appointment(user=user, doctor=doctor, patient_name='P', date=day, fee=500, status='confirmed',
+                        time=dt_time(8 + i // 60, i % 60))
+            for day in days for i in range(QUEUE_SIZE)
+        ])
+        publisher = SlotPublisher()
+        publisher.cursor = timezone.now()
+        pages = [asyncio.Queue(QUEUE_SIZE) for _ in days]
+        for day, page in zip(days, pages):
+            publisher.listeners[(doctor.pk, day)] = {page}
+        # As the admin's bulk actions write: one updated_at for every row
+        Appointment.objects.update(status='cancelled', updated_at=publisher.cursor + timedelta(seconds=1))
+
+        asyncio.run(publisher.poll())
+
+        self.assertGreater(len(days) * QUEUE_SIZE, BATCH_SIZE)
+        self.assertEqual([page.qsize() for page in pages], [QUEUE_SIZE] * len(days))
+        self.assertEqual(publisher.cursor, Appointment.objects.first().updated_at)
+        # The next poll re-reads the commit lag window without publishing it again
+        asyncio.run(publisher.poll())
+        self.assertTrue(all(page.full() for page in pages))
+
+
+class SeedBenchTests(TestCase):
+    def test_seeded_slots_are_never_double_booked(self):
+        call_command('seed_bench', users=20, doctors=2, appointments=3000, reviews=10, stdout=StringIO())
+
+        held = Appointment.objects.exclude(status='cancelled')
+        slots = set(held.values_list('doctor_id', 'date', 'time'))
+        self.assertEqual(held.count(), len(slots))
+        self.assertEqual(Appointment.objects.count(), 3000)
+
+
+class ExportTests(TestCase):
+    def test_csv_cells_cannot_run_as_formulas(self):
+        user = User.objects.create_user('@admin')
+        doctor = Doctor.objects.create(name='Test', hospital='H', address='A', city='C', fee=500)
+        Review.objects.create(user=user, doctor=doctor, rating=5, comment='=HYPERLINK("http://evil.example")')
+        Review.objects.create(user=User.objects.create_user('plain'), doctor=doctor, rating=4, comment='-5 stars')
+
+        rows = list(csv.DictReader(StringIO(''.join(export_chunks('reviews', Review.objects.all(), 'csv')))))
+        self.assertEqual(
+            [(row['username'], row['comment'], row['rating']) for row in rows],
+            [("'@admin", '\'=HYPERLINK("http://evil.example")', '5'), ('plain', "'-5 stars", '4')],
+        )
+        # Only CSV is read by spreadsheets; JSON Lines keeps the exact text
+        lines = ''.join(export_chunks('reviews', Review.objects.all(), 'jsonl')).splitlines()
+        self.assertEqual(json.loads(lines[0])['comment'], '=HYPERLINK("http://evil.example")')
+
+
+class ExportSnapshotsTests(TestCase):
+    def test_pages_render_under_production_settings(self):
+        doctor = Doctor.objects.create(name='Test', hospital='H', address='A', city='C', fee=500)
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        production = override_settings(
+            DEBUG=False, SECURE_SSL_REDIRECT=True, ALLOWED_HOSTS=['.example.org'], SNAPSHOT_ROOT=root.name,
+        )
+
+        with production:
+            call_command('export_snapshots', workers=1, stdout=StringIO())
+
+        for path in ('index.html', 'doctors/index.html', f'doctor/{doctor.pk}/index.html'):
+            self.assertTrue(os.path.exists(os.path.join(root.name, path)), path)
+
+
+class StreamingResponseTests(SimpleTestCase):
+    def test_asgi_response_pulls_chunks_as_it_is_read(self):
+        pulled = []
+
+        def chunks():
+            for i in range(100):
+                pulled.append(i)
+                yield 'x' * (ASGI_BUFFER_SIZE // 4)
+
+        response = streaming_response(AsyncRequestFactory().get('/'), chunks())
+
+        async def first_part():
+            parts = aiter(response)
+            part = await anext(parts)
+            await parts.aclose()
+            return part
+
+        self.assertEqual(len(asyncio.run(first_part())), ASGI_BUFFER_SIZE)
+        self.assertEqual(len(pulled), 4)
+
+    def test_wsgi_response_keeps_the_sync_iterator(self):
+        response = streaming_response(RequestFactory().get('/'), iter(['a', 'b']))
+        self.assertFalse(response.is_async)
+        self.assertEqual(b''.join(response), b'ab')
+
+
+class AsyncPaymentClientTests(SimpleTestCase):
+    def test_wsgi_request_gets_its_own_client_closed_afterwards(self):
+        async def use():
+            async with async_client(RequestFactory().get('/')) as client:
+                self.assertFalse(client._http.is_closed)
+            return client
+
+        self.assertTrue(asyncio.run(use())._http.is_closed)
+
+    def test_asgi_requests_share_the_worker_client(self):
+        async def use():
+            clients = []
+            for _ in range(2):
+                async with async_client(AsyncRequestFactory().get('/')) as client:
+                    clients.append(client)
+            await client.aclose()
+            return clients
+
+        first, second = asyncio.run(use())
+        self.assertIs(first, second)
+
+
+class ProfilingTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        settings_override = override_settings(PROFILING_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Commands are applied by hand rather than by the watcher thread
+        self.worker = profiling.WorkerProfiler()
+        self.worker.reset()
+
+    def test_commands_get_increasing_ids_and_are_validated(self):
+        first = profiling.issue_cpu('download_receipt', requests=2)
+        second = profiling.issue_memory('start')
+        self.assertEqual((first['id'], second['id']), (1, 2))
+        self.assertEqual(set(profiling.read_control()), {'cpu', 'memory'})
+        with self.assertRaises(profiling.ProfilingError):
+            profiling.issue_cpu('no_such_view')
+        with self.assertRaises(profiling.ProfilingError):
+            profiling.issue_memory('restart')
+
+    def test_armed_worker_profiles_only_the_named_view(self):
+        command = profiling.issue_cpu('download_receipt', requests=2, fmt='pstats')
+        self.worker.apply(profiling.read_control())
+        factory = RequestFactory()
+
+        cpu = self.worker.cpu
+        self.assertFalse(self.worker.wants(factory.get('/doctors/'), cpu))
+        for _ in range(2):
+            request = factory.get('/appointment/receipt/5/')
+            self.assertTrue(self.worker.wants(request, cpu))
+            self.worker.profile(request, cpu, lambda request: sum(range(1000)))
+
+        self.assertIsNone(self.worker.cpu)
+        kind, stats = profiling.report(command['id'])
+        self.assertEqual(kind, 'pstats')
+        self.assertIn('<lambda>', {function for _, _, function in stats.stats})
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_middleware_survives_the_profile_being_disarmed(self):
+        profiling.issue_cpu('download_receipt', requests=5)
+        self.worker.apply(profiling.read_control())
+        self.worker.ensure_running = lambda: None
+        real_wants = self.worker.wants
+
+        def wants(request, *args):
+            # The control thread handles `stop` between the check and the profile
+            profiling.stop_cpu()
+            self.worker.apply(profiling.read_control())
+            return real_wants(request, *args)
+
+        with mock.patch.object(profiling, 'worker', self.worker), \
+                mock.patch.object(self.worker, 'wants', side_effect=wants):
+            middleware = ProfilingMiddleware(lambda request: HttpResponse('ok'))
+            response = middleware(RequestFactory().get('/appointment/receipt/5/'))
+        self.assertEqual(response.content, b'ok')
+        self.assertIsNone(self.worker.cpu)
+
+    def test_collapsed_stacks_are_merged_across_workers(self):
+        for pid, lines in ((101, 'a;b 3\na;c 1\n'), (102, 'a;b 2\n')):
+            with open(os.path.join(self.root, f'cpu-7-{pid}.collapsed'), 'w') as fh:
+                fh.write(lines)
+
+        self.assertEqual(profiling.report(7), ('collapsed', 'a;b 5\na;c 1\n'))
 
-# Create your tests here.
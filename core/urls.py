@@ -20,6 +20,9 @@ urlpatterns = [
     path('appointment/cancel/<int:appointment_id>/', views.cancel_appointment, name='cancel_appointment'),
     path('appointment/receipt/<int:appointment_id>/', views.download_receipt, name='download_receipt'),
     path('appointment/cancel-confirm/<int:appointment_id>/', views.cancel_appointment_confirmation, name='cancel_appointment_confirmation'),
+    path('book-appointment/<int:doctor_id>/events/', views.slot_events, name='slot_events'),
+    path('waitlist/join/<int:doctor_id>/', views.join_waitlist, name='join_waitlist'),
+    path('waitlist/leave/<int:entry_id>/', views.leave_waitlist, name='leave_waitlist'),
     
     # Payment URLs - Use consistent naming
     path('create-payment-order/<int:appointment_id>/', views.create_payment_order, name='create_payment_order'),
@@ -37,6 +40,23 @@ urlpatterns = [
     path('doctor/<int:doctor_id>/review/', views.submit_review, name='submit_review'),
     path('doctor/<int:doctor_id>/reviews/', views.doctor_reviews, name='doctor_reviews'),
     path('reviews/', views.all_reviews, name='all_reviews'),
+
+    # Read-only JSON API
+    path('api/v1/doctors/', views.api_doctors, name='api_doctors'),
+    path('api/v1/doctors/<int:doctor_id>/reviews/', views.api_doctor_reviews, name='api_doctor_reviews'),
+    path('api/v1/me/appointments/', views.api_my_appointments, name='api_my_appointments'),
+
+    # iCalendar feeds; the token in the URL stands in for a login
+    path('calendar/patient/<int:pk>/<str:token>.ics', views.patient_calendar, name='patient_calendar'),
+    path('calendar/doctor/<int:pk>/<str:token>.ics', views.doctor_calendar, name='doctor_calendar'),
 ]
+if settings.PROFILING_ENABLED:
+    # Staff-only; see core.profiling
+    urlpatterns += [
+        path('staff/profiling/', views.profiling_status, name='profiling_status'),
+        path('staff/profiling/memory/', views.profiling_memory, name='profiling_memory'),
+        path('staff/profiling/cpu/', views.profiling_cpu, name='profiling_cpu'),
+        path('staff/profiling/results/<int:command_id>/', views.profiling_result, name='profiling_result'),
+    ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,18 @@
+from .catalogue import home, doctors, doctor_detail, unified_search
+from .booking import (
+    book_appointment,
+    appointment_success,
+    my_appointments,
+    cancel_appointment_confirmation,
+    cancel_appointment,
+    join_waitlist,
+    leave_waitlist,
+    slot_events,
+)
+from .payments import create_payment_order, verify_payment
+from .receipts import download_receipt
+from .reviews import submit_review, doctor_reviews, all_reviews
+from .profile import register, profile
+from .api import api_doctors, api_doctor_reviews, api_my_appointments
+from .feeds import patient_calendar, doctor_calendar
+from .profiling import profiling_status, profiling_memory, profiling_cpu, profiling_result
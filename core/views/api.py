@@ -0,0 +1,206 @@
+import base64
+import binascii
+import functools
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+
+from ..models import Doctor, Appointment, Review
+from ..routers import replica_safe
+from ..streaming import streaming_response
+from .catalogue import search_doctors
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+# Pages above this size are streamed row by row instead of built in memory
+STREAM_THRESHOLD = 200
+
+# Read-only JSON API (v1): rows are serialized straight from values_list()
+# projections without instantiating models. Public field name -> ORM lookup
+DOCTOR_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'specialization': 'specialization',
+    'experience': 'experience',
+    'hospital': 'hospital',
+    'address': 'address',
+    'city': 'city',
+    'fee': 'fee',
+    'rating': 'rating',
+    'is_available': 'is_available',
+    'image': 'image',
+    'description': 'description',
+    'updated_at': 'updated_at',
+}
+DOCTOR_DEFAULT_FIELDS = [
+    'id', 'name', 'specialization', 'experience', 'hospital', 'city', 'fee', 'rating', 'is_available',
+]
+
+REVIEW_FIELDS = {
+    'id': 'id',
+    'doctor_id': 'doctor_id',
+    'user': 'user__username',
+    'rating': 'rating',
+    'comment': 'comment',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+REVIEW_DEFAULT_FIELDS = ['id', 'user', 'rating', 'comment', 'created_at']
+
+APPOINTMENT_FIELDS = {
+    'id': 'id',
+    'doctor_id': 'doctor_id',
+    'doctor_name': 'doctor__name',
+    'specialization': 'doctor__specialization',
+    'patient_name': 'patient_name',
+    'date': 'date',
+    'time': 'time',
+    'fee': 'fee',
+    'status': 'status',
+    'notes': 'notes',
+    'created_at': 'created_at',
+}
+APPOINTMENT_DEFAULT_FIELDS = ['id', 'doctor_id', 'doctor_name', 'patient_name', 'date', 'time', 'fee', 'status']
+
+# Stored values that need converting before they are useful to a client
+TRANSFORMS = {
+    'image': lambda value: settings.MEDIA_URL + value if value else None,
+}
+
+_encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view_func):
+    """Turn ApiError into a JSON error response"""
+    @functools.wraps(view_func)
+    def _view(request, *args, **kwargs):
+        try:
+            return view_func(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+    return _view
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip('=')
+
+
+# Largest value a (big) integer primary key column can hold
+MAX_PK = 2 ** 63 - 1
+
+
+def decode_cursor(token):
+    try:
+        pk = int(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ApiError('Invalid cursor')
+    # A tampered cursor must not reach the database as an out-of-range integer
+    if not 0 <= pk <= MAX_PK:
+        raise ApiError('Invalid cursor')
+    return pk
+
+
+def parse_fields(request, fields, default):
+    requested = request.GET.get('fields')
+    if not requested:
+        return default
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown or not names:
+        raise ApiError(f'Unknown field(s): {", ".join(unknown)}. Available: {", ".join(fields)}')
+    return names
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit must be an integer')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(f'limit must be between 1 and {MAX_LIMIT}')
+    return limit
+
+
+def paginated_response(request, queryset, fields, default_fields, newest_first=False):
+    """
+    Keyset-paginate a queryset by primary key and serialize one page.
+
+    The cursor is the last primary key of the previous page, so each page is a
+    single indexed range scan however deep the client has paged.
+    """
+    names = parse_fields(request, fields, default_fields)
+    limit = parse_limit(request)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        after = decode_cursor(cursor)
+        queryset = queryset.filter(pk__lt=after) if newest_first else queryset.filter(pk__gt=after)
+
+    rows = (
+        queryset.order_by('-pk' if newest_first else 'pk')
+        .values_list('pk', *[fields[name] for name in names])[:limit + 1]
+    )
+    # Resolve the database now, while any replica routing for this view is active
+    rows = rows.using(rows.db)
+    transforms = [(index, TRANSFORMS[name]) for index, name in enumerate(names) if name in TRANSFORMS]
+
+    def chunks():
+        yield '{"results":['
+        last_pk, count = None, 0
+        for pk, *values in rows.iterator(chunk_size=STREAM_THRESHOLD):
+            if count == limit:
+                break
+            for index, transform in transforms:
+                values[index] = transform(values[index])
+            yield (',' if count else '') + _encoder.encode(dict(zip(names, values)))
+            last_pk, count = pk, count + 1
+        else:
+            last_pk = None
+
+        next_url = None
+        if last_pk is not None:
+            params = request.GET.copy()
+            params['cursor'] = encode_cursor(last_pk)
+            next_url = f'{request.path}?{params.urlencode()}'
+        yield f'],"next":{_encoder.encode(next_url)}}}'
+
+    if limit > STREAM_THRESHOLD:
+        return streaming_response(request, chunks(), content_type='application/json')
+    return HttpResponse(''.join(chunks()), content_type='application/json')
+
+
+@replica_safe
+@require_GET
+@api_view
+def api_doctors(request):
+    """Doctors, filtered by ?q= with the same semantics as the site search"""
+    doctors = search_doctors(Doctor.objects.all(), request.GET.get('q', '').strip())
+    return paginated_response(request, doctors, DOCTOR_FIELDS, DOCTOR_DEFAULT_FIELDS)
+
+
+@replica_safe
+@require_GET
+@api_view
+def api_doctor_reviews(request, doctor_id):
+    if not Doctor.objects.filter(id=doctor_id).exists():
+        raise ApiError('Doctor not found', status=404)
+    reviews = Review.objects.filter(doctor_id=doctor_id)
+    return paginated_response(request, reviews, REVIEW_FIELDS, REVIEW_DEFAULT_FIELDS, newest_first=True)
+
+
+@require_GET
+@api_view
+def api_my_appointments(request):
+    if not request.user.is_authenticated:
+        raise ApiError('Authentication required', status=401)
+    appointments = Appointment.objects.filter(user=request.user)
+    return paginated_response(
+        request, appointments, APPOINTMENT_FIELDS, APPOINTMENT_DEFAULT_FIELDS, newest_first=True
+    )
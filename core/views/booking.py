@@ -0,0 +1,254 @@
+from datetime import datetime
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
+from django.utils import timezone
+
+from ..archive import user_history
+from ..ics import feed_token
+from ..models import Doctor, Appointment, WaitlistEntry
+from ..notifications import build_email, queue_emails
+from ..ratelimit import ratelimit
+from ..waitlist import cancel_and_promote, position, slot_taken
+
+
+@login_required
+@ratelimit('booking', '20/h', methods=('POST',))
+def book_appointment(request, doctor_id):
+    doctor = get_object_or_404(Doctor, id=doctor_id)
+    
+    if request.method == 'POST':
+        date_str = request.POST.get('date')
+        time_str = request.POST.get('time')
+        patient_name = request.POST.get('patient_name', '').strip()
+        notes = request.POST.get('notes', '')
+        
+        # Validate patient name
+        if not patient_name:
+            messages.error(request, 'Patient name is required.')
+            return render(request, 'book_appointment.html', {
+                'doctor': doctor,
+                'error': 'Patient name is required'
+            })
+        
+        # Validate date and time
+        try:
+            appointment_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            appointment_time = datetime.strptime(time_str, '%H:%M').time()
+        except (ValueError, TypeError):
+            messages.error(request, 'Please select a valid date and time.')
+            return render(request, 'book_appointment.html', {
+                'doctor': doctor,
+                'error': 'Invalid date or time format'
+            })
+        
+        # Check if date is in the past
+        if appointment_date < timezone.now().date():
+            messages.error(request, 'Cannot book appointment for past dates.')
+            return render(request, 'book_appointment.html', {
+                'doctor': doctor,
+                'error': 'Please select a future date'
+            })
+        
+        # Check minimum 2 hours booking constraint
+        current_datetime = timezone.now()
+        appointment_datetime_aware = timezone.make_aware(
+            datetime.combine(appointment_date, appointment_time)
+        )
+        time_difference = appointment_datetime_aware - current_datetime
+        if time_difference.total_seconds() < 7200:  # 2 hours in seconds
+            messages.error(request, 'Appointment must be booked at least 2 hours in advance.')
+            return render(request, 'book_appointment.html', {
+                'doctor': doctor,
+                'error': 'Appointment must be booked at least 2 hours in advance'
+            })
+        
+        # Check for existing appointment at same date and time
+        existing_appointment = slot_taken(doctor.id, appointment_date, appointment_time)
+        
+        if existing_appointment:
+            messages.error(request, 'This time slot is already booked. Please choose another time or join the waitlist.')
+            return render(request, 'book_appointment.html', {
+                'doctor': doctor,
+                'error': 'Time slot not available',
+                'waitlist_slot': {
+                    'date': date_str,
+                    'time': time_str,
+                    'patient_name': patient_name,
+                    'notes': notes,
+                },
+            })
+        
+        # Create the appointment and queue its confirmation email together
+        try:
+            with transaction.atomic():
+                appointment = Appointment.objects.create(
+                    user=request.user,
+                    doctor=doctor,
+                    date=appointment_date,
+                    time=appointment_time,
+                    patient_name=patient_name,
+                    fee=doctor.fee,
+                    notes=notes,
+                    status='confirmed'
+                )
+                queue_emails([build_email(appointment, 'confirmed')])
+            
+            messages.success(request, f'Appointment booked successfully for {appointment_date} at {appointment_time}!')
+            return redirect('appointment_success', appointment_id=appointment.id)
+            
+        except Exception as e:
+            messages.error(request, 'An error occurred while booking the appointment. Please try again.')
+            return render(request, 'book_appointment.html', {
+                'doctor': doctor,
+                'error': 'Booking failed. Please try again.'
+            })
+    
+    # GET request - show booking form
+    return render(request, 'book_appointment.html', {
+        'doctor': doctor
+    })
+
+@login_required
+def appointment_success(request, appointment_id):
+    appointment = get_object_or_404(Appointment, id=appointment_id, user=request.user)
+    
+    context = {
+        "appointment": appointment,
+    }
+    return render(request, "appointment_success.html", context)
+
+@login_required
+def my_appointments(request):
+    appointments = Appointment.objects.filter(user=request.user).order_by("-date", "-time")
+    
+    # Auto-complete past appointments
+    for appointment in appointments:
+        if appointment.status == 'confirmed':
+            appointment.mark_completed_if_due()
+    
+    today = timezone.now().date()
+    waitlist = WaitlistEntry.objects.filter(user=request.user, status='waiting').select_related('doctor')
+    upcoming_count = appointments.filter(status='confirmed', date__gte=today).count()
+    completed_count = appointments.filter(status='completed').count()
+    cancelled_count = appointments.filter(status='cancelled').count()
+    
+    # Archived appointments are only read when the user asks for their history
+    show_history = request.GET.get('history') == '1'
+    if show_history:
+        history = list(user_history(request.user))
+        completed_count += sum(1 for appointment in history if appointment.status == 'completed')
+        cancelled_count += sum(1 for appointment in history if appointment.status == 'cancelled')
+        appointments = list(appointments) + history
+    
+    context = {
+        "appointments": appointments,
+        "upcoming_count": upcoming_count,
+        "completed_count": completed_count,
+        "cancelled_count": cancelled_count,
+        "today": today,
+        "waitlist": waitlist,
+        "calendar_url": request.build_absolute_uri(reverse('patient_calendar', kwargs={
+            'pk': request.user.pk, 'token': feed_token('user', request.user.pk),
+        })),
+        "show_history": show_history,
+    }
+    return render(request, "my_appointments.html", context)
+
+@login_required
+def cancel_appointment_confirmation(request, appointment_id):
+    """Show cancellation confirmation page"""
+    appointment = get_object_or_404(Appointment, id=appointment_id, user=request.user)
+    
+    # Check if appointment can be cancelled using the model property
+    if not appointment.can_cancel:
+        messages.error(request, "Cannot cancel this appointment. It may be already completed, cancelled, or the cancellation period has passed.")
+        return redirect("my_appointments")
+    
+    context = {
+        "appointment": appointment,
+    }
+    return render(request, "cancel_confirmation.html", context)
+
+@login_required
+def cancel_appointment(request, appointment_id):
+    """Confirm and process cancellation"""
+    appointment = get_object_or_404(Appointment, id=appointment_id, user=request.user)
+    
+    if request.method == 'POST':
+        # Check if appointment can be cancelled using the model property
+        # Each transition only applies if the status has not changed meanwhile;
+        # the freed slot goes to the first patient on its waitlist
+        if appointment.can_cancel and cancel_and_promote(appointment, ['confirmed'], notify=True):
+            messages.success(request, "Appointment cancelled successfully.")
+        elif appointment.status == 'pending_payment' and cancel_and_promote(appointment, ['pending_payment']):
+            messages.success(request, "Appointment cancelled successfully.")
+        else:
+            messages.error(request, "Cannot cancel this appointment. It may be already completed, cancelled, or the cancellation period has passed.")
+        
+        return redirect("my_appointments")
+    
+    # If not POST, redirect to confirmation page
+    return redirect('cancel_appointment_confirmation', appointment_id=appointment_id)
+
+@login_required
+@ratelimit('booking', '20/h', methods=('POST',))
+def join_waitlist(request, doctor_id):
+    """Queue the user for a taken slot"""
+    doctor = get_object_or_404(Doctor, id=doctor_id)
+    if request.method != 'POST':
+        return redirect('book_appointment', doctor_id=doctor.id)
+
+    patient_name = request.POST.get('patient_name', '').strip()
+    try:
+        slot_date = datetime.strptime(request.POST.get('date'), '%Y-%m-%d').date()
+        slot_time = datetime.strptime(request.POST.get('time'), '%H:%M').time()
+    except (ValueError, TypeError):
+        messages.error(request, 'Please select a valid date and time.')
+        return redirect('book_appointment', doctor_id=doctor.id)
+    if not patient_name or slot_date < timezone.now().date():
+        messages.error(request, 'Please enter the patient name and a future date.')
+        return redirect('book_appointment', doctor_id=doctor.id)
+
+    if not slot_taken(doctor.id, slot_date, slot_time):
+        messages.success(request, 'Good news: this time slot is free. You can book it now.')
+        return redirect('book_appointment', doctor_id=doctor.id)
+
+    try:
+        entry = WaitlistEntry.objects.create(
+            user=request.user,
+            doctor=doctor,
+            date=slot_date,
+            time=slot_time,
+            patient_name=patient_name,
+            notes=request.POST.get('notes', ''),
+        )
+    except IntegrityError:
+        messages.error(request, 'You are already on the waitlist for this time slot.')
+        return redirect('my_appointments')
+
+    messages.success(request, f'You are #{position(entry)} on the waitlist. If the slot frees up it will be booked for you.')
+    return redirect('my_appointments')
+
+@login_required
+def leave_waitlist(request, entry_id):
+    if request.method == 'POST':
+        left = WaitlistEntry.objects.filter(id=entry_id, user=request.user, status='waiting').update(status='withdrawn')
+        if left:
+            messages.success(request, 'You have left the waitlist.')
+        else:
+            messages.error(request, 'This waitlist entry is no longer active.')
+    return redirect('my_appointments')
+
+def slot_events(request, doctor_id):
+    """
+    Live slot events are streamed by SlotEventsApp in the ASGI entry point.
+    A request that reaches this view is being served without it (WSGI, or
+    runserver), where each open stream would hold a worker; 204 tells
+    EventSource not to reconnect.
+    """
+    return HttpResponse(status=204)
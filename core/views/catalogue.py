@@ -0,0 +1,122 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Q, Count, Max
+from django.shortcuts import render, get_object_or_404
+
+from ..conditional import conditional_page
+from ..models import Doctor, Appointment, UserRecommendation
+from ..ratelimit import ratelimit
+from ..routers import replica_safe
+
+
+def search_doctors(doctors, query):
+    """Filter doctors by a free-text query the way the site search does"""
+    if not query:
+        return doctors
+    return doctors.filter(
+        Q(name__icontains=query) |
+        Q(specialization__icontains=query) |
+        Q(hospital__icontains=query) |
+        Q(city__icontains=query) |
+        Q(address__icontains=query)
+    ).distinct()
+
+
+def doctor_list_validators(request):
+    # No Last-Modified: deleting a doctor changes the count but not Max('updated_at'),
+    # so an If-Modified-Since poll would keep getting 304 for a stale list
+    state = Doctor.objects.aggregate(latest=Max('updated_at'), total=Count('id'))
+    return (state['latest'], state['total']), None
+
+
+def doctor_validators(request, doctor_id, viewer=None):
+    """Doctor row version plus its review aggregate (and whether ``viewer`` consulted), in one query"""
+    doctors = Doctor.objects.filter(id=doctor_id).annotate(
+        review_total=Count('reviews'),
+        review_latest=Max('reviews__updated_at'),
+    )
+    fields = ['updated_at', 'review_total', 'review_latest']
+    if viewer is not None:
+        doctors = doctors.with_consulted(viewer)
+        fields.append('has_consulted')
+    state = doctors.values(*fields).first()
+    if state is None:
+        return None
+    parts = [state[field] for field in fields]
+    return parts, max(filter(None, [state['updated_at'], state['review_latest']]))
+
+
+def doctor_detail_validators(request, id):
+    # The review call-to-action depends on the viewer's own appointments
+    viewer = request.user if request.user.is_authenticated else None
+    return doctor_validators(request, id, viewer)
+
+
+@replica_safe
+def home(request):
+    doctors = Doctor.objects.with_card_data(review_stats=False).order_by('-created_at')[:6]
+    
+    if request.user.is_authenticated:
+        # Precomputed by build_recommendations: one lookup on the (user, rank) index
+        ranked = list(UserRecommendation.objects.filter(
+            user=request.user, doctor__is_available=True
+        ).order_by('rank').values_list('doctor_id', flat=True)[:3])
+        cards = Doctor.objects.with_card_data().in_bulk(ranked)
+        featured_doctors = [cards[pk] for pk in ranked if pk in cards]
+        
+        if not featured_doctors:
+            # No recommendations yet: suggest doctors similar to the user's previous appointments
+            user_specializations = Appointment.objects.filter(
+                user=request.user
+            ).values_list('doctor__specialization', flat=True).distinct()
+            
+            if user_specializations:
+                featured_doctors = Doctor.objects.with_card_data().filter(
+                    is_available=True,
+                    specialization__in=user_specializations
+                ).order_by('-rating', '-experience')[:3]
+            else:
+                # Fallback for new users
+                featured_doctors = Doctor.objects.with_card_data().filter(
+                    is_available=True
+                ).order_by('-rating', '-experience')[:3]
+    else:
+        # For non-logged in users
+        featured_doctors = Doctor.objects.with_card_data().filter(
+            is_available=True
+        ).order_by('-rating', '-experience')[:3]
+    
+    return render(request, 'home.html', {
+        'doctors': doctors,
+        'featured_doctors': featured_doctors
+    })
+
+@replica_safe
+@conditional_page(doctor_list_validators)
+def doctors(request):
+    doctors = Doctor.objects.with_card_data(review_stats=False).order_by('name')
+    return render(request, 'doctors.html', {'doctors': doctors})
+
+@replica_safe
+@conditional_page(doctor_detail_validators)
+def doctor_detail(request, id):
+    doctor = get_object_or_404(Doctor.objects.with_detail_data(request.user), id=id)
+    
+    context = {
+        'doctor': doctor,
+        'has_consulted': doctor.has_consulted,
+    }
+    return render(request, 'doctor_detail.html', context)
+
+@ratelimit('search', '30/m')
+@replica_safe
+async def unified_search(request):
+    query = request.GET.get("q", "").strip()
+    doctors = search_doctors(Doctor.objects.with_card_data(review_stats=False), query)
+    if query:
+        doctors = doctors.order_by('name')
+
+    context = {
+        "q": query,
+        "doctors": [doctor async for doctor in doctors],
+    }
+    return await sync_to_async(render)(request, "unified_search.html", context)
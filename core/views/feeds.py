@@ -0,0 +1,51 @@
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+
+from ..ics import calendar, check_token, doctor_events, feed_appointments, feed_etag, patient_events
+from ..models import Doctor
+from ..routers import replica_safe
+from ..streaming import streaming_response
+
+
+def feed_view(kind):
+    """
+    Wrap a feed view: check the URL token, then answer If-None-Match from one
+    aggregate query, so an unchanged feed costs no row iteration at all.
+    """
+    def decorator(view_func):
+        def etag(request, pk, token):
+            if not check_token(kind, pk, token):
+                raise Http404
+            return feed_etag(feed_appointments(**{f'{kind}_id': pk}))
+
+        @replica_safe
+        @require_safe
+        @condition(etag_func=etag)
+        def _view(request, pk, token):
+            # Resolve the database now, while any replica routing for this view is active
+            appointments = feed_appointments(**{f'{kind}_id': pk})
+            response = streaming_response(
+                request, view_func(request, pk, appointments.using(appointments.db)),
+                content_type='text/calendar; charset=utf-8',
+            )
+            response['Content-Disposition'] = f'inline; filename="{kind}-{pk}.ics"'
+            # The URL is a credential: keep shared caches from storing the feed
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return _view
+    return decorator
+
+
+@feed_view('user')
+def patient_calendar(request, pk, appointments):
+    """A patient's appointments as an iCalendar feed"""
+    return calendar('My appointments', patient_events(appointments))
+
+
+@feed_view('doctor')
+def doctor_calendar(request, pk, appointments):
+    """A doctor's schedule as an iCalendar feed, for the clinic"""
+    doctor = get_object_or_404(Doctor.objects.only('name'), pk=pk)
+    return calendar(f'Dr. {doctor.name}', doctor_events(appointments))
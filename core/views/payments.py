@@ -0,0 +1,144 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import render, aget_object_or_404, redirect
+from django.views.decorators.csrf import csrf_exempt
+
+from ..models import Appointment
+from ..notifications import transition_and_notify
+from ..payments import async_client, verify_payment_signature, PaymentGatewayError, PaymentSignatureError
+from ..perf import timed
+from ..ratelimit import ratelimit
+
+
+@login_required
+@ratelimit('payment_order', '10/m')
+async def create_payment_order(request, appointment_id):
+    """
+    REAL PAYMENT: Create Razorpay order for payment
+    """
+    async with async_client(request) as gateway:
+        return await _create_payment_order(request, appointment_id, gateway)
+
+
+async def _create_payment_order(request, appointment_id, gateway):
+    user = await request.auser()
+    appointment = await aget_object_or_404(
+        Appointment.objects.select_related('doctor'), id=appointment_id, user=user
+    )
+
+    # If already confirmed, redirect to success
+    if appointment.status == 'confirmed':
+        return redirect('appointment_success', appointment_id=appointment.id)
+    if appointment.status != 'pending_payment':
+        messages.error(request, "This appointment can no longer be paid for.")
+        return redirect('my_appointments')
+    
+    # If already has a payment order, use it
+    if appointment.razorpay_order_id:
+        try:
+            with timed('razorpay'):
+                order_data = await gateway.fetch_order(appointment.razorpay_order_id)
+            if order_data['status'] == 'paid':
+                await appointment.atransition('confirmed')
+                return redirect('appointment_success', appointment_id=appointment.id)
+        except PaymentGatewayError:
+            # Order expired, create new one
+            pass
+
+    # Create REAL Razorpay order
+    amount = int(appointment.fee * 100)  # Convert to paise
+    currency = "INR"
+    
+    try:
+        with timed('razorpay'):
+            order_data = await gateway.create_order({
+                'amount': amount,
+                'currency': currency,
+                'payment_capture': 1,  # Auto capture payment
+                'notes': {
+                    'appointment_id': str(appointment.id),
+                    'doctor_name': appointment.doctor.name,
+                }
+            })
+        
+    except PaymentGatewayError as e:
+        messages.error(request, f"Payment gateway error: {str(e)}")
+        return redirect('doctor_detail', id=appointment.doctor.id)
+
+    # Record the order unless the appointment was cancelled meanwhile
+    if not await appointment.atransition('pending_payment', razorpay_order_id=order_data['id']):
+        messages.error(request, "This appointment can no longer be paid for.")
+        return redirect('my_appointments')
+
+    context = {
+        "appointment": appointment,
+        "razorpay_order_id": order_data['id'],
+        "amount": amount,
+        "currency": currency,
+        "razorpay_key_id": settings.RAZORPAY_KEY_ID,
+        "user": {
+            "name": user.get_full_name() or user.username,
+            "email": user.email,
+            "contact": getattr(user, 'phone_number', '9999999999')
+        }
+    }
+    return await sync_to_async(render)(request, "appointment_payment.html", context)
+
+@csrf_exempt
+@ratelimit('payment_verify', '20/m', key='ip')
+async def verify_payment(request):
+    """
+    REAL PAYMENT: Verify Razorpay payment
+    """
+    if request.method == "POST":
+        try:
+            # Handle direct payment success callback
+            appointment_id = request.POST.get("appointment_id")
+            razorpay_payment_id = request.POST.get("razorpay_payment_id")
+            razorpay_order_id = request.POST.get("razorpay_order_id")
+            razorpay_signature = request.POST.get("razorpay_signature")
+            
+            if all([appointment_id, razorpay_payment_id, razorpay_order_id, razorpay_signature]):
+                appointment = await aget_object_or_404(Appointment, id=appointment_id)
+                
+                # REAL signature verification (local HMAC, no network call)
+                params_dict = {
+                    'razorpay_order_id': razorpay_order_id,
+                    'razorpay_payment_id': razorpay_payment_id,
+                    'razorpay_signature': razorpay_signature
+                }
+                
+                with timed('razorpay'):
+                    verify_payment_signature(params_dict)
+                
+                # Payment verified - confirm unless the appointment was cancelled meanwhile
+                confirmed = await sync_to_async(transition_and_notify)(
+                    appointment, 'confirmed', 'confirmed',
+                    payment_id=razorpay_payment_id,
+                    razorpay_order_id=razorpay_order_id,
+                )
+                if not confirmed:
+                    await appointment.arefresh_from_db(fields=['status', 'payment_id'])
+                    # A repeated callback for a payment already recorded is still a success
+                    if appointment.status != 'confirmed' or appointment.payment_id != razorpay_payment_id:
+                        return JsonResponse({
+                            "success": False,
+                            "error": f"Appointment is {appointment.get_status_display().lower()}; payment was not applied"
+                        })
+                
+                return JsonResponse({
+                    "success": True,
+                    "redirect_url": f"/appointment/success/{appointment.id}/"
+                })
+            
+            return JsonResponse({"success": False, "error": "Missing payment parameters"})
+            
+        except PaymentSignatureError:
+            return JsonResponse({"success": False, "error": "Payment signature verification failed"})
+        except Exception as e:
+            return JsonResponse({"success": False, "error": str(e)})
+    
+    return JsonResponse({"error": "POST method required"}, status=400)
@@ -0,0 +1,76 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.http import require_POST, require_safe
+
+from .. import profiling
+from ..profiling import ProfilingError
+
+
+def int_param(request, name, default):
+    try:
+        return int(request.POST.get(name, default))
+    except (TypeError, ValueError):
+        raise ProfilingError(f'{name} must be a whole number')
+
+
+def command_response(issue, *args, **kwargs):
+    try:
+        return JsonResponse({'command': issue(*args, **kwargs)}, status=202)
+    except ProfilingError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@staff_member_required
+@require_safe
+def profiling_status(request):
+    """Current commands and the result files workers have written"""
+    return JsonResponse({'control': profiling.read_control(), 'results': profiling.results()})
+
+
+@staff_member_required
+@require_POST
+def profiling_memory(request):
+    """action=start|snapshot|stop; each snapshot reports the growth since the previous one"""
+    try:
+        frames, top = int_param(request, 'frames', 10), int_param(request, 'top', 25)
+    except ProfilingError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return command_response(profiling.issue_memory, request.POST.get('action', ''), frames=frames, top=top)
+
+
+@staff_member_required
+@require_POST
+def profiling_cpu(request):
+    """Profile the next requests to a URL name (url_name, requests, format, interval_ms), or action=stop"""
+    if request.POST.get('action') == 'stop':
+        return command_response(profiling.stop_cpu)
+    try:
+        requests, timeout = int_param(request, 'requests', 20), int_param(request, 'timeout', 600)
+        interval_ms = float(request.POST.get('interval_ms', 5))
+    except (ProfilingError, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return command_response(
+        profiling.issue_cpu, request.POST.get('url_name', ''), requests=requests,
+        fmt=request.POST.get('format', 'collapsed'), interval_ms=interval_ms, timeout=timeout,
+    )
+
+
+@staff_member_required
+@require_safe
+def profiling_result(request, command_id):
+    """
+    One command's results merged across workers: memory reports and collapsed
+    stacks as text, pstats as a .prof file (or its summary with ?view=text).
+    """
+    try:
+        kind, content = profiling.report(command_id)
+    except ProfilingError as e:
+        raise Http404(str(e))
+    if kind != 'pstats':
+        return HttpResponse(content, content_type='text/plain; charset=utf-8')
+    if request.GET.get('view') == 'text':
+        return HttpResponse(profiling.pstats_text(content, sort=request.GET.get('sort', 'cumulative')),
+                            content_type='text/plain; charset=utf-8')
+    response = HttpResponse(profiling.dump_stats(content), content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="cpu-{command_id}.prof"'
+    return response
@@ -0,0 +1,205 @@
+import io
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import get_object_or_404, redirect, HttpResponse
+from django.utils import timezone
+
+from ..models import Appointment, AppointmentArchive
+from ..perf import timed
+
+
+@login_required
+def download_receipt(request, appointment_id):
+    """Generate professional appointment receipt as PDF"""
+    # ReportLab is only needed here; importing it lazily keeps worker boot fast
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors
+
+    appointment = (
+        Appointment.objects.filter(id=appointment_id, user=request.user).first()
+        or get_object_or_404(AppointmentArchive, id=appointment_id, user=request.user)
+    )
+    
+    # Check if receipt can be downloaded using the model property
+    if not appointment.can_download_receipt:
+        messages.error(request, "Receipt can only be downloaded 1 hour before the appointment time.")
+        return redirect('my_appointments')
+    
+    # Create a file-like buffer to receive PDF data
+    buffer = io.BytesIO()
+    
+    # Create the PDF object
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    story = []
+    
+    # Styles
+    styles = getSampleStyleSheet()
+    
+    # Custom styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        alignment=1,
+        textColor=colors.HexColor('#1e40af')
+    )
+    
+    header_style = ParagraphStyle(
+        'CustomHeader',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=12,
+        textColor=colors.HexColor('#1e40af')
+    )
+    
+    normal_style = ParagraphStyle(
+        'CustomNormal',
+        parent=styles['Normal'],
+        fontSize=10,
+        spaceAfter=6
+    )
+    
+    # Title
+    title = Paragraph("MEDICARE+ - APPOINTMENT RECEIPT", title_style)
+    story.append(title)
+    
+    # Header section
+    header_data = [
+        [Paragraph("<b>Receipt No:</b>", normal_style), Paragraph(f"<b>#{appointment.id}</b>", normal_style)],
+        [Paragraph("<b>Issue Date:</b>", normal_style), Paragraph(f"<b>{timezone.now().strftime('%d-%m-%Y %H:%M')}</b>", normal_style)],
+        [Paragraph("<b>Status:</b>", normal_style), Paragraph(f"<b>{appointment.get_status_display().upper()}</b>", normal_style)],
+    ]
+    
+    header_table = Table(header_data, colWidths=[2*inch, 3*inch])
+    header_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f8fafc')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    story.append(header_table)
+    story.append(Spacer(1, 20))
+    
+    # Patient Information
+    story.append(Paragraph("PATIENT INFORMATION", header_style))
+    patient_data = [
+        ["Full Name:", f"{appointment.patient_name}"],
+        ["Email:", request.user.email],
+        ["Appointment Date:", f"{appointment.date}"],
+        ["Appointment Time:", f"{appointment.time.strftime('%I:%M %p')}"],
+    ]
+    
+    patient_table = Table(patient_data, colWidths=[2*inch, 4*inch])
+    patient_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e0f2fe')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    story.append(patient_table)
+    story.append(Spacer(1, 15))
+    
+    # Doctor Information
+    story.append(Paragraph("DOCTOR & APPOINTMENT DETAILS", header_style))
+    doctor_data = [
+        ["Doctor Name:", f"Dr. {appointment.doctor.name}"],
+        ["Specialization:", f"{appointment.doctor.get_specialization_display()}"],
+        ["Hospital/Clinic:", f"{appointment.doctor.hospital}"],
+        ["Address:", f"{appointment.doctor.address}"],
+        ["Experience:", f"{appointment.doctor.experience}+ years"],
+    ]
+    
+    doctor_table = Table(doctor_data, colWidths=[2*inch, 4*inch])
+    doctor_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0fdf4')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    story.append(doctor_table)
+    story.append(Spacer(1, 15))
+    
+    # Payment Information - IN RUPEES
+    story.append(Paragraph("PAYMENT DETAILS", header_style))
+    payment_data = [
+        ["Description", "Amount"],
+        ["Consultation Fee", f"₹{appointment.fee}"],
+        ["Total Amount", f"<b>₹{appointment.fee}</b>"],
+    ]
+    
+    payment_table = Table(payment_data, colWidths=[3.5*inch, 2.5*inch])
+    payment_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
+        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
+    ]))
+    story.append(payment_table)
+    story.append(Spacer(1, 20))
+    
+    # Terms and Conditions Section
+    story.append(Paragraph("TERMS & CONDITIONS", header_style))
+    terms_text = """
+    <b>1. Appointment Policy:</b> Appointments must be booked at least 2 hours in advance.<br/>
+    <b>2. Receipt Download:</b> Receipts can be downloaded only 1 hour before the appointment time.<br/>
+    <b>3. Cancellation Policy:</b> Cancellations must be made at least 2 hours before the appointment.<br/>
+    <b>4. Late Arrivals:</b> Late arrivals may result in reduced consultation time.<br/>
+    <b>5. No-shows:</b> No-shows will be charged the full consultation fee.<br/>
+    <b>6. Refund Policy:</b> Refunds are processed within 5-7 business days.<br/>
+    """
+    terms_paragraph = Paragraph(terms_text, normal_style)
+    story.append(terms_paragraph)
+    story.append(Spacer(1, 15))
+    
+    # Important Notes
+    notes_style = ParagraphStyle(
+        'NotesStyle',
+        parent=styles['Normal'],
+        fontSize=9,
+        textColor=colors.gray,
+        alignment=1
+    )
+    
+    story.append(Paragraph("This is a computer-generated receipt. No signature required.", notes_style))
+    story.append(Spacer(1, 5))
+    story.append(Paragraph("For any queries, contact: support@medicare.com | 1-800-MEDICARE", notes_style))
+    story.append(Spacer(1, 10))
+    story.append(Paragraph("Thank you for choosing MediCare+!", notes_style))
+    
+    # Build PDF
+    with timed('reportlab'):
+        doc.build(story)
+    
+    buffer.seek(0)
+    response = HttpResponse(buffer, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="medicare_receipt_{appointment.id}.pdf"'
+    
+    return response
@@ -0,0 +1,82 @@
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render, get_object_or_404, redirect
+
+from ..conditional import conditional_page
+from ..models import Doctor, Review
+from ..routers import replica_safe
+from .catalogue import doctor_validators
+
+
+@login_required
+def submit_review(request, doctor_id):
+    doctor = get_object_or_404(Doctor.objects.with_consulted(request.user), id=doctor_id)
+    
+    # Check if user has a COMPLETED appointment with this doctor
+    if not doctor.has_consulted:
+        messages.error(request, 'You can only review doctors after you have completed your consultation.')
+        return redirect('doctor_detail', id=doctor_id)
+    
+    # Check if user already reviewed this doctor
+    existing_review = Review.objects.filter(user=request.user, doctor=doctor).first()
+    
+    if request.method == 'POST':
+        rating = request.POST.get('rating')
+        comment = request.POST.get('comment', '')
+        
+        if not rating:
+            messages.error(request, 'Please select a rating.')
+            return render(request, 'submit_review.html', {
+                'doctor': doctor,
+                'existing_review': existing_review,
+            })
+        
+        if existing_review:
+            # Update existing review
+            existing_review.rating = rating
+            existing_review.comment = comment
+            existing_review.save()
+            messages.success(request, 'Review updated successfully!')
+        else:
+            # Create new review
+            Review.objects.create(
+                user=request.user,
+                doctor=doctor,
+                rating=rating,
+                comment=comment
+            )
+            messages.success(request, 'Review submitted successfully!')
+        
+        return redirect('doctor_detail', id=doctor_id)
+    
+    context = {
+        'doctor': doctor,
+        'existing_review': existing_review,
+    }
+    return render(request, 'submit_review.html', context)
+
+@replica_safe
+@conditional_page(doctor_validators)
+def doctor_reviews(request, doctor_id):
+    doctor = get_object_or_404(Doctor.objects.with_card_data(), id=doctor_id)
+    reviews = Review.objects.filter(doctor=doctor).select_related('user').order_by('-created_at')
+    
+    context = {
+        'doctor': doctor,
+        'reviews': reviews,
+        'avg_rating': round(doctor.avg_rating, 1),
+        'total_reviews': doctor.review_count,
+    }
+    return render(request, 'doctor_reviews.html', context)
+
+@login_required
+def all_reviews(request):
+    """Show only the logged-in user's reviews"""
+    user_reviews = Review.objects.filter(user=request.user).select_related('doctor').order_by('-created_at')
+    featured_doctors = Doctor.objects.with_card_data(review_stats=False).filter(reviews__user=request.user).distinct()[:6]
+    
+    context = {
+        'reviews': user_reviews,
+        'featured_doctors': featured_doctors,
+    }
+    return render(request, 'all_reviews.html', context)
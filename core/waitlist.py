@@ -0,0 +1,78 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Appointment, Doctor, WaitlistEntry
+from .notifications import build_email, queue_emails, transition_and_notify
+
+# Appointments in these statuses hold their slot
+ACTIVE_STATUSES = ['confirmed', 'pending_payment']
+
+
+def slot_taken(doctor_id, date, time):
+    return Appointment.objects.filter(
+        doctor_id=doctor_id, date=date, time=time, status__in=ACTIVE_STATUSES
+    ).exists()
+
+
+def waiting(doctor_id, date, time):
+    """A slot's queue, oldest first; served by the partial waitlist_queue_idx"""
+    return WaitlistEntry.objects.filter(
+        doctor_id=doctor_id, date=date, time=time, status='waiting'
+    ).order_by('id')
+
+
+def position(entry):
+    return waiting(entry.doctor_id, entry.date, entry.time).filter(id__lte=entry.id).count()
+
+
+def promote_next(doctor_id, date, time):
+    """
+    Give a freed slot to the first patient waiting for it.
+
+    Meant to run inside the transaction that freed the slot, so the slot is
+    never visible as free while someone is queued for it. Returns the new
+    appointment, or None if nobody was waiting or the slot is taken again.
+    """
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            # Serialise promotions for this doctor so a slot is handed out once
+            list(Doctor.objects.select_for_update().filter(pk=doctor_id).values_list('pk'))
+        if slot_taken(doctor_id, date, time):
+            return None
+
+        while True:
+            entry = waiting(doctor_id, date, time).select_related('user', 'doctor').first()
+            if entry is None:
+                return None
+            # Claim the head of the queue; if a concurrent promotion got there first, try the next one
+            claimed = WaitlistEntry.objects.filter(pk=entry.pk, status='waiting').update(
+                status='promoted', promoted_at=timezone.now()
+            )
+            if claimed:
+                break
+
+        appointment = Appointment.objects.create(
+            user=entry.user,
+            doctor=entry.doctor,
+            date=date,
+            time=time,
+            patient_name=entry.patient_name,
+            fee=entry.doctor.fee,
+            notes=entry.notes,
+            status='confirmed',
+        )
+        WaitlistEntry.objects.filter(pk=entry.pk).update(appointment=appointment)
+        queue_emails([build_email(appointment, 'confirmed')])
+    return appointment
+
+
+def cancel_and_promote(appointment, from_statuses, notify=False):
+    """Cancel an appointment and promote the next waiter in the same transaction; return whether it applied"""
+    with transaction.atomic():
+        if notify:
+            applied = transition_and_notify(appointment, 'cancelled', 'cancelled', from_statuses=from_statuses)
+        else:
+            applied = appointment.transition('cancelled', from_statuses)
+        if applied:
+            promote_next(appointment.doctor_id, appointment.date, appointment.time)
+    return applied
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medi_care.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up; streams live slot events itself and hands
+# every other request to Django
+from core.slot_events import SlotEventsApp  # noqa: E402
+
+application = SlotEventsApp(django_application)
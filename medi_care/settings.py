@@ -36,11 +36,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.QueryInsightsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  
+    'core.middleware.SnapshotMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'core.middleware.LegacyAuthBackendMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -50,7 +56,7 @@ ROOT_URLCONF = 'medi_care.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.perf.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -74,6 +80,17 @@ DATABASES = {
     )
 }
 
+# Read replicas (comma-separated URLs). Replica-safe views read from them,
+# except for clients that wrote within the last REPLICA_STICKY_SECONDS.
+REPLICA_DATABASE_URL = config('REPLICA_DATABASE_URL', default='')
+for index, replica_url in enumerate(url.strip() for url in REPLICA_DATABASE_URL.split(',') if url.strip()):
+    DATABASES[f'replica_{index}'] = {
+        **dj_database_url.parse(replica_url, conn_max_age=600),
+        'TEST': {'MIRROR': 'default'},
+    }
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -110,6 +127,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Razorpay Keys
 RAZORPAY_KEY_ID = config('RAZORPAY_KEY_ID', default='rzp_test_YOUR_KEY_ID')
 RAZORPAY_KEY_SECRET = config('RAZORPAY_KEY_SECRET', default='rzp_test_YOUR_SECRET_KEY')
+# Override to point the async gateway client at a local stub (see `manage.py stub_gateway`)
+RAZORPAY_API_BASE = config('RAZORPAY_API_BASE', default='https://api.razorpay.com/v1')
 
 # Security Settings
 if not DEBUG:
@@ -133,6 +152,7 @@ EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='MediCare+ <no-reply@medicare.example>')
 
 # WhiteNoise configuration
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -140,6 +160,126 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # For Whitenoise to handle CSS, JS files properly
 WHITENOISE_MANIFEST_STRICT = False
 
+# Per-request performance instrumentation (Server-Timing header + JSONL log)
+# Fraction of requests to sample; 0 disables the middleware entirely. Keep it at
+# 0.1 or below to hold the overhead under 2% on every route (bench_site --perf-overhead).
+PERF_SAMPLE_RATE = config('PERF_SAMPLE_RATE', default=0.0, cast=float)
+PERF_LOG_FILE = config('PERF_LOG_FILE', default=os.path.join(BASE_DIR, 'logs', 'perf.jsonl'))
+
+# Slow-query capture: per-view SQL fingerprints plus EXPLAIN for slow statements
+QUERY_INSIGHTS_ENABLED = config('QUERY_INSIGHTS_ENABLED', default=False, cast=bool)
+QUERY_INSIGHTS_EXPLAIN_MS = config('QUERY_INSIGHTS_EXPLAIN_MS', default=100.0, cast=float)
+QUERY_INSIGHTS_LOG_FILE = config('QUERY_INSIGHTS_LOG_FILE', default=os.path.join(BASE_DIR, 'logs', 'queries.jsonl'))
+
+# Staff-triggered tracemalloc snapshots and CPU profiles of live workers
+# (profile_workers, /staff/profiling/). Off by default: no middleware, URLs or
+# threads. Workers sharing PROFILING_ROOT read commands from it every
+# PROFILING_POLL_SECONDS and write their results there.
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_ROOT = config('PROFILING_ROOT', default=os.path.join(BASE_DIR, 'logs', 'profiling'))
+PROFILING_POLL_SECONDS = config('PROFILING_POLL_SECONDS', default=1.0, cast=float)
+
+# Static HTML snapshots of public pages (export_snapshots). Anonymous visitors
+# are served from SNAPSHOT_ROOT while the last export is younger than
+# SNAPSHOT_MAX_AGE seconds; 0 disables SnapshotMiddleware.
+SNAPSHOT_ROOT = config('SNAPSHOT_ROOT', default=os.path.join(BASE_DIR, 'snapshots'))
+SNAPSHOT_MAX_AGE = config('SNAPSHOT_MAX_AGE', default=900, cast=int)
+SNAPSHOT_CACHE_SECONDS = config('SNAPSHOT_CACHE_SECONDS', default=60, cast=int)
+
+# Finished appointments older than this move to AppointmentArchive (archive_appointments)
+APPOINTMENT_ARCHIVE_AFTER_DAYS = config('APPOINTMENT_ARCHIVE_AFTER_DAYS', default=180, cast=int)
+
+# Unpaid appointments older than this are cancelled by expire_payments, freeing
+# the slot for the waitlist
+PAYMENT_EXPIRY_MINUTES = config('PAYMENT_EXPIRY_MINUTES', default=30, cast=int)
+
+# Booking pages get live slot events (ASGI only). Each process reads new
+# appointment writes once per SLOT_EVENTS_POLL_SECONDS while a page is open.
+SLOT_EVENTS_POLL_SECONDS = config('SLOT_EVENTS_POLL_SECONDS', default=1.0, cast=float)
+SLOT_EVENTS_HEARTBEAT_SECONDS = config('SLOT_EVENTS_HEARTBEAT_SECONDS', default=20.0, cast=float)
+SLOT_EVENTS_RETRY_MS = config('SLOT_EVENTS_RETRY_MS', default=3000, cast=int)
+
+# Cache shared by all workers (rate limits). The default in-process cache is
+# only correct with a single worker; point CACHE_BACKEND/CACHE_LOCATION at
+# Redis or Memcached in production.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Sessions are read from the cache and written through to the database. Like
+# rate limits, this needs a shared CACHE_BACKEND once there is more than one
+# worker, or a logout in one worker is not seen by the others.
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+
+# The logged-in user and their profile are cached for AUTH_USER_CACHE_SECONDS,
+# and kept in each worker for AUTH_USER_LOCAL_SECONDS (at most
+# AUTH_USER_LOCAL_MAX_ENTRIES users). Saving a User or UserProfile invalidates
+# the shared entry; other workers may serve their local copy until it expires.
+# Sessions created before CachedModelBackend name ModelBackend;
+# LegacyAuthBackendMiddleware moves them over.
+AUTHENTICATION_BACKENDS = ['core.auth.CachedModelBackend']
+AUTH_USER_CACHE = 'default'
+AUTH_USER_CACHE_SECONDS = config('AUTH_USER_CACHE_SECONDS', default=300, cast=int)
+AUTH_USER_LOCAL_SECONDS = config('AUTH_USER_LOCAL_SECONDS', default=5, cast=int)
+AUTH_USER_LOCAL_MAX_ENTRIES = config('AUTH_USER_LOCAL_MAX_ENTRIES', default=1000, cast=int)
+
+# Rate limits per view group ('N/s', 'N/m', 'N/h' or 'N/d'), counted per user or IP
+RATELIMIT_ENABLED = config('RATELIMIT_ENABLED', default=True, cast=bool)
+RATELIMIT_CACHE = 'default'
+# Use e.g. HTTP_X_FORWARDED_FOR when behind a proxy that appends the client address
+RATELIMIT_IP_HEADER = config('RATELIMIT_IP_HEADER', default='REMOTE_ADDR')
+RATELIMITS = {
+    'search': config('RATELIMIT_SEARCH', default='30/m'),
+    'booking': config('RATELIMIT_BOOKING', default='20/h'),
+    'payment_order': config('RATELIMIT_PAYMENT_ORDER', default='10/m'),
+    'payment_verify': config('RATELIMIT_PAYMENT_VERIFY', default='20/m'),
+}
+
+# Conditional GET for catalogue pages; bump after a template change so cached
+# copies are revalidated instead of answered with 304
+PAGE_ETAG_VERSION = config('PAGE_ETAG_VERSION', default='1')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'perf_file': {
+            'class': 'core.perf.BufferedRotatingFileHandler',
+            'filename': PERF_LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'message',
+        },
+        'querylog_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': QUERY_INSIGHTS_LOG_FILE,
+            'maxBytes': 50 * 1024 * 1024,
+            'backupCount': 3,
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'core.perf': {
+            'handlers': ['perf_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'core.querylog': {
+            'handlers': ['querylog_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Authentication redirects
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'